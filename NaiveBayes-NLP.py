@@ -1,12 +1,12 @@
 import pyodbc
 import pandas as pd
-import string
 import numpy as np
 from sklearn import model_selection
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import classification_report
 from sklearn.model_selection import cross_val_score
 import pickle
+from app.text_normalization import tokenize_words
 
 def fetch_data_from_db():
     conn_str = (
@@ -28,22 +28,24 @@ def fetch_data_from_db():
             connection.close()
 
 def build_vocabulary(text_data, stopwords, cutoff_freq=1):
+    stopwords = set(stopwords)
     vocab = {}
     for text in text_data:
-        for word in text.split():
-            word_new = word.strip(string.punctuation).lower()
+        for word_new in tokenize_words(text):
             if len(word_new) > 2 and word_new not in stopwords:
                 vocab[word_new] = vocab.get(word_new, 0) + 1
     features = [word for word, freq in vocab.items() if freq >= cutoff_freq]
     return features
 
 def transform_text_to_features(text_data, features):
+    # Tra vị trí từ bằng dict thay vì features.index (O(n) mỗi từ)
+    feature_index = {word: i for i, word in enumerate(features)}
     dataset = np.zeros((len(text_data), len(features)), dtype=np.float32)
     for i, text in enumerate(text_data):
-        word_list = [word.strip(string.punctuation).lower() for word in text.split()]
-        for word in word_list:
-            if word in features:
-                dataset[i][features.index(word)] += 1
+        for word in tokenize_words(text):
+            index = feature_index.get(word)
+            if index is not None:
+                dataset[i][index] += 1
     return dataset
 
 def train_model(X_train, Y_train):
@@ -5,9 +5,16 @@ from sqlalchemy import func
 from app.models import Article, User, Settings
 from app.database import get_db
 from fastapi.templating import Jinja2Templates
-import math
 import logging
 from app.user import get_current_user
+from app.sentiment_rollup import get_sentiment_overview, remove_article as remove_article_sentiment
+from app.pagination import InvalidCursor, cached_count, paginate_keyset
+from app.category_registry import category_registry
+from app.fragment_cache import invalidate_article_fragments
+from app.http_cache import bump_content_version
+from app.search_engine import search_engine
+from app.search_suggest import search_suggester
+from typing import Optional
 
 router = APIRouter()
 # Khởi tạo templates với directory="templates/" để có thể dùng đường dẫn template dạng "admin/..."
@@ -15,41 +22,6 @@ templates = Jinja2Templates(directory="templates/")
 logging.basicConfig(level=logging.DEBUG)
 
 
-class Pagination:
-    def __init__(self, page, per_page, total):
-        self.page = page
-        self.per_page = per_page
-        self.total = total
-
-    @property
-    def has_prev(self):
-        return self.page > 1
-
-    @property
-    def has_next(self):
-        return self.page * self.per_page < self.total
-
-    @property
-    def prev_num(self):
-        return self.page - 1
-
-    @property
-    def next_num(self):
-        return self.page + 1
-
-    def iter_pages(self, left_edge=2, left_current=2, right_current=2, right_edge=2):
-        total_pages = math.ceil(self.total / self.per_page)
-        last = 0
-        for num in range(1, total_pages + 1):
-            if (num <= left_edge or 
-               (self.page - left_current <= num <= self.page + right_current) or 
-               num > total_pages - right_edge):
-                if last + 1 != num:
-                    yield None
-                yield num
-                last = num
-
-
 # Dependency kiểm tra phân quyền admin
 def require_admin(current_user: User = Depends(get_current_user)) -> User:
     if not current_user or current_user.role.lower() != "admin":
@@ -74,11 +46,11 @@ async def admin_home(
 async def manage_articles(
     request: Request, 
     db: Session = Depends(get_db),
-    page: int = Query(1, alias="page", ge=1),
-    per_page: int = 10,
+    cursor: Optional[str] = None,
+    per_page: int = Query(10, ge=1, le=100),
     category: str = "",
     status: str = "",
-    query_text: str = "",
+    query_text: str = Query("", alias="query"),
     current_user: User = Depends(require_admin)
 ):
     article_query = db.query(Article)
@@ -88,19 +60,20 @@ async def manage_articles(
         article_query = article_query.filter(Article.status == status)
     if query_text:
         article_query = article_query.filter(Article.title.ilike(f"%{query_text}%"))
-    total_articles = article_query.count()
-    articles = article_query.order_by(Article.date_posted.desc()) \
-        .offset((page - 1) * per_page) \
-        .limit(per_page) \
-        .all()
-    pagination = Pagination(page, per_page, total_articles)
-    categories = [cat[0] for cat in db.query(Article.type).distinct().all()]
+    try:
+        pagination = paginate_keyset(
+            article_query, (Article.date_posted, Article.article_id), per_page, cursor,
+            total=cached_count(article_query, ("admin_articles", category, status, query_text.lower())),
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Tham số phân trang không hợp lệ")
+    categories = category_registry.get_types(db)
     return templates.TemplateResponse(
         "admin/QLBaiViet/index.html",
         {
             "request": request,
-            "articles": articles,
-            "pagination": pagination,  
+            "articles": pagination.items,
+            "pagination": pagination,
             "categories": categories,
             "selected_category": category,
             "selected_status": status,
@@ -117,7 +90,13 @@ async def delete_article(article_id: str, db: Session = Depends(get_db), current
     if not article:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại")
     db.delete(article)
+    # Bình luận và rollup sentiment của bài viết bị xóa cùng transaction
+    remove_article_sentiment(db, article_id)
+    bump_content_version(db)
     db.commit()
+    invalidate_article_fragments()
+    search_engine.remove_article(article_id)
+    search_suggester.remove_article(article_id)
     return {"message": "Xóa bài viết thành công"}
 
 
@@ -257,7 +236,11 @@ async def approve_article(
             detail="Bài viết không tồn tại hoặc không ở trạng thái chờ duyệt"
         )
     article.status = "published"
+    bump_content_version(db)
     db.commit()
+    invalidate_article_fragments(article.type)
+    search_engine.index_article(article)
+    search_suggester.index_article(article)
     return {"message": "Bài viết đã được phê duyệt và chuyển sang trạng thái published", "new_status": article.status}
 
 
@@ -276,7 +259,11 @@ async def reject_article(
             detail="Bài viết không tồn tại hoặc không ở trạng thái chờ duyệt"
         )
     article.status = "rejected"
+    bump_content_version(db)
     db.commit()
+    invalidate_article_fragments()
+    search_engine.remove_article(article_id)
+    search_suggester.remove_article(article_id)
     return {"message": "Bài viết đã bị từ chối"}
 
 
@@ -330,6 +317,31 @@ async def statistics(
     )
 
 
+# Dashboard moderation: trạng thái model và metrics inference
+@router.get("/admin/moderation", response_class=HTMLResponse)
+async def moderation_dashboard(
+    request: Request,
+    current_user: User = Depends(require_admin)
+):
+    return templates.TemplateResponse("admin/moderation_dashboard.html", {"request": request, "user": current_user})
+
+
+# Tổng hợp sentiment bình luận theo bài viết (đọc từ bảng rollup)
+@router.get("/admin/api/sentiment-overview")
+async def sentiment_overview(
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    return {"success": True, "data": get_sentiment_overview(db, limit=limit)}
+
+
+# Hit rate của cache kết quả tìm kiếm (hiển thị trên moderation dashboard)
+@router.get("/admin/api/search-cache")
+async def search_cache_stats(current_user: User = Depends(require_admin)):
+    return {"success": True, "data": search_engine.cache_stats()}
+
+
 # Endpoint 12: Trang cài đặt hệ thống (GET và POST)
 @router.get("/admin/5", response_class=HTMLResponse)
 async def settings_page(
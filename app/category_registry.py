@@ -0,0 +1,110 @@
+"""
+Danh mục bài viết dùng chung cho navbar/topbar/footer và trang admin
+Danh sách slug được cache trong process (TTL) thay vì SELECT DISTINCT type mỗi lần render trang.
+Cache bị xóa khi:
+- Hết TTL (CATEGORY_REGISTRY_TTL giây)
+- Bài viết có type mới được đăng qua /api/upload_news hoặc admin approve_article (note_article_type)
+- Scraper (process khác) ghi bài mới và cập nhật file stamp (CATEGORY_REGISTRY_STAMP)
+"""
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.models import Article
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_REGISTRY_TTL = float(os.getenv("CATEGORY_REGISTRY_TTL", "300"))
+# data_scraping/utils.py ghi cùng file này sau mỗi lần lưu bài viết
+CATEGORY_REGISTRY_STAMP = os.getenv(
+    "CATEGORY_REGISTRY_STAMP", os.path.join(tempfile.gettempdir(), "category_registry.stamp")
+)
+
+# Slug -> tên hiển thị
+CATEGORY_NAMES = {
+    "nhip-song-tre": "Nhịp sống trẻ",
+    "thoi-su": "Thời sự",
+    "xe": "Xe",
+    "kinh-doanh": "Kinh doanh",
+    "giai-tri": "Giải trí",
+    "the-thao": "Thể thao",
+    "chinh-tri": "Chính trị",
+    "phap-luat": "Pháp luật",
+    "suc-khoe": "Sức khỏe",
+    "van-hoa": "Văn hóa",
+    "cong-nghe": "Công nghệ",
+    "du-lich": "Du lịch",
+    "am-nhac": "Âm nhạc",
+    "giao-duc": "Giáo dục",
+    "the-gioi": "Thế giới",
+    "kinh-te-ky-thuat": "Kinh tế & Kỹ thuật",
+}
+
+
+def category_display_name(slug: str) -> str:
+    """Tên hiển thị của danh mục, slug chưa có trong bảng thì format lại từ slug"""
+    slug = slug.lower()
+    return CATEGORY_NAMES.get(slug, slug.replace("-", " ").title())
+
+
+def stamp_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class CategoryRegistry:
+    """Cache danh sách type bài viết, load lại khi hết hạn hoặc bị invalidate"""
+
+    _KEY = "types"
+
+    def __init__(self, ttl: float = CATEGORY_REGISTRY_TTL, stamp_path: str = CATEGORY_REGISTRY_STAMP):
+        """
+        Args:
+            ttl (float): Thời gian sống của danh sách (giây)
+            stamp_path (str): File mà process khác (scraper) cập nhật mtime để báo có dữ liệu mới
+        """
+        self.cache = TTLCache(max_size=1, ttl=ttl)
+        self.stamp_path = stamp_path
+        self._stamp = stamp_mtime(stamp_path)
+
+    def _check_stamp(self):
+        stamp = stamp_mtime(self.stamp_path)
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self.invalidate()
+
+    def get_types(self, db: Session) -> List[str]:
+        """Danh sách type (giữ nguyên giá trị trong DB), chỉ query khi cache trống"""
+        self._check_stamp()
+        types = self.cache.get(self._KEY)
+        if types is None:
+            types = [row[0] for row in db.query(Article.type).distinct().all() if row[0]]
+            self.cache.set(self._KEY, types)
+        return types
+
+    def get_categories(self, db: Session) -> List[Dict[str, str]]:
+        """Danh sách {"slug", "name"} cho navbar"""
+        return [{"slug": t.lower(), "name": category_display_name(t)} for t in self.get_types(db)]
+
+    def invalidate(self):
+        """Bỏ danh sách đang cache, request sau sẽ query lại"""
+        self.cache.clear()
+
+    def note_article_type(self, article_type: Optional[str]):
+        """Gọi sau khi commit bài viết: type chưa có trong cache thì invalidate"""
+        if not article_type:
+            return
+        types = self.cache.get(self._KEY)
+        if types is not None and article_type not in types:
+            logger.info(f"🔄 Danh mục mới '{article_type}', làm mới category registry")
+            self.invalidate()
+
+
+# Singleton instance dùng chung cho các router
+category_registry = CategoryRegistry()
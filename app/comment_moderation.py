@@ -248,7 +248,8 @@ class CommentModerationService:
     def _save_comment_to_database(self, comment_data: Dict[str, Any], label: int):
         """Lưu comment vào database"""
         from app.database import SessionLocal
-        from app.models import Comment, Article
+        from app.models import Comment, Article, COMMENT_STATUS_ACTIVE
+        from app.sentiment_rollup import record_new_comment
         
         db = SessionLocal()
         try:
@@ -263,25 +264,20 @@ class CommentModerationService:
                 user_id=comment_data["user_id"],
                 content=comment_data["content"],
                 parent_id=comment_data.get("parent_id"),
+                status=COMMENT_STATUS_ACTIVE,
                 sentiment="positive" if label == 0 else "negative",  # Map label to sentiment
                 sentiment_confidence=0.9  # High confidence vì đã qua Colab
             )
             
             db.add(new_comment)
+            # Rollup sentiment được cộng trong cùng transaction với bình luận
+            record_new_comment(db, new_comment)
             
             # Cập nhật count cho article
             article.comments_count = db.query(Comment).filter(Comment.article_id == comment_data["article_id"]).count() + 1
             
             db.commit()
             
-            # Lưu vào CSV để training
-            from app.utils import save_comment_to_csv
-            save_comment_to_csv(
-                comment_data["content"], 
-                "moderated_comment", 
-                comment_data["article_id"]
-            )
-            
         except Exception as e:
             db.rollback()
             raise e
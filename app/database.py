@@ -16,8 +16,13 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set.")
 
+def create_db_engine(database_url: str, **kwargs):
+    """Tạo engine; connect_timeout chỉ áp dụng cho driver mạng (SQLite không hỗ trợ)"""
+    connect_args = {} if database_url.startswith("sqlite") else {"connect_timeout": 5}
+    return create_engine(database_url, connect_args=connect_args, **kwargs)
+
 # Tạo engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"connect_timeout": 5})
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 
 # Tạo session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,94 @@
+"""
+Cache HTML đã render cho các khối dùng chung giữa mọi người dùng
+(khối bài viết trang chủ, danh sách bài viết theo danh mục, menu danh mục ở navbar/footer).
+Template trang chỉ còn render phần header theo người dùng cho mỗi request.
+Cache bị xóa khi bài viết được đăng/duyệt/từ chối/xóa (invalidate_article_fragments),
+khi phiên bản nội dung trong DB đổi (worker khác hoặc scraper ghi, xem sync_version),
+khi scraper cập nhật file stamp, hoặc sau FRAGMENT_CACHE_TTL giây
+"""
+import logging
+import os
+from typing import Callable, Dict, Hashable, Optional
+
+from markupsafe import Markup
+
+from app.cache import TTLCache
+from app.category_registry import CATEGORY_REGISTRY_STAMP, stamp_mtime, category_registry
+
+logger = logging.getLogger(__name__)
+
+FRAGMENT_CACHE_TTL = float(os.getenv("FRAGMENT_CACHE_TTL", "120"))
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "512"))
+
+
+class FragmentCache:
+    """Cache khối HTML theo key (ví dụ ("home",), ("category", slug, cursor))"""
+
+    def __init__(self, max_size: int = FRAGMENT_CACHE_SIZE, ttl: float = FRAGMENT_CACHE_TTL,
+                 stamp_path: str = CATEGORY_REGISTRY_STAMP):
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.stamp_path = stamp_path
+        self._stamp = stamp_mtime(stamp_path)
+        # Phiên bản nội dung (bảng settings) lần cuối thấy, None nếu chưa đọc lần nào
+        self._content_version = None
+        # Tăng mỗi lần invalidate (chỉ để theo dõi qua stats)
+        self.generation = 0
+
+    def _check_stamp(self):
+        stamp = stamp_mtime(self.stamp_path)
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self.invalidate()
+
+    def sync_version(self, content_version: Optional[str]):
+        """
+        Xóa cache khi phiên bản nội dung trong DB khác lần trước (route gọi với giá trị vừa đọc cho validator)
+
+        Nhờ vậy worker không tự invalidate (thay đổi xảy ra ở worker khác) không render khối cũ với ETag mới
+        """
+        if content_version != self._content_version:
+            if self._content_version is not None:
+                self.invalidate()
+            self._content_version = content_version
+
+    def render(self, templates, key: Hashable, template_name: str, build_context: Callable[[], Dict]) -> Markup:
+        """
+        Lấy khối HTML từ cache, hoặc chạy build_context (các query) rồi render template
+
+        Args:
+            templates (Jinja2Templates): Bộ template của router
+            key (Hashable): Key của khối
+            template_name (str): Template partial, không phụ thuộc người dùng
+            build_context (Callable): Trả về context của partial, chỉ được gọi khi cache miss
+
+        Returns:
+            Markup: HTML đã render (không bị escape lại khi chèn vào template trang)
+        """
+        self._check_stamp()
+        html = self.cache.get(key)
+        if html is None:
+            html = Markup(templates.get_template(template_name).render(**build_context()))
+            self.cache.set(key, html)
+        return html
+
+    def invalidate(self):
+        self.cache.clear()
+        self.generation += 1
+
+    def stats(self) -> Dict:
+        return {**self.cache.stats(), "generation": self.generation}
+
+
+# Singleton instance dùng chung cho các router
+fragment_cache = FragmentCache()
+
+
+def invalidate_article_fragments(article_type: str = None):
+    """
+    Gọi sau khi commit thay đổi bài viết (đăng, duyệt, từ chối, xóa)
+
+    Args:
+        article_type (str, optional): type của bài viết, để làm mới danh mục nếu là type mới
+    """
+    fragment_cache.invalidate()
+    category_registry.note_article_type(article_type)
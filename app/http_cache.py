@@ -0,0 +1,123 @@
+"""
+HTTP conditional GET cho các trang HTML công khai (trang chủ, danh mục, tất cả bài viết, chi tiết bài viết)
+Mỗi route tính validator rẻ (timestamp thay đổi gần nhất + phiên bản nội dung lưu trong DB) trước các query nặng;
+nếu If-None-Match / If-Modified-Since của client hoặc reverse proxy còn khớp thì trả 304 ngay.
+Phiên bản nội dung nằm trong bảng settings nên mọi worker uvicorn (và scraper) thấy cùng một giá trị.
+Trang có header theo người dùng nên luôn gửi Vary: Cookie, ETag phụ thuộc id người dùng đăng nhập
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Settings
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+# Dòng settings đổi giá trị mỗi khi bài viết được đăng/duyệt/từ chối/xóa
+CONTENT_VERSION_KEY = "content_version"
+
+
+def content_version_query():
+    """Scalar subquery đọc phiên bản nội dung, ghép được vào query validator của route"""
+    return select(Settings.value).where(Settings.setting_key == CONTENT_VERSION_KEY).scalar_subquery()
+
+
+def bump_content_version(db: Session):
+    """
+    Đổi phiên bản nội dung (gọi trước khi commit thay đổi bài viết, cùng transaction)
+
+    Giá trị mới chỉ cần khác giá trị cũ nên ghi thẳng, không read-modify-write.
+    Hàm không commit: caller commit cùng với thay đổi của bài viết.
+    """
+    table = Settings.__table__
+    value = str(time.time_ns())
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        statement = insert(table).values(setting_key=CONTENT_VERSION_KEY, value=value)
+        db.execute(statement.on_conflict_do_update(index_elements=[table.c.setting_key], set_={"value": value}))
+        return
+
+    result = db.execute(table.update().where(table.c.setting_key == CONTENT_VERSION_KEY).values(value=value))
+    if result.rowcount == 0:
+        db.execute(table.insert().values(setting_key=CONTENT_VERSION_KEY, value=value))
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Cột DateTime lưu giờ UTC không kèm timezone (datetime.utcnow)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+class Validators:
+    """ETag + Last-Modified của một trang"""
+
+    def __init__(self, request: Request, parts: Iterable, timestamps: Iterable[Optional[datetime]] = (),
+                 user_key: Optional[Hashable] = None):
+        """
+        Args:
+            request (Request): Request hiện tại (lấy header điều kiện)
+            parts (Iterable): Các giá trị xác định nội dung trang (id, cursor, phiên bản nội dung, ...)
+            timestamps (Iterable[datetime]): Thời điểm thay đổi gần nhất của dữ liệu trên trang
+            user_key (Hashable, optional): Định danh ổn định của người dùng đăng nhập (id), None nếu ẩn danh
+        """
+        self.request = request
+        timestamps = [_as_utc(ts) for ts in timestamps if ts is not None]
+        self.last_modified = max(timestamps) if timestamps else None
+        # Người dùng khác nhau thấy header khác nhau: id người dùng (không phải cookie thô) là một phần của ETag
+        user_part = "" if user_key is None else f"user:{user_key}"
+        digest = hashlib.sha1(
+            "|".join(str(part) for part in (*parts, self.last_modified, user_part)).encode("utf-8")
+        ).hexdigest()[:20]
+        self.etag = f'W/"{digest}"'
+        self.personalised = user_key is not None
+
+    def is_fresh(self) -> bool:
+        """Bản client đang giữ còn đúng không (If-None-Match ưu tiên hơn If-Modified-Since)"""
+        if_none_match = self.request.headers.get("if-none-match")
+        if if_none_match is not None:
+            candidates = [tag.strip() for tag in if_none_match.split(",")]
+            # So sánh yếu: bỏ tiền tố W/
+            return "*" in candidates or self.etag[2:] in [tag.removeprefix("W/") for tag in candidates]
+
+        if_modified_since = self.request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.last_modified <= since
+        return False
+
+    def apply(self, response: Response, max_age: int = HTTP_CACHE_MAX_AGE) -> Response:
+        """Gắn ETag, Last-Modified, Cache-Control và Vary vào response"""
+        response.headers["ETag"] = self.etag
+        if self.last_modified is not None:
+            response.headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        if self.personalised:
+            # Trang có tên/avatar người dùng: chỉ browser được cache và phải hỏi lại server mỗi lần
+            response.headers["Cache-Control"] = "private, no-cache"
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={max_age}, must-revalidate"
+        response.headers["Vary"] = "Cookie"
+        return response
+
+    def not_modified(self) -> Optional[Response]:
+        """Response 304 nếu client còn bản mới nhất, ngược lại None (route tiếp tục render)"""
+        if self.is_fresh():
+            return self.apply(Response(status_code=304))
+        return None
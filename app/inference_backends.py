@@ -0,0 +1,315 @@
+"""
+Các backend inference CPU cho PhoBERT
+- torch: model fp32 gốc của HuggingFace
+- torch-int8: dynamic int8 quantization các lớp Linear (kiểm tra với fp32 trước khi dùng)
+- onnx: graph ONNX được export một lần và chạy bằng ONNX Runtime
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+
+from app.utils import load_comment_texts
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch-int8"
+BACKEND_ONNX = "onnx"
+AVAILABLE_BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX)
+
+ONNX_SUBDIR = "onnx"
+ONNX_FILENAME = "model.onnx"
+ONNX_OPSET = 14
+
+# Ngưỡng sai lệch logits tối đa khi validate graph ONNX so với torch
+ONNX_MAX_ABS_DIFF = 1e-3
+# int8 làm tròn weights nên lệch nhiều hơn ONNX; label vẫn phải trùng với fp32
+INT8_MAX_ABS_DIFF = float(os.getenv("INT8_MAX_ABS_DIFF", "0.5"))
+
+# Thư mục bình luận dùng để fine-tune: không được dùng làm tập held-out khi đo độ đồng thuận
+TRAINING_DATA_DIR = Path("data_training")
+
+VALIDATION_SAMPLES = [
+    "Bài viết rất hay và bổ ích",
+    "Tin này sai sự thật, phóng viên viết ẩu quá",
+    "Cảm ơn tác giả",
+]
+
+
+class TorchBackend:
+    """Chạy model PyTorch fp32 như HuggingFace load lên"""
+
+    name = BACKEND_TORCH
+
+    def __init__(self, model, device: torch.device):
+        self.model = model
+        self.device = device
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """
+        Chạy forward pass và trả về logits trên CPU
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): Output của tokenizer (return_tensors="pt")
+
+        Returns:
+            torch.Tensor: Logits shape (batch, num_labels)
+        """
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            return self.model(**inputs).logits.cpu()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """Dynamic int8 quantization các lớp Linear (chỉ hỗ trợ CPU)"""
+
+    name = BACKEND_TORCH_INT8
+
+    def __init__(self, model, device: torch.device):
+        if device.type != "cpu":
+            logger.warning("⚠️ Dynamic int8 chỉ hỗ trợ CPU, chuyển model về CPU")
+            model.to("cpu")
+        # inplace=True để không giữ song song bản fp32 trong bộ nhớ
+        quantized = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+        super().__init__(quantized, torch.device("cpu"))
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wrapper để graph ONNX chỉ có một output là logits"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def get_onnx_path(model_path: Path) -> Path:
+    """Đường dẫn file ONNX tương ứng với thư mục model"""
+    return Path(model_path) / ONNX_SUBDIR / ONNX_FILENAME
+
+
+def export_onnx(model, tokenizer, output_path: Path) -> Path:
+    """
+    Export model HuggingFace sang ONNX với batch/sequence động
+
+    Args:
+        model: Model PyTorch fp32 ở chế độ eval
+        tokenizer: Tokenizer tương ứng
+        output_path (Path): Nơi lưu file .onnx
+
+    Returns:
+        Path: Đường dẫn file đã export
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    sample = tokenizer(VALIDATION_SAMPLES[:2], return_tensors="pt", padding=True,
+                       truncation=True, max_length=256)
+    wrapper = _LogitsOnly(model.to("cpu")).eval()
+
+    logger.info(f"🔄 Đang export PhoBERT sang ONNX: {output_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(output_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+        )
+    return output_path
+
+
+class OnnxBackend:
+    """Chạy graph ONNX đã export bằng ONNX Runtime (CPUExecutionProvider)"""
+
+    name = BACKEND_ONNX
+
+    def __init__(self, onnx_path: Path, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+
+        self.onnx_path = Path(onnx_path)
+        self.session = ort.InferenceSession(
+            str(self.onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(["logits"], feed)[0])
+
+
+def _onnx_is_stale(onnx_path: Path, model_path: Path) -> bool:
+    """Graph ONNX cần export lại nếu chưa có hoặc cũ hơn weights"""
+    weights = Path(model_path) / "model.safetensors"
+    if not onnx_path.exists():
+        return True
+    return weights.exists() and weights.stat().st_mtime > onnx_path.stat().st_mtime
+
+
+def _validation_inputs(tokenizer) -> Dict[str, torch.Tensor]:
+    return tokenizer(VALIDATION_SAMPLES, return_tensors="pt", padding=True, truncation=True, max_length=256)
+
+
+def reference_logits(reference: TorchBackend, tokenizer) -> torch.Tensor:
+    """Logits fp32 trên các câu mẫu (tính trước khi model bị lượng tử hóa inplace)"""
+    return reference.logits(_validation_inputs(tokenizer))
+
+
+def validate_backend(backend, expected: torch.Tensor, tokenizer,
+                     max_abs_diff: float = ONNX_MAX_ABS_DIFF) -> float:
+    """
+    So sánh logits của backend với logits fp32 trên vài câu mẫu
+
+    Args:
+        expected (torch.Tensor): Kết quả reference_logits của model fp32
+
+    Returns:
+        float: Sai lệch tuyệt đối lớn nhất
+
+    Raises:
+        ValueError: Nếu label khác fp32 hoặc sai lệch vượt ngưỡng cho phép
+    """
+    logits = backend.logits(_validation_inputs(tokenizer))
+    if not torch.equal(logits.argmax(dim=-1), expected.argmax(dim=-1)):
+        raise ValueError(f"Backend {backend.name} cho label khác fp32 trên câu mẫu")
+    diff = (logits - expected).abs().max().item()
+    if diff > max_abs_diff:
+        raise ValueError(f"Backend {backend.name} lệch {diff:.5f} so với fp32 (ngưỡng {max_abs_diff})")
+    return diff
+
+
+def create_backend(name: str, model, tokenizer, model_path: Path, device: torch.device):
+    """
+    Tạo backend inference theo tên cấu hình
+
+    Args:
+        name (str): Một trong AVAILABLE_BACKENDS
+        model: Model PyTorch fp32 vừa load
+        tokenizer: Tokenizer tương ứng
+        model_path (Path): Thư mục model (dùng để lưu graph ONNX)
+        device (torch.device): Device cho backend torch
+
+    Returns:
+        Backend có method logits(inputs)
+    """
+    if name == BACKEND_TORCH:
+        return TorchBackend(model, device)
+
+    if name == BACKEND_TORCH_INT8:
+        # quantize_dynamic sửa model inplace: lấy logits fp32 trước khi lượng tử hóa
+        expected = reference_logits(TorchBackend(model, device), tokenizer)
+        backend = QuantizedTorchBackend(model, device)
+        diff = validate_backend(backend, expected, tokenizer, max_abs_diff=INT8_MAX_ABS_DIFF)
+        logger.info(f"✅ Model int8 hợp lệ (max |Δlogits| = {diff:.2e})")
+        return backend
+
+    if name == BACKEND_ONNX:
+        onnx_path = get_onnx_path(model_path)
+        if _onnx_is_stale(onnx_path, model_path):
+            export_onnx(model, tokenizer, onnx_path)
+            backend = OnnxBackend(onnx_path)
+            try:
+                expected = reference_logits(TorchBackend(model, torch.device("cpu")), tokenizer)
+                diff = validate_backend(backend, expected, tokenizer)
+            except ValueError:
+                # Không giữ lại graph sai để lần load sau không dùng nhầm
+                onnx_path.unlink(missing_ok=True)
+                raise
+            logger.info(f"✅ Graph ONNX hợp lệ (max |Δlogits| = {diff:.2e})")
+            return backend
+        return OnnxBackend(onnx_path)
+
+    raise ValueError(f"Backend không hợp lệ: {name}. Chọn một trong {AVAILABLE_BACKENDS}")
+
+
+def compare_backends(texts: List[str], predictions: Dict[str, List[List[float]]],
+                     latencies: Dict[str, float]) -> Dict[str, Dict]:
+    """
+    Tính độ đồng thuận label của từng backend so với fp32
+
+    Args:
+        texts (List[str]): Tập held-out đã dùng
+        predictions (Dict): backend -> xác suất từng văn bản
+        latencies (Dict): backend -> tổng thời gian chạy (giây)
+
+    Returns:
+        Dict: backend -> agreement, max_prob_diff, ms_per_comment
+    """
+    reference = predictions[BACKEND_TORCH]
+    ref_labels = [max(range(len(p)), key=p.__getitem__) for p in reference]
+    report = {}
+
+    for name, probs in predictions.items():
+        labels = [max(range(len(p)), key=p.__getitem__) for p in probs]
+        agree = sum(1 for a, b in zip(labels, ref_labels) if a == b)
+        max_diff = max(
+            (abs(a - b) for row, ref_row in zip(probs, reference) for a, b in zip(row, ref_row)),
+            default=0.0,
+        )
+        report[name] = {
+            "agreement": round(agree / len(texts), 4) if texts else 1.0,
+            "max_prob_diff": round(max_diff, 5),
+            "ms_per_comment": round(latencies[name] * 1000 / len(texts), 3) if texts else 0.0,
+            "samples": len(texts),
+        }
+
+    return report
+
+
+def time_call(fn, *args):
+    """Chạy fn và trả về (kết quả, số giây)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def load_heldout_texts(pattern: str) -> List[str]:
+    """
+    Đọc tập held-out để đo độ đồng thuận int8/ONNX so với fp32
+
+    Raises:
+        ValueError: Nếu pattern trỏ vào dữ liệu fine-tune (TRAINING_DATA_DIR) hoặc không khớp file nào
+    """
+    paths = [Path(path).resolve() for path in glob.glob(pattern)]
+    training_dir = TRAINING_DATA_DIR.resolve()
+    if any(training_dir in path.parents for path in paths):
+        raise ValueError(f"{pattern} nằm trong {TRAINING_DATA_DIR}/ (dữ liệu fine-tune), cần tập held-out riêng")
+    if not paths:
+        raise ValueError(f"Không có file held-out nào khớp {pattern}")
+    return load_comment_texts(pattern)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export/validate backend PhoBERT và so sánh với fp32")
+    parser.add_argument("--model-path", default="phobert_toxic_comment_model")
+    parser.add_argument("--heldout", required=True,
+                        help=f"Glob các file JSONL held-out (không nằm trong {TRAINING_DATA_DIR}/)")
+    parser.add_argument("--backends", default=",".join(AVAILABLE_BACKENDS))
+    args = parser.parse_args()
+
+    from app.phobert_service import PhoBERTService
+
+    service = PhoBERTService(model_path=args.model_path, backend=BACKEND_TORCH)
+    report = service.evaluate_backends(load_heldout_texts(args.heldout), backends=args.backends.split(","))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
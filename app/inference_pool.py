@@ -0,0 +1,124 @@
+"""
+Chạy PhoBERT trong các worker process riêng, tách khỏi event loop của uvicorn
+Web process chỉ gửi batch văn bản qua IPC và chờ future, không giữ model trong RAM
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv("MODERATION_WORKERS", "2"))
+DEFAULT_WORKER_THREADS = int(os.getenv("MODERATION_WORKER_THREADS", "1"))
+
+
+class WorkerPoolUnavailable(RuntimeError):
+    """
+    Worker process không chạy được PhoBERT (import torch/transformers lỗi trong worker, worker chết liên tục)
+    Không phải ImportError: bình luận đi đường tầng rẻ/chờ duyệt như khi quá tải, không được lưu thẳng
+    """
+
+
+# Service và cascade riêng của mỗi worker process (khởi tạo trong _init_worker)
+_worker_service = None
+_worker_cascade = None
+
+
+def _init_worker(torch_threads: int, model_path: str, backend: Optional[str]):
+    """Chạy một lần trong mỗi worker: cố định số thread torch và load model"""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+
+    from app.phobert_service import PhoBERTService
+    from app.moderation_cascade import ModerationCascade
+    from app.sentiment_analyzer import get_sentiment_analyzer
+
+    global _worker_service, _worker_cascade
+    _worker_service = PhoBERTService(model_path=model_path, backend=backend)
+    if _worker_service.is_loaded:
+        _worker_service.warm_up()
+    get_sentiment_analyzer()
+    _worker_cascade = ModerationCascade(phobert_getter=lambda: _worker_service)
+
+
+def _worker_predict(texts: List[str], full_model: bool = False) -> Tuple[List[Dict], Dict]:
+    """
+    Phân loại một batch trong worker process (qua cascade, hoặc chỉ PhoBERT nếu full_model)
+
+    Returns:
+        Tuple[List[Dict], Dict]: (kết quả, metrics của batch + thống kê cache để web process merge)
+    """
+    from app.moderation_metrics import moderation_metrics
+
+    results = _worker_cascade.classify_batch(texts, full_model=full_model)
+    metrics = moderation_metrics.drain()
+    metrics["pid"] = os.getpid()
+    metrics["cache"] = _worker_service.result_cache.stats()
+    return results, metrics
+
+
+def _worker_info() -> Dict:
+    """Thông tin model của worker (dùng khi kiểm tra readiness)"""
+    info = _worker_service.get_model_info()
+    return {"pid": os.getpid(), "is_loaded": info["is_loaded"], "backend": info["backend"],
+            "device": info["device"]}
+
+
+class ProcessInferencePool:
+    """Pool nhỏ các worker process, mỗi worker giữ một bản PhoBERT"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, torch_threads: int = DEFAULT_WORKER_THREADS,
+                 model_path: str = "phobert_toxic_comment_model", backend: Optional[str] = None):
+        """
+        Args:
+            workers (int): Số worker process
+            torch_threads (int): Số thread torch của mỗi worker
+            model_path (str): Thư mục model PhoBERT
+            backend (str, optional): Backend inference cho worker (mặc định PHOBERT_BACKEND)
+        """
+        self.workers = max(1, workers)
+        self.torch_threads = max(1, torch_threads)
+        self.model_path = model_path
+        self.backend = backend
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            logger.info(f"🔄 Khởi động {self.workers} PhoBERT worker process ({self.torch_threads} thread/worker)")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: worker không thừa hưởng state của uvicorn/event loop
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.torch_threads, self.model_path, self.backend),
+            )
+        return self._executor
+
+    def start(self) -> List[Dict]:
+        """
+        Khởi động các worker và chờ chúng load model xong (blocking, gọi từ background thread)
+
+        Returns:
+            List[Dict]: Thông tin model của các worker đã phản hồi
+        """
+        executor = self._ensure_executor()
+        try:
+            futures = [executor.submit(_worker_info) for _ in range(self.workers)]
+            return [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            self.shutdown()
+            raise WorkerPoolUnavailable(f"Worker process không khởi động được: {e}") from e
+
+    def submit(self, texts: List[str], full_model: bool = False) -> Future:
+        """Gửi một batch sang worker, trả về concurrent.futures.Future"""
+        return self._ensure_executor().submit(_worker_predict, texts, full_model)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,280 @@
+"""
+Hàng đợi inference bất đồng bộ cho moderation bình luận
+Gom các request đồng thời thành một batch PhoBERT và chạy ngoài event loop
+- thread: model chạy trong một thread của web process (mặc định)
+- process: model chạy trong pool worker process riêng (app.inference_pool)
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+
+from app.moderation_metrics import moderation_metrics
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình mặc định, có thể ghi đè bằng biến môi trường
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("MODERATION_MAX_BATCH_SIZE", "16"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("MODERATION_MAX_WAIT_MS", "10"))
+DEFAULT_MAX_QUEUE = int(os.getenv("MODERATION_MAX_QUEUE", "256"))
+INFERENCE_MODE = os.getenv("MODERATION_INFERENCE_MODE", "thread")
+
+
+class InferenceQueueFull(Exception):
+    """Queue moderation đã đầy, endpoint nên trả về 503"""
+
+
+def _predict_with_phobert(texts: List[str], full_model: bool = False) -> List[Dict]:
+    """
+    Chạy cascade từ khóa -> sentiment -> PhoBERT cho một batch (được gọi trong thread executor)
+    full_model=True: bỏ qua tầng sentiment, dùng khi chấm lại bình luận đã được tầng rẻ tạm duyệt
+    """
+    # Import tại đây để torch/transformers không bao giờ được import trên event loop
+    from app.moderation_cascade import classify_comments_cascade
+    return classify_comments_cascade(texts, full_model=full_model)
+
+
+class ThreadRunner:
+    """Chạy hàm predict đồng bộ trong một thread riêng của web process"""
+
+    concurrency = 1
+
+    def __init__(self, predict_fn: Callable[[List[str], bool], List[Dict]] = _predict_with_phobert):
+        self.predict_fn = predict_fn
+        # Model chạy tuần tự trong một thread riêng, không chặn event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phobert-inference")
+
+    async def run(self, texts: List[str], full_model: bool = False) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.predict_fn, texts, full_model)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class ProcessRunner:
+    """
+    Gửi batch sang pool worker process qua IPC, mỗi worker xử lý một batch một lúc
+    Pool chỉ được tạo khi server khởi động (model_lifecycle gọi start) hoặc ở batch đầu tiên,
+    worker chết (BrokenProcessPool) thì pool được tạo lại và batch được chạy lại một lần
+    """
+
+    def __init__(self, pool_factory: Optional[Callable] = None, workers: Optional[int] = None):
+        """
+        Args:
+            pool_factory (Callable, optional): Tạo ProcessInferencePool (mặc định theo biến môi trường)
+            workers (int, optional): Số worker, mặc định MODERATION_WORKERS
+        """
+        from app.inference_pool import DEFAULT_WORKERS, ProcessInferencePool
+
+        self.concurrency = max(1, workers or DEFAULT_WORKERS)
+        self._pool_factory = pool_factory or (lambda: ProcessInferencePool(workers=self.concurrency))
+        self.pool = None
+        self._lock = threading.Lock()
+
+    def ensure_pool(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = self._pool_factory()
+            return self.pool
+
+    def _replace_pool(self, broken):
+        """Bỏ pool hỏng; batch khác có thể đã thay pool trước đó"""
+        with self._lock:
+            if self.pool is broken:
+                broken.shutdown()
+                self.pool = None
+
+    def start(self) -> List[Dict]:
+        """Tạo pool và chờ worker load model xong (blocking, gọi từ background thread lúc khởi động)"""
+        return self.ensure_pool().start()
+
+    async def run(self, texts: List[str], full_model: bool = False) -> List[Dict]:
+        from app.inference_pool import WorkerPoolUnavailable
+
+        for attempt in range(2):
+            pool = self.ensure_pool()
+            try:
+                results, metrics = await asyncio.wrap_future(pool.submit(texts, full_model))
+            except BrokenProcessPool as e:
+                self._replace_pool(pool)
+                if attempt:
+                    # Lỗi lặp lại sau khi tạo lại pool (thường là import torch/transformers lỗi trong worker)
+                    raise WorkerPoolUnavailable(f"PhoBERT worker process không khả dụng: {e}") from e
+                logger.warning(f"⚠️ Worker process bị dừng đột ngột ({e}), tạo lại pool và chạy lại batch")
+                continue
+            # Histogram tokenize/forward, quyết định và cache được ghi trong worker: đưa về web process
+            moderation_metrics.merge(metrics)
+            return results
+
+    def shutdown(self):
+        with self._lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+
+class InferenceDispatcher:
+    """Gom các request phân loại đồng thời thành micro-batch"""
+
+    def __init__(self, runner=None, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, max_queue: int = DEFAULT_MAX_QUEUE):
+        """
+        Khởi tạo dispatcher
+
+        Args:
+            runner: ThreadRunner/ProcessRunner thực thi batch (mặc định ThreadRunner)
+            max_batch_size (int): Số bình luận tối đa trong một forward pass
+            max_wait_ms (float): Thời gian tối đa chờ gom thêm request (ms)
+            max_queue (int): Số request chờ tối đa, vượt quá sẽ raise InferenceQueueFull
+        """
+        self.runner = runner or ThreadRunner()
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max(1, max_queue)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = set()
+
+    def _ensure_worker(self):
+        """Tạo queue và worker task trên event loop hiện tại nếu chưa có"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._slots = asyncio.Semaphore(self.runner.concurrency)
+            self._worker = loop.create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        """Số request đang chờ trong queue"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, text: str, full_model: bool = False) -> Dict:
+        """
+        Gửi một bình luận vào queue và chờ kết quả phân loại
+
+        Args:
+            text (str): Nội dung bình luận
+            full_model (bool): Bỏ qua tầng sentiment của cascade, luôn chạy PhoBERT
+
+        Returns:
+            Dict: Kết quả phân loại (cùng định dạng với predict_single)
+
+        Raises:
+            InferenceQueueFull: Nếu đã có max_queue request đang chờ
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        moderation_metrics.observe("queue_depth", self._queue.qsize())
+        try:
+            self._queue.put_nowait((text, future, full_model))
+        except asyncio.QueueFull:
+            raise InferenceQueueFull(f"Moderation queue đầy ({self.max_queue} request đang chờ)")
+        return await future
+
+    async def _collect_batch(self) -> List:
+        """Lấy item đầu tiên rồi gom thêm cho tới khi đủ batch hoặc hết thời gian chờ"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Lấy ngay những item đã có sẵn trong queue
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Vòng lặp worker: chờ runner rảnh -> gom batch -> chạy batch song song với batch trước"""
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = self._loop.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List):
+        """Chạy một batch trên runner và trả kết quả cho từng future"""
+        moderation_metrics.observe("microbatch_size", len(batch))
+        try:
+            # Request chấm lại (full_model) chạy thành một lần gọi riêng, không qua tầng sentiment
+            for full_model in (False, True):
+                group = [(text, future) for text, future, flag in batch if flag == full_model]
+                if group:
+                    await self._run_group(group, full_model)
+        finally:
+            self._slots.release()
+
+    async def _run_group(self, group: List, full_model: bool):
+        texts = [text for text, _ in group]
+        try:
+            results = await self.runner.run(texts, full_model=full_model)
+        except asyncio.CancelledError:
+            for _, future in group:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Lỗi khi chạy inference batch: {e}")
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def shutdown(self):
+        """Dừng worker và giải phóng runner"""
+        tasks = [t for t in (self._worker, *self._in_flight) if t is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self.runner.shutdown()
+
+
+def _create_runner():
+    if INFERENCE_MODE == "process":
+        return ProcessRunner()
+    return ThreadRunner()
+
+
+# Singleton instance dùng chung cho các endpoint bình luận
+inference_dispatcher = InferenceDispatcher(runner=_create_runner())
+
+async def classify_comment_async(text: str) -> Dict:
+    """
+    Hàm helper bất đồng bộ để phân loại một bình luận qua micro-batch queue
+
+    Args:
+        text (str): Nội dung bình luận
+
+    Returns:
+        Dict: Kết quả phân loại
+    """
+    return await inference_dispatcher.submit(text)
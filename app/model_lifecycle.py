@@ -0,0 +1,153 @@
+"""
+Quản lý vòng đời các model ML (PhoBERT, sentiment)
+Load + warm-up trong background thread để không request nào phải chờ load model
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+STATUS_IDLE = "idle"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+def _load_phobert() -> Dict:
+    """Import torch/transformers, load PhoBERT và chạy warm-up forward pass"""
+    from app.inference_queue import inference_dispatcher, ProcessRunner
+
+    # Chế độ process: model nằm trong worker process, web process không load model
+    if isinstance(inference_dispatcher.runner, ProcessRunner):
+        workers = inference_dispatcher.runner.start()
+        if not all(worker["is_loaded"] for worker in workers):
+            raise RuntimeError("PhoBERT model không khả dụng trong worker process")
+        return {
+            "mode": "process",
+            "device": workers[0]["device"],
+            "backend": workers[0]["backend"],
+            "worker_pids": [worker["pid"] for worker in workers],
+        }
+
+    from app.phobert_service import get_phobert_service
+
+    service = get_phobert_service()
+    if not service.is_loaded:
+        raise RuntimeError("PhoBERT model không khả dụng")
+    warmup_seconds = service.warm_up()
+    info = service.get_model_info()
+    return {
+        "mode": "thread",
+        "device": info["device"],
+        "backend": info["backend"],
+        "warmup_ms": round(warmup_seconds * 1000, 1),
+    }
+
+
+def _load_sentiment() -> Dict:
+    """Load vectorizer + classifier sentiment (joblib)"""
+    from app.sentiment_analyzer import get_sentiment_analyzer
+
+    analyzer = get_sentiment_analyzer()
+    if not analyzer.is_loaded:
+        raise RuntimeError("Sentiment model không khả dụng")
+    analyzer.predict_sentiment("khởi động")
+    return {"model_dir": str(analyzer.model_dir)}
+
+
+class ModelLifecycle:
+    """Theo dõi trạng thái loading/ready của từng model và load chúng trong background"""
+
+    def __init__(self, loaders: Dict[str, Callable[[], Dict]], required=()):
+        """
+        Args:
+            loaders (Dict[str, Callable]): Tên model -> hàm load, trả về dict thông tin
+            required (Iterable[str]): Các model bắt buộc phải ready thì worker mới ready
+        """
+        self._loaders = loaders
+        self._required = tuple(required)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = {
+            name: {"status": STATUS_IDLE, "error": None, "load_seconds": None, "ready_at": None, "info": {}}
+            for name in loaders
+        }
+
+    def start_background_loading(self) -> bool:
+        """
+        Bắt đầu load tất cả model trong một daemon thread (gọi nhiều lần không sao)
+
+        Returns:
+            bool: True nếu thread mới được khởi động
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            for state in self._state.values():
+                state["status"] = STATUS_LOADING
+            self._thread = threading.Thread(target=self._load_all, name="model-loader", daemon=True)
+            self._thread.start()
+        return True
+
+    def _load_all(self):
+        for name, loader in self._loaders.items():
+            start = time.perf_counter()
+            try:
+                info = loader() or {}
+            except Exception as e:
+                logger.error(f"❌ Không load được model {name}: {e}")
+                self._update(name, status=STATUS_FAILED, error=str(e),
+                             load_seconds=round(time.perf_counter() - start, 2))
+                continue
+            self._update(name, status=STATUS_READY, info=info,
+                         load_seconds=round(time.perf_counter() - start, 2),
+                         ready_at=datetime.utcnow().isoformat())
+            logger.info(f"✅ Model {name} sẵn sàng sau {time.perf_counter() - start:.2f}s")
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self._state[name].update(fields)
+
+    def status_of(self, name: str) -> str:
+        """Trạng thái hiện tại của một model (idle/loading/ready/failed)"""
+        with self._lock:
+            return self._state[name]["status"]
+
+    def is_ready(self, name: str) -> bool:
+        return self.status_of(name) == STATUS_READY
+
+    def is_pending(self, name: str) -> bool:
+        """Model chưa load xong nhưng cũng chưa lỗi"""
+        return self.status_of(name) in (STATUS_IDLE, STATUS_LOADING)
+
+    def wait_until_settled(self, timeout: float = None) -> bool:
+        """Chờ thread load kết thúc (dùng cho script/CLI, không dùng trong request)"""
+        thread = self._thread
+        if thread is None:
+            return False
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def get_status(self) -> Dict:
+        """
+        Snapshot trạng thái của tất cả model
+
+        Returns:
+            Dict: ready (bool) và trạng thái chi tiết từng model
+        """
+        with self._lock:
+            models = {name: dict(state) for name, state in self._state.items()}
+        return {
+            "ready": all(models[name]["status"] == STATUS_READY for name in self._required),
+            "models": models,
+        }
+
+
+# Singleton instance dùng chung cho toàn bộ ứng dụng
+model_lifecycle = ModelLifecycle({
+    "phobert": _load_phobert,
+    "sentiment": _load_sentiment,
+}, required=("phobert",))
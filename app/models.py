@@ -1,5 +1,5 @@
 from app.database import Base
-from sqlalchemy import Column, String, Text, DateTime, Integer, Boolean
+from sqlalchemy import Column, String, Text, DateTime, Integer, Boolean, Float, Index
 from datetime import datetime
 
 class Article(Base):
@@ -16,6 +16,11 @@ class Article(Base):
     type = Column(String(50), nullable=True)
     image_urls = Column(Text, nullable=True)
     video_urls = Column(Text, nullable=True)
+    
+    __table_args__ = (
+        # Trang danh mục: lọc (type, status) rồi phân trang keyset theo (date_posted, article_id)
+        Index("ix_articles_type_status_date", "type", "status", "date_posted", "article_id"),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -43,6 +48,13 @@ class Settings(Base):
 
 
 # Thêm vào cuối file models.py
+# Trạng thái bình luận
+COMMENT_STATUS_ACTIVE = "active"
+COMMENT_STATUS_UNVERIFIED = "unverified"  # Duyệt bằng tầng rẻ khi quá tải, chờ chấm lại
+COMMENT_STATUS_PENDING = "pending"  # Chưa có quyết định, ẩn cho tới khi chấm lại
+COMMENT_STATUS_HIDDEN = "hidden"
+VISIBLE_COMMENT_STATUSES = (COMMENT_STATUS_ACTIVE, COMMENT_STATUS_UNVERIFIED)
+
 class Comment(Base):
     __tablename__ = "comments"
     
@@ -54,6 +66,17 @@ class Comment(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     parent_id = Column(Integer, nullable=True)  # Cho phép phản hồi lồng nhau
     likes = Column(Integer, default=0)
-    status = Column(String(20), default="active")  # active, deleted, hidden
+    status = Column(String(20), default="active")  # active, unverified, pending, deleted, hidden
     sentiment = Column(String(20), default="neutral")  # positive, negative, neutral
-    sentiment_confidence = Column(String(10), default="0.0")  # PhoBERT confidence score
\ No newline at end of file
+    sentiment_confidence = Column(String(10), default="0.0")  # PhoBERT confidence score
+
+class ArticleSentimentRollup(Base):
+    __tablename__ = "article_sentiment_rollups"
+    
+    # Tổng hợp sentiment của các bình luận đang hiển thị, cập nhật cùng transaction với bình luận
+    article_id = Column(String(20), primary_key=True)
+    positive_count = Column(Integer, nullable=False, default=0)
+    negative_count = Column(Integer, nullable=False, default=0)
+    neutral_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)  # mean = confidence_sum / tổng số bình luận
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,184 @@
+"""
+Admission control + latency budget cho moderation bình luận
+Khi PhoBERT không theo kịp, request không chờ queue mà rơi về tầng rẻ (từ khóa + sentiment),
+bình luận được đánh dấu để chấm lại bất đồng bộ qua hàng đợi inference
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import SessionLocal
+from app.inference_pool import WorkerPoolUnavailable
+from app.inference_queue import InferenceDispatcher, InferenceQueueFull, inference_dispatcher
+from app.models import (
+    Comment, COMMENT_STATUS_ACTIVE, COMMENT_STATUS_HIDDEN, COMMENT_STATUS_PENDING, COMMENT_STATUS_UNVERIFIED
+)
+from app.moderation_cascade import moderation_cascade
+from app.moderation_metrics import moderation_metrics
+from app.sentiment_rollup import record_comment_change
+from app.sentiment_analyzer import sentiment_analyzer
+from app.toxic_matcher import keyword_reject
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUDGET_MS = float(os.getenv("MODERATION_LATENCY_BUDGET_MS", "800"))
+DEFAULT_ADMISSION_QUEUE_DEPTH = int(os.getenv("MODERATION_ADMISSION_QUEUE_DEPTH", "64"))
+RESCORE_RETRIES = int(os.getenv("MODERATION_RESCORE_RETRIES", "6"))
+
+
+class AdmissionController:
+    """Quyết định request nào được chờ PhoBERT, request nào đi đường rẻ"""
+
+    def __init__(self, dispatcher: InferenceDispatcher = inference_dispatcher,
+                 max_queue_depth: int = DEFAULT_ADMISSION_QUEUE_DEPTH,
+                 latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS):
+        """
+        Args:
+            dispatcher (InferenceDispatcher): Hàng đợi micro-batch PhoBERT
+            max_queue_depth (int): Queue sâu hơn mức này thì không nhận thêm request vào PhoBERT
+            latency_budget_ms (float): Thời gian tối đa một request chờ kết quả PhoBERT
+        """
+        self.dispatcher = dispatcher
+        self.max_queue_depth = max_queue_depth
+        self.latency_budget = max(0.0, latency_budget_ms) / 1000.0
+        self._rescore_tasks = set()
+
+    def admit(self) -> bool:
+        """Còn chỗ trong queue để chờ PhoBERT trong latency budget không"""
+        return self.dispatcher.queue_depth < self.max_queue_depth
+
+    async def moderate(self, text: str) -> Dict:
+        """
+        Phân loại bình luận với thời gian chờ bị chặn trên bởi latency budget
+
+        Args:
+            text (str): Nội dung bình luận
+
+        Returns:
+            Dict: Kết quả PhoBERT/cascade, hoặc kết quả tầng rẻ có "degraded": True
+                và "rescore": True nếu cần chấm lại (decision có thể là "pending")
+        """
+        if not self.admit():
+            moderation_metrics.increment("shed_queue_depth")
+            return await self._cheap_moderation_async(text)
+
+        try:
+            result = await asyncio.wait_for(self.dispatcher.submit(text), timeout=self.latency_budget)
+            if "error" not in result or result.get("decision") in ("approve", "reject"):
+                return result
+            # Kết quả lỗi (label 1 + error, ví dụ model chưa load): không có decision, dùng tầng rẻ rồi chấm lại
+            logger.warning(f"⚠️ PhoBERT trả về lỗi, dùng tầng rẻ: {result['error']}")
+            moderation_metrics.increment("shed_model_error")
+        except asyncio.TimeoutError:
+            # Request vẫn nằm trong batch; kết quả sẽ vào cache và được dùng khi chấm lại
+            moderation_metrics.increment("shed_timeout")
+        except InferenceQueueFull:
+            moderation_metrics.increment("shed_queue_full")
+        except WorkerPoolUnavailable as e:
+            # Worker process hỏng: không lưu thẳng bình luận, dùng tầng rẻ rồi chấm lại khi pool được tạo lại
+            logger.warning(f"⚠️ PhoBERT worker process không khả dụng, dùng tầng rẻ: {e}")
+            moderation_metrics.increment("shed_pool_unavailable")
+        return await self._cheap_moderation_async(text)
+
+    async def _cheap_moderation_async(self, text: str) -> Dict:
+        # Model sentiment (sklearn) chạy đồng bộ: đưa ra thread để không chặn event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.cheap_moderation, text)
+
+    def cheap_moderation(self, text: str) -> Dict:
+        """
+        Tầng rẻ khi quá tải: từ khóa -> model sentiment, không đụng tới torch
+
+        Returns:
+            Dict: reject theo từ khóa, approve tạm theo sentiment, hoặc pending
+        """
+        result = keyword_reject(text) if text else None
+        if result is None and sentiment_analyzer.is_loaded:
+            sentiment_result = sentiment_analyzer.predict_sentiment(text)
+            if moderation_cascade.cheap_approves(sentiment_result):
+                result = {**moderation_cascade.sentiment_approve(text, sentiment_result), "rescore": True}
+
+        if result is None:
+            result = {
+                "label": None,
+                "confidence": 0.0,
+                "description": "Chờ kiểm duyệt",
+                "decision": "pending",
+                "reason": "Hệ thống kiểm duyệt đang quá tải, bình luận sẽ được duyệt sau",
+                "stage": "deferred",
+                "rescore": True,
+            }
+
+        moderation_metrics.record_decisions([result])
+        return {**result, "degraded": True}
+
+    def schedule_rescore(self, comment_id: int, text: str):
+        """Chấm lại bình luận qua hàng đợi inference sau khi request đã trả về"""
+        task = asyncio.get_running_loop().create_task(self._rescore(comment_id, text))
+        self._rescore_tasks.add(task)
+        task.add_done_callback(self._rescore_tasks.discard)
+
+    async def _rescore(self, comment_id: int, text: str):
+        delay = 0.5
+        result: Optional[Dict] = None
+        for _ in range(RESCORE_RETRIES):
+            try:
+                # full_model: bình luận đã được tầng rẻ tạm duyệt, phải được PhoBERT xác nhận
+                result = await self.dispatcher.submit(text, full_model=True)
+                break
+            except (InferenceQueueFull, WorkerPoolUnavailable):
+                # Worker process hỏng được tạo lại ở batch sau, chờ rồi thử lại như khi queue đầy
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            except ImportError as e:
+                # Không cài PhoBERT (torch/transformers): để app.remoderate_comments xử lý sau
+                logger.warning(f"⚠️ PhoBERT không khả dụng khi chấm lại bình luận {comment_id}: {e}")
+                break
+
+        if result is None or result.get("decision") not in ("approve", "reject"):
+            # Bình luận vẫn ở trạng thái pending/unverified, app.remoderate_comments sẽ xử lý sau
+            logger.warning(f"⚠️ Không chấm lại được bình luận {comment_id}, giữ trạng thái chờ")
+            return
+
+        db = SessionLocal()
+        try:
+            comment = db.query(Comment).filter(Comment.id == comment_id).first()
+            # Chỉ cập nhật bình luận vẫn đang chờ (admin có thể đã xử lý tay)
+            if comment and comment.status in (COMMENT_STATUS_PENDING, COMMENT_STATUS_UNVERIFIED):
+                old_values = (comment.status, comment.sentiment, comment.sentiment_confidence)
+                approved = result["decision"] == "approve"
+                comment.status = COMMENT_STATUS_ACTIVE if approved else COMMENT_STATUS_HIDDEN
+                comment.sentiment = result.get("sentiment") or ("positive" if result.get("label") == 0 else "negative")
+                comment.sentiment_confidence = result.get("confidence", 0.0)
+                record_comment_change(db, comment, *old_values)
+                db.commit()
+                moderation_metrics.increment("rescored")
+                logger.info(f"✅ Đã chấm lại bình luận {comment_id}: {comment.status} ({result.get('stage')})")
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"❌ Lỗi cập nhật bình luận {comment_id} sau khi chấm lại: {e}")
+        finally:
+            db.close()
+
+    async def shutdown(self):
+        for task in list(self._rescore_tasks):
+            task.cancel()
+
+
+# Singleton instance dùng chung cho các endpoint bình luận
+admission_controller = AdmissionController()
+
+async def moderate_comment(text: str) -> Dict:
+    """
+    Hàm helper để phân loại bình luận trong latency budget
+
+    Args:
+        text (str): Nội dung bình luận
+
+    Returns:
+        Dict: Kết quả phân loại (xem AdmissionController.moderate)
+    """
+    return await admission_controller.moderate(text)
@@ -0,0 +1,303 @@
+"""
+Benchmark throughput của moderation bình luận, chạy offline hoàn toàn
+Dùng model RoBERTa nhỏ khởi tạo ngẫu nhiên + tokenizer build tại chỗ thay cho checkpoint PhoBERT,
+đi qua đúng đường classify_comment / classify_comments_batch của app.phobert_service
+
+Ví dụ:
+    python -m app.moderation_benchmark --output benchmarks/moderation.json
+    python -m app.moderation_benchmark --baseline benchmarks/moderation.json --output /tmp/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Không import app.inference_backends/torch ở module level: corpus, percentile, so sánh baseline không cần torch
+from app.utils import load_comment_texts
+
+DEFAULT_BATCH_SIZES = (1, 8, 16, 32)
+DEFAULT_THREADS = (1, 2, 4)
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]  # cùng thứ tự id với RoBERTa/PhoBERT
+
+# Từ vựng để sinh bình luận tiếng Việt giả lập
+SYNTHETIC_SUBJECTS = ["bài viết", "tác giả", "thông tin", "chính phủ", "đội tuyển", "giá xăng", "thời tiết",
+                      "người dân", "bộ trưởng", "công ty", "trận đấu", "học sinh", "bệnh viện", "giá vàng"]
+SYNTHETIC_VERBS = ["rất", "khá", "không", "chưa", "thật sự", "hơi", "cực kỳ", "vẫn"]
+SYNTHETIC_ADJECTIVES = ["hay", "bổ ích", "chính xác", "đáng lo ngại", "tuyệt vời", "nhảm", "chán",
+                        "hợp lý", "vô lý", "đáng khen", "tệ", "kịp thời", "thiếu khách quan"]
+SYNTHETIC_TAILS = ["cảm ơn tòa soạn", "mong được cập nhật thêm", "ai đồng ý không", "quá bức xúc",
+                   "đọc xong thấy buồn", "cần kiểm chứng lại", "like mạnh", "chia sẻ cho mọi người cùng biết"]
+
+
+def synthetic_comments(count: int, seed: int = 13) -> List[str]:
+    """
+    Sinh bình luận tiếng Việt giả lập với độ dài đa dạng (1-4 mệnh đề)
+
+    Args:
+        count (int): Số bình luận
+        seed (int): Seed để kết quả lặp lại được giữa các lần chạy
+    """
+    rng = random.Random(seed)
+    comments = []
+    for _ in range(count):
+        clauses = [
+            f"{rng.choice(SYNTHETIC_SUBJECTS)} {rng.choice(SYNTHETIC_VERBS)} {rng.choice(SYNTHETIC_ADJECTIVES)}"
+            for _ in range(rng.randint(1, 4))
+        ]
+        if rng.random() < 0.5:
+            clauses.append(rng.choice(SYNTHETIC_TAILS))
+        comments.append(", ".join(clauses).capitalize())
+    return comments
+
+
+def build_corpus(heldout_pattern: str = "data_training/*.jsonl", synthetic: int = 512,
+                 seed: int = 13) -> List[str]:
+    """Bình luận thật trong data_training + bình luận giả lập (đã bỏ trùng để cache không che kết quả)"""
+    texts = load_comment_texts(heldout_pattern) + synthetic_comments(synthetic, seed=seed)
+    return list(dict.fromkeys(t.strip() for t in texts if t and t.strip()))
+
+
+def build_stand_in_model(output_dir, corpus: Iterable[str], hidden_size: int = 64,
+                         num_layers: int = 2, num_heads: int = 2, seed: int = 13) -> Path:
+    """
+    Tạo thư mục model giống phobert_toxic_comment_model: config.json, model.safetensors, tokenizer
+
+    Args:
+        output_dir: Thư mục đích
+        corpus (Iterable[str]): Văn bản để dựng vocab word-level cho tokenizer
+        hidden_size (int): Kích thước hidden của RoBERTa
+        num_layers (int): Số encoder layer
+        num_heads (int): Số attention head
+        seed (int): Seed khởi tạo weights
+
+    Returns:
+        Path: Thư mục model
+    """
+    import torch
+    from tokenizers import Tokenizer, normalizers, pre_tokenizers, processors
+    from tokenizers.models import WordLevel
+    from transformers import PreTrainedTokenizerFast, RobertaConfig, RobertaForSequenceClassification
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    normalizer = normalizers.Sequence([normalizers.NFC(), normalizers.Lowercase()])
+    pre_tokenizer = pre_tokenizers.Whitespace()
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS)}
+    for text in corpus:
+        for word, _ in pre_tokenizer.pre_tokenize_str(normalizer.normalize_str(text)):
+            vocab.setdefault(word, len(vocab))
+
+    backend = Tokenizer(WordLevel(vocab, unk_token="<unk>"))
+    backend.normalizer = normalizer
+    backend.pre_tokenizer = pre_tokenizer
+    backend.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", pair="<s> $A </s> </s> $B </s>",
+        special_tokens=[("<s>", vocab["<s>"]), ("</s>", vocab["</s>"])],
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>", unk_token="<unk>",
+        pad_token="<pad>", mask_token="<mask>", model_max_length=256,
+    )
+    tokenizer.save_pretrained(str(output_dir))
+
+    torch.manual_seed(seed)
+    config = RobertaConfig(
+        vocab_size=len(vocab), hidden_size=hidden_size, num_hidden_layers=num_layers,
+        num_attention_heads=num_heads, intermediate_size=hidden_size * 4,
+        max_position_embeddings=258, pad_token_id=vocab["<pad>"], bos_token_id=vocab["<s>"],
+        eos_token_id=vocab["</s>"], num_labels=3,
+    )
+    model = RobertaForSequenceClassification(config)
+    model.eval()
+    model.save_pretrained(str(output_dir), safe_serialization=True)
+    return output_dir
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 theo nearest-rank (ms)"""
+    if not samples_ms:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ordered = sorted(samples_ms)
+
+    def rank(q):
+        return round(ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))], 3)
+
+    return {"p50_ms": rank(0.50), "p95_ms": rank(0.95), "p99_ms": rank(0.99)}
+
+
+def benchmark_config(corpus: List[str], batch_size: int, repeats: int = 3) -> Dict:
+    """
+    Chạy corpus qua classify_comment (batch 1) hoặc classify_comments_batch (batch > 1)
+
+    Latency được đo theo từng lời gọi: một bình luận với batch 1, một batch với batch > 1.
+    Cache kết quả được xóa trước mỗi lượt để mọi bình luận đều đi qua model.
+
+    Returns:
+        Dict: comments_per_sec, số lời gọi và p50/p95/p99 latency (ms)
+    """
+    from app.phobert_service import classify_comment, classify_comments_batch, get_phobert_service
+
+    service = get_phobert_service()
+    latencies, total_seconds, total_comments = [], 0.0, 0
+
+    for _ in range(repeats):
+        service.result_cache.clear()
+        for i in range(0, len(corpus), batch_size):
+            chunk = corpus[i:i + batch_size]
+            start = time.perf_counter()
+            if batch_size == 1:
+                classify_comment(chunk[0])
+            else:
+                classify_comments_batch(chunk)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed * 1000)
+            total_seconds += elapsed
+            total_comments += len(chunk)
+
+    return {
+        "comments_per_sec": round(total_comments / total_seconds, 2) if total_seconds else 0.0,
+        "calls": len(latencies),
+        **_percentiles(latencies),
+    }
+
+
+def run_benchmark(corpus: List[str], model_dir, backends: Optional[Iterable[str]] = None,
+                  batch_sizes: Iterable[int] = DEFAULT_BATCH_SIZES, threads: Iterable[int] = DEFAULT_THREADS,
+                  repeats: int = 3) -> Dict:
+    """
+    Benchmark mọi tổ hợp backend x số thread torch x batch size
+
+    Singleton phobert_service được thay bằng service trỏ vào model_dir trong lúc chạy
+    và được khôi phục khi xong. backends mặc định chỉ có torch fp32.
+
+    Returns:
+        Dict: environment + danh sách runs
+    """
+    import torch
+    import app.phobert_service as phobert_module
+    from app.inference_backends import BACKEND_TORCH
+
+    backends = backends or (BACKEND_TORCH,)
+    original_service = phobert_module.phobert_service
+    original_threads = torch.get_num_threads()
+    runs = []
+
+    try:
+        for backend in backends:
+            service = phobert_module.PhoBERTService(model_path=str(model_dir), backend=backend)
+            if not service.is_loaded:
+                print(f"❌ Không load được backend {backend}, bỏ qua")
+                continue
+            phobert_module.phobert_service = service
+
+            for num_threads in threads:
+                torch.set_num_threads(num_threads)
+                service.warm_up()
+                for batch_size in batch_sizes:
+                    row = {"backend": service.backend.name, "threads": num_threads, "batch_size": batch_size,
+                           **benchmark_config(corpus, batch_size, repeats=repeats)}
+                    print(f"📊 {row['backend']:<10} threads={num_threads:<2} batch={batch_size:<3} "
+                          f"{row['comments_per_sec']:>9} comments/s  p50 {row['p50_ms']} ms  "
+                          f"p95 {row['p95_ms']} ms  p99 {row['p99_ms']} ms")
+                    runs.append(row)
+    finally:
+        phobert_module.phobert_service = original_service
+        torch.set_num_threads(original_threads)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "bucket_size": phobert_module.DEFAULT_BUCKET_SIZE,
+            "corpus_size": len(corpus),
+            "repeats": repeats,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "runs": runs,
+    }
+
+
+def compare_with_baseline(current: Dict, baseline: Dict) -> List[Dict]:
+    """
+    So sánh throughput với một file kết quả trước đó theo (backend, threads, batch_size)
+
+    Returns:
+        List[Dict]: Mỗi cấu hình có ở cả hai lần chạy kèm % thay đổi comments/sec và p95
+    """
+    def key(run):
+        return run["backend"], run["threads"], run["batch_size"]
+
+    previous = {key(run): run for run in baseline.get("runs", [])}
+    deltas = []
+    for run in current["runs"]:
+        old = previous.get(key(run))
+        if not old or not old["comments_per_sec"] or not old["p95_ms"]:
+            continue
+        deltas.append({
+            "backend": run["backend"], "threads": run["threads"], "batch_size": run["batch_size"],
+            "throughput_change_pct": round((run["comments_per_sec"] / old["comments_per_sec"] - 1) * 100, 1),
+            "p95_change_pct": round((run["p95_ms"] / old["p95_ms"] - 1) * 100, 1),
+        })
+    return deltas
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.inference_backends import AVAILABLE_BACKENDS, BACKEND_TORCH
+
+    parser = argparse.ArgumentParser(description="Benchmark offline throughput moderation bình luận")
+    parser.add_argument("--heldout", default="data_training/*.jsonl", help="Glob các file JSONL bình luận")
+    parser.add_argument("--synthetic", type=int, default=512, help="Số bình luận giả lập thêm vào corpus")
+    parser.add_argument("--batch-sizes", type=_int_list, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--threads", type=_int_list, default=list(DEFAULT_THREADS))
+    parser.add_argument("--backends", default=BACKEND_TORCH, help=f"Trong {', '.join(AVAILABLE_BACKENDS)}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--heads", type=int, default=2)
+    parser.add_argument("--model-dir", help="Thư mục model có sẵn (mặc định build model giả lập vào thư mục tạm)")
+    parser.add_argument("--output", default="moderation_benchmark.json", help="File JSON kết quả")
+    parser.add_argument("--baseline", help="File JSON của lần chạy trước để so sánh")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.heldout, synthetic=args.synthetic)
+    print(f"📝 Corpus: {len(corpus)} bình luận")
+
+    with tempfile.TemporaryDirectory(prefix="moderation-bench-") as tmp_dir:
+        model_dir = args.model_dir or build_stand_in_model(
+            tmp_dir, corpus, hidden_size=args.hidden_size, num_layers=args.layers, num_heads=args.heads
+        )
+        report = run_benchmark(corpus, model_dir, backends=args.backends.split(","),
+                               batch_sizes=args.batch_sizes, threads=args.threads, repeats=args.repeats)
+
+    report["environment"]["model"] = args.model_dir or {
+        "stand_in": "roberta", "hidden_size": args.hidden_size, "layers": args.layers, "heads": args.heads
+    }
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["baseline_comparison"] = compare_with_baseline(report, json.load(f))
+        for row in report["baseline_comparison"]:
+            print(f"↔️ {row['backend']:<10} threads={row['threads']:<2} batch={row['batch_size']:<3} "
+                  f"throughput {row['throughput_change_pct']:+}%  p95 {row['p95_change_pct']:+}%")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Đã lưu kết quả: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Cascade moderation: từ khóa -> model sentiment (sklearn) -> PhoBERT
+Bình luận bị từ khóa chặn hoặc được model rẻ duyệt với độ tin cậy cao không cần forward pass transformer.
+Mỗi kết quả có trường "stage" cho biết tầng nào đã quyết định (keyword, sentiment, phobert)
+
+Đánh giá ngưỡng trên tập bình luận có nhãn:
+    python -m app.moderation_cascade --labeled data_labeled.jsonl --thresholds 0.8,0.9,0.95
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.moderation_metrics import moderation_metrics
+from app.toxic_matcher import keyword_reject
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = float(os.getenv("MODERATION_CASCADE_THRESHOLD", "0.9"))
+DEFAULT_APPROVE_SENTIMENTS = tuple(
+    s.strip() for s in os.getenv("MODERATION_CASCADE_APPROVE", "positive,neutral").split(",") if s.strip()
+)
+CASCADE_ENABLED = os.getenv("MODERATION_CASCADE", "1") not in ("0", "false", "False")
+
+
+def _default_phobert():
+    from app.phobert_service import get_phobert_service
+    return get_phobert_service()
+
+
+def _default_sentiment():
+    from app.sentiment_analyzer import get_sentiment_analyzer
+    return get_sentiment_analyzer()
+
+
+class ModerationCascade:
+    """Chạy các tầng moderation từ rẻ tới đắt, chỉ leo thang khi tầng trước không đủ chắc chắn"""
+
+    def __init__(self, phobert_getter: Callable = _default_phobert, sentiment_getter: Callable = _default_sentiment,
+                 threshold: float = DEFAULT_THRESHOLD, approve_sentiments: Iterable[str] = DEFAULT_APPROVE_SENTIMENTS,
+                 enabled: bool = CASCADE_ENABLED):
+        """
+        Args:
+            phobert_getter (Callable): Trả về PhoBERTService (load lazily)
+            sentiment_getter (Callable): Trả về SentimentAnalyzer (load lazily)
+            threshold (float): Độ tin cậy tối thiểu để model sentiment tự duyệt bình luận
+            approve_sentiments (Iterable[str]): Các nhãn sentiment được phép duyệt ở tầng rẻ
+            enabled (bool): False thì mọi bình luận (trừ từ khóa) đi thẳng tới PhoBERT
+        """
+        self.phobert_getter = phobert_getter
+        self.sentiment_getter = sentiment_getter
+        self.threshold = threshold
+        self.approve_sentiments = frozenset(approve_sentiments)
+        self.enabled = enabled
+
+    def cheap_approves(self, sentiment_result: Dict, threshold: Optional[float] = None) -> bool:
+        """
+        Model sentiment có đủ chắc chắn để duyệt bình luận mà không cần PhoBERT không
+
+        Tầng rẻ chỉ được duyệt; bình luận tiêu cực hoặc không chắc chắn luôn được PhoBERT xem lại.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        return (
+            "error" not in sentiment_result
+            and "note" not in sentiment_result
+            and sentiment_result.get("sentiment") in self.approve_sentiments
+            and sentiment_result.get("confidence", 0.0) >= threshold
+        )
+
+    def sentiment_approve(self, text: str, sentiment_result: Dict) -> Dict:
+        """Kết quả approve của tầng sentiment (cùng định dạng với PhoBERT)"""
+        confidence = float(sentiment_result["confidence"])
+        return {
+            "label": 0,
+            "confidence": confidence,
+            "description": "Bình luận tích cực/an toàn",
+            "decision": "approve",
+            "reason": f"Model sentiment: {sentiment_result['sentiment']} ({confidence:.2f})",
+            "sentiment": sentiment_result["sentiment"],
+            "processed_text": sentiment_result.get("processed_text", ""),
+            "stage": "sentiment",
+        }
+
+    def cheap_stage(self, texts: List[str]) -> Tuple[List[Optional[Dict]], List[Optional[Dict]]]:
+        """
+        Chạy tầng từ khóa và tầng sentiment
+
+        Returns:
+            Tuple: (kết quả đã quyết định hoặc None, kết quả sentiment thô của từng bình luận)
+        """
+        # Không gọi phobert_getter ở đây: nó load transformer, chỉ cần cho phần bị leo thang
+        decided: List[Optional[Dict]] = [keyword_reject(text) if text else None for text in texts]
+        sentiments: List[Optional[Dict]] = [None] * len(texts)
+
+        if not self.enabled:
+            return decided, sentiments
+
+        analyzer = self.sentiment_getter()
+        if not analyzer.is_loaded:
+            return decided, sentiments
+
+        candidates = [i for i, result in enumerate(decided) if result is None and texts[i] and texts[i].strip()]
+        for index, sentiment_result in zip(candidates, analyzer.predict_batch([texts[i] for i in candidates])):
+            sentiments[index] = sentiment_result
+            if self.cheap_approves(sentiment_result):
+                decided[index] = self.sentiment_approve(texts[index], sentiment_result)
+
+        return decided, sentiments
+
+    def classify_batch(self, texts: List[str], full_model: bool = False) -> List[Dict]:
+        """
+        Phân loại một batch bình luận qua cascade
+
+        Args:
+            texts (List[str]): Danh sách bình luận
+            full_model (bool): Bỏ qua tầng sentiment, mọi bình luận (trừ từ khóa) đều qua PhoBERT.
+                Dùng khi chấm lại bình luận mà tầng rẻ đã tạm duyệt lúc quá tải
+
+        Returns:
+            List[Dict]: Kết quả theo thứ tự đầu vào, cùng định dạng với PhoBERTService.predict_batch
+        """
+        if full_model:
+            # predict_batch tự chạy tầng từ khóa và ghi metrics
+            return self.phobert_getter().predict_batch(texts)
+
+        results, _ = self.cheap_stage(texts)
+        moderation_metrics.record_decisions(results)
+
+        escalated = [i for i, result in enumerate(results) if result is None]
+        if escalated:
+            # PhoBERT tự ghi metrics cho phần nó quyết định
+            phobert_results = self.phobert_getter().predict_batch([texts[i] for i in escalated])
+            for index, result in zip(escalated, phobert_results):
+                results[index] = result
+        return results
+
+    def classify(self, text: str) -> Dict:
+        """Phân loại một bình luận qua cascade"""
+        return self.classify_batch([text])[0]
+
+
+# Singleton instance dùng chung trong web process
+moderation_cascade = ModerationCascade()
+
+
+def classify_comments_cascade(texts: List[str], full_model: bool = False) -> List[Dict]:
+    """
+    Hàm helper để phân loại nhiều bình luận qua cascade
+
+    Args:
+        texts (List[str]): Danh sách bình luận
+        full_model (bool): True thì bỏ qua tầng sentiment (xem ModerationCascade.classify_batch)
+
+    Returns:
+        List[Dict]: Danh sách kết quả phân loại (có trường stage)
+    """
+    return moderation_cascade.classify_batch(texts, full_model=full_model)
+
+
+def load_labeled_comments(path: str) -> List[Tuple[str, str]]:
+    """
+    Đọc bình luận có nhãn từ JSONL hoặc CSV (cột content + label 0/1/2 hoặc decision approve/reject)
+
+    Returns:
+        List[Tuple[str, str]]: (nội dung, decision chuẩn)
+    """
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    labeled = []
+    for row in rows:
+        content = row.get("content")
+        if not content:
+            continue
+        if row.get("decision") in ("approve", "reject"):
+            labeled.append((content, row["decision"]))
+        elif row.get("label") not in (None, ""):
+            # Cùng quy tắc với PhoBERT: chỉ label 0 được duyệt
+            labeled.append((content, "approve" if int(row["label"]) == 0 else "reject"))
+    return labeled
+
+
+def evaluate_thresholds(cascade: ModerationCascade, labeled: List[Tuple[str, str]],
+                        thresholds: Iterable[float]) -> Dict:
+    """
+    Replay bình luận có nhãn và đo accuracy/latency của cascade ở từng ngưỡng
+
+    Mỗi tầng chỉ chạy một lần trên toàn bộ tập; kết quả từng ngưỡng được ghép lại từ đó,
+    latency ước lượng = thời gian tầng rẻ + thời gian PhoBERT/bình luận x tỉ lệ phải leo thang.
+
+    Returns:
+        Dict: baseline PhoBERT-only và một dòng cho mỗi ngưỡng
+    """
+    texts = [text for text, _ in labeled]
+    gold = [decision for _, decision in labeled]
+    count = len(texts)
+    if not count:
+        return {"phobert_only": {}, "thresholds": []}
+
+    start = time.perf_counter()
+    keyword_results = [keyword_reject(text) if text else None for text in texts]
+    keyword_ms = (time.perf_counter() - start) * 1000 / count
+
+    analyzer = cascade.sentiment_getter()
+    start = time.perf_counter()
+    sentiments = analyzer.predict_batch(texts) if analyzer.is_loaded else [{"error": "not loaded"}] * count
+    sentiment_ms = (time.perf_counter() - start) * 1000 / count
+
+    phobert = cascade.phobert_getter()
+    phobert.result_cache.clear()
+    start = time.perf_counter()
+    phobert_results = phobert.predict_batch(texts)
+    phobert_ms = (time.perf_counter() - start) * 1000 / count
+
+    def accuracy(decisions):
+        return round(sum(d == g for d, g in zip(decisions, gold)) / count, 4)
+
+    report = {
+        "samples": count,
+        "phobert_only": {
+            "accuracy": accuracy([r.get("decision") for r in phobert_results]),
+            "ms_per_comment": round(keyword_ms + phobert_ms, 3),
+        },
+        "thresholds": [],
+    }
+
+    for threshold in thresholds:
+        decisions, stages = [], {"keyword": 0, "sentiment": 0, "phobert": 0}
+        for keyword_result, sentiment_result, phobert_result in zip(keyword_results, sentiments, phobert_results):
+            if keyword_result is not None:
+                stage, decision = "keyword", "reject"
+            elif cascade.cheap_approves(sentiment_result, threshold):
+                stage, decision = "sentiment", "approve"
+            else:
+                stage, decision = "phobert", phobert_result.get("decision")
+            stages[stage] += 1
+            decisions.append(decision)
+
+        escalated = stages["phobert"] / count
+        report["thresholds"].append({
+            "threshold": threshold,
+            "accuracy": accuracy(decisions),
+            "agreement_with_phobert": round(
+                sum(d == r.get("decision") for d, r in zip(decisions, phobert_results)) / count, 4
+            ),
+            "stage_share": {stage: round(n / count, 4) for stage, n in stages.items()},
+            "ms_per_comment": round(keyword_ms + sentiment_ms + phobert_ms * escalated, 3),
+        })
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Đánh giá accuracy/latency của cascade moderation theo ngưỡng")
+    parser.add_argument("--labeled", required=True, help="File JSONL/CSV có content + label hoặc decision")
+    parser.add_argument("--thresholds", default="0.6,0.7,0.8,0.9,0.95,0.99")
+    parser.add_argument("--output", help="Ghi báo cáo ra file JSON")
+    args = parser.parse_args()
+
+    report = evaluate_thresholds(
+        ModerationCascade(enabled=True),
+        load_labeled_comments(args.labeled),
+        [float(t) for t in args.thresholds.split(",") if t.strip()],
+    )
+    for row in report["thresholds"]:
+        print(f"📊 threshold {row['threshold']:<5} accuracy {row['accuracy']:.2%}  "
+              f"PhoBERT {row['stage_share']['phobert']:.0%}  {row['ms_per_comment']} ms/comment")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,231 @@
+"""
+Số liệu vận hành của moderation: histogram độ trễ, kích thước batch, queue, cache, quyết định
+Xuất dạng JSON (dashboard admin) và Prometheus text (scraper)
+Chế độ process: worker gửi số liệu tích lũy sau mỗi batch (drain), web process cộng vào (merge)
+"""
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+# Bucket độ trễ (giây) và kích thước batch
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Histogram bucket cố định kiểu Prometheus (bucket tích lũy khi xuất)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # phần tử cuối là +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, counts: Sequence[int], count: int, total: float):
+        """Cộng histogram cùng bucket từ process khác"""
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += count
+        self.sum += total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Ước lượng quantile bằng cận trên của bucket chứa nó (None nếu rơi vào bucket +Inf)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for i, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(b): c for b, c in zip(list(self.buckets) + ["+Inf"], self.counts)},
+        }
+
+
+class ModerationMetrics:
+    """Tập hợp metrics moderation của process hiện tại (thread-safe)"""
+
+    HISTOGRAMS = {
+        "tokenize_seconds": LATENCY_BUCKETS,
+        "forward_seconds": LATENCY_BUCKETS,
+        "postprocess_seconds": LATENCY_BUCKETS,
+        "forward_batch_size": SIZE_BUCKETS,
+        "microbatch_size": SIZE_BUCKETS,
+        "queue_depth": SIZE_BUCKETS,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset_locked()
+            # pid worker process -> thống kê cache kết quả PhoBERT mới nhất của worker đó
+            self.worker_cache: Dict[int, Dict] = {}
+
+    def _reset_locked(self):
+        self.histograms = {name: Histogram(buckets) for name, buckets in self.HISTOGRAMS.items()}
+        self.decisions = Counter()
+        self.events = Counter()
+
+    def drain(self) -> Dict:
+        """
+        Lấy số liệu tích lũy từ lần drain trước rồi xóa (worker process gọi sau mỗi batch)
+
+        Returns:
+            Dict: histograms (counts/count/sum), decisions, events, dùng cho merge ở web process
+        """
+        with self._lock:
+            delta = {
+                "histograms": {name: {"counts": list(h.counts), "count": h.count, "sum": h.sum}
+                               for name, h in self.histograms.items() if h.count},
+                "decisions": dict(self.decisions),
+                "events": dict(self.events),
+            }
+            self._reset_locked()
+        return delta
+
+    def merge(self, delta: Dict):
+        """Cộng số liệu worker process gửi về (kết quả drain, kèm pid và thống kê cache của worker)"""
+        with self._lock:
+            for name, data in delta.get("histograms", {}).items():
+                self.histograms[name].merge(data["counts"], data["count"], data["sum"])
+            self.decisions.update(delta.get("decisions", {}))
+            self.events.update(delta.get("events", {}))
+            if delta.get("cache") is not None:
+                self.worker_cache[delta["pid"]] = delta["cache"]
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.histograms[name].observe(value)
+
+    def increment(self, event: str, amount: int = 1):
+        """Đếm sự kiện (shed do queue, hết latency budget, re-score, ...)"""
+        with self._lock:
+            self.events[event] += amount
+
+    def record_decisions(self, results: List[Dict]):
+        """Đếm quyết định: approve / reject / keyword_reject / cascade_approve"""
+        with self._lock:
+            for result in results:
+                if not result:
+                    continue
+                if result.get("stage") == "keyword":
+                    self.decisions["keyword_reject"] += 1
+                elif result.get("stage") == "sentiment":
+                    self.decisions["cascade_approve"] += 1
+                elif result.get("decision") in ("approve", "reject"):
+                    self.decisions[result["decision"]] += 1
+                else:
+                    self.decisions["undecided"] += 1
+
+    def _cache_stats(self) -> Dict:
+        with self._lock:
+            workers = list(self.worker_cache.values())
+        if workers:
+            # Chế độ process: mỗi worker có cache riêng, cộng dồn
+            hits = sum(stats["hits"] for stats in workers)
+            misses = sum(stats["misses"] for stats in workers)
+            return {
+                "size": sum(stats["size"] for stats in workers),
+                "max_size": sum(stats["max_size"] for stats in workers),
+                "ttl": workers[0]["ttl"],
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "evictions": sum(stats["evictions"] for stats in workers),
+                "invalidations": sum(stats["invalidations"] for stats in workers),
+                "workers": len(workers),
+            }
+        # Không import phobert_service (kéo theo torch) nếu process này chưa dùng tới nó
+        module = sys.modules.get("app.phobert_service")
+        if module is None:
+            return {}
+        return module.phobert_service.result_cache.stats()
+
+    def _queue_depth(self) -> int:
+        module = sys.modules.get("app.inference_queue")
+        return module.inference_dispatcher.queue_depth if module else 0
+
+    def snapshot(self) -> Dict:
+        """
+        Snapshot toàn bộ metrics
+
+        Returns:
+            Dict: histograms, decisions, events, cache, queue_depth hiện tại
+        """
+        with self._lock:
+            histograms = {name: h.to_dict() for name, h in self.histograms.items()}
+            decisions = dict(self.decisions)
+            events = dict(self.events)
+        return {
+            "histograms": histograms,
+            "decisions": decisions,
+            "events": events,
+            "cache": self._cache_stats(),
+            "queue_depth": self._queue_depth(),
+        }
+
+    def to_prometheus(self) -> str:
+        """Xuất metrics theo Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+
+        with self._lock:
+            histograms = [(name, h.buckets, list(h.counts), h.count, h.sum) for name, h in self.histograms.items()]
+
+        for name, buckets, counts, count, total in histograms:
+            metric = f"moderation_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            running = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                running += bucket_count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {running}')
+            lines.append(f"{metric}_sum {total}")
+            lines.append(f"{metric}_count {count}")
+
+        lines.append("# TYPE moderation_decisions_total counter")
+        for decision, value in sorted(snapshot["decisions"].items()):
+            lines.append(f'moderation_decisions_total{{decision="{decision}"}} {value}')
+
+        lines.append("# TYPE moderation_events_total counter")
+        for event, value in sorted(snapshot["events"].items()):
+            lines.append(f'moderation_events_total{{event="{event}"}} {value}')
+
+        cache = snapshot["cache"]
+        if cache:
+            lines.append("# TYPE moderation_cache_hits_total counter")
+            lines.append(f"moderation_cache_hits_total {cache['hits']}")
+            lines.append("# TYPE moderation_cache_misses_total counter")
+            lines.append(f"moderation_cache_misses_total {cache['misses']}")
+            lines.append("# TYPE moderation_cache_size gauge")
+            lines.append(f"moderation_cache_size {cache['size']}")
+
+        lines.append("# TYPE moderation_queue_depth_current gauge")
+        lines.append(f"moderation_queue_depth_current {snapshot['queue_depth']}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance dùng chung trong process
+moderation_metrics = ModerationMetrics()
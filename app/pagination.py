@@ -0,0 +1,190 @@
+"""
+Phân trang keyset (cursor) cho danh sách bài viết và bình luận
+Thay OFFSET (page-1)*per_page bằng điều kiện WHERE trên (cột sắp xếp, khóa duy nhất),
+ví dụ (date_posted, article_id) hoặc (created_at, id), nên trang sâu nhanh như trang đầu.
+Cursor là base64 của vị trí dòng đầu/cuối trang, client chỉ cần truyền lại nguyên văn.
+Tổng số dòng không còn đếm mỗi request mà lấy từ cache (cached_count)
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from app.cache import TTLCache
+
+PAGINATION_COUNT_TTL = float(os.getenv("PAGINATION_COUNT_TTL", "300"))
+
+# Tổng số dòng theo bộ lọc, dùng để hiển thị "khoảng N kết quả"
+count_cache = TTLCache(max_size=512, ttl=PAGINATION_COUNT_TTL)
+
+
+class InvalidCursor(ValueError):
+    """Cursor không giải mã được (bị sửa tay hoặc từ phiên bản cũ)"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any], direction: str = "next") -> str:
+    """
+    Mã hóa vị trí trong danh sách thành chuỗi an toàn cho URL
+
+    Args:
+        values (Sequence): Giá trị các cột khóa của dòng làm mốc
+        direction (str): "next" (các dòng sau mốc) hoặc "prev" (các dòng trước mốc)
+    """
+    payload = json.dumps({"d": direction, "k": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Giải mã cursor
+
+    Returns:
+        Tuple[str, List]: (direction, giá trị các cột khóa)
+
+    Raises:
+        InvalidCursor: Cursor sai định dạng
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        direction, values = payload["d"], [_decode_value(v) for v in payload["k"]]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Cursor không hợp lệ: {e}") from e
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        raise InvalidCursor("Cursor không hợp lệ")
+    return direction, values
+
+
+class KeysetPage:
+    """Một trang kết quả kèm cursor tới trang trước/sau"""
+
+    def __init__(self, items: List, next_cursor: Optional[str], prev_cursor: Optional[str],
+                 total: Optional[int] = None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def to_dict(self, serialize: Callable = lambda item: item) -> Dict:
+        """Định dạng JSON cho API: items + next_cursor/prev_cursor (+ total ước lượng nếu có)"""
+        return {
+            "items": [serialize(item) for item in self.items],
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor,
+            "total": self.total,
+        }
+
+
+def _seek_filter(keys, values, descending: bool, forward: bool):
+    """
+    Điều kiện lấy các dòng nằm sau (forward) hoặc trước mốc theo thứ tự hiển thị
+
+    Thứ tự hiển thị: cột đầu theo chiều `descending`, NULL xếp cuối; cột thứ hai là khóa duy nhất (không NULL)
+    """
+    column, tiebreaker = keys
+    value, tie_value = values
+    # Đi theo thứ tự hiển thị giảm dần hoặc ngược lại thứ tự tăng dần thì so sánh "<"
+    smaller = descending == forward
+
+    def beyond(col, val):
+        return col < val if smaller else col > val
+
+    if forward:
+        # NULL nằm cuối danh sách
+        if value is None:
+            return and_(column.is_(None), beyond(tiebreaker, tie_value))
+        return or_(beyond(column, value), and_(column == value, beyond(tiebreaker, tie_value)), column.is_(None))
+
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), beyond(tiebreaker, tie_value)))
+    return or_(beyond(column, value), and_(column == value, beyond(tiebreaker, tie_value)))
+
+
+def _order_by(keys, descending: bool, forward: bool):
+    column, tiebreaker = keys
+    if descending == forward:
+        return [column.desc().nulls_last() if forward else column.desc().nulls_first(), tiebreaker.desc()]
+    return [column.asc().nulls_last() if forward else column.asc().nulls_first(), tiebreaker.asc()]
+
+
+def paginate_keyset(query: Query, keys: Sequence, per_page: int, cursor: Optional[str] = None,
+                    descending: bool = True, total: Optional[int] = None) -> KeysetPage:
+    """
+    Lấy một trang theo cursor
+
+    Args:
+        query (Query): Query đã có bộ lọc, chưa order_by/offset/limit
+        keys (Sequence): (cột sắp xếp, khóa duy nhất), ví dụ (Article.date_posted, Article.article_id)
+        per_page (int): Số dòng mỗi trang
+        cursor (str, optional): Cursor từ trang trước, None là trang đầu
+        descending (bool): Mới nhất trước
+        total (int, optional): Tổng số dòng (thường lấy từ cached_count)
+
+    Returns:
+        KeysetPage: Các dòng của trang + next_cursor/prev_cursor
+
+    Raises:
+        InvalidCursor: Cursor sai định dạng
+    """
+    direction, values = decode_cursor(cursor) if cursor else ("next", None)
+    if values is not None and len(values) != len(keys):
+        raise InvalidCursor("Cursor không khớp với danh sách")
+    forward = direction == "next"
+
+    if values is not None:
+        query = query.filter(_seek_filter(keys, values, descending, forward))
+    # Lấy dư một dòng để biết còn trang tiếp theo không
+    rows = query.order_by(*_order_by(keys, descending, forward)).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def position(row):
+        return [getattr(row, key.key) for key in keys]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more if forward else values is not None:
+            next_cursor = encode_cursor(position(rows[-1]), "next")
+        if values is not None if forward else has_more:
+            prev_cursor = encode_cursor(position(rows[0]), "prev")
+    return KeysetPage(rows, next_cursor, prev_cursor, total)
+
+
+def cached_count(query: Query, cache_key: Hashable) -> int:
+    """
+    Tổng số dòng của query, đếm lại tối đa một lần mỗi PAGINATION_COUNT_TTL giây cho mỗi bộ lọc
+
+    Con số có thể lệch vài dòng so với thực tế, chỉ dùng để hiển thị
+    """
+    total = count_cache.get(cache_key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(cache_key, total)
+    return total
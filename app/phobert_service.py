@@ -2,33 +2,75 @@
 PhoBERT Service để phân loại bình luận độc hại
 Tích hợp model PhoBERT đã train sẵn vào hệ thống
 """
+import hashlib
 import os
-import re
+import threading
+import time
 import torch
 from pathlib import Path
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from typing import Dict, List, Optional
 import logging
 
+from app.cache import TTLCache
+from app.text_normalization import PHOBERT_PROFILE, normalize, normalize_batch
+from app.moderation_metrics import moderation_metrics
+from app.toxic_matcher import keyword_reject, toxic_matcher
+from app.inference_backends import (
+    AVAILABLE_BACKENDS, BACKEND_ONNX, BACKEND_TORCH, TorchBackend,
+    compare_backends, create_backend, time_call
+)
+
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Kích thước bucket mặc định khi chạy batch (số câu cùng độ dài tương tự / forward pass)
+DEFAULT_BUCKET_SIZE = int(os.getenv("MODERATION_BUCKET_SIZE", "8"))
+
+
+def _copy_result(result: Dict) -> Dict:
+    """Bản sao kết quả trả cho caller, kể cả dict probabilities lồng bên trong (không dùng chung với cache)"""
+    copied = dict(result)
+    if "probabilities" in copied:
+        copied["probabilities"] = dict(copied["probabilities"])
+    return copied
+
 class PhoBERTService:
     """Service để phân loại bình luận độc hại bằng PhoBERT"""
     
-    def __init__(self, model_path: str = "phobert_toxic_comment_model"):
+    def __init__(self, model_path: str = "phobert_toxic_comment_model", backend: Optional[str] = None,
+                 auto_load: bool = True):
         """
         Khởi tạo PhoBERT service
         
         Args:
             model_path (str): Đường dẫn đến thư mục chứa model PhoBERT
+            backend (str, optional): Backend inference (torch, torch-int8, onnx).
+                Mặc định lấy từ biến môi trường PHOBERT_BACKEND
+            auto_load (bool): Load model ngay khi khởi tạo
         """
         self.model_path = Path(model_path)
         self.tokenizer = None
         self.model = None
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.is_loaded = False
+        self.load_attempted = False
+        self._load_lock = threading.Lock()
+        
+        self.backend_name = backend or os.getenv("PHOBERT_BACKEND", BACKEND_TORCH)
+        self.backend = None
+        self.backend_report = None  # Kết quả evaluate_backends gần nhất
+        
+        # Cache kết quả theo hash(model_version + văn bản đã tiền xử lý)
+        self.model_version = None
+        self.result_cache = TTLCache(
+            max_size=int(os.getenv("MODERATION_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("MODERATION_CACHE_TTL", "3600"))
+        )
+        
+        # Từ khóa độc hại được lọc trước khi tokenize, khớp là reject không cần model
+        self.keyword_matcher = toxic_matcher
         
         # Label mapping theo config.json của model
         self.id2label = {
@@ -44,7 +86,8 @@ class PhoBERTService:
         }
         
         # Tự động load model khi khởi tạo
-        self.load_model()
+        if auto_load:
+            self.load_model()
     
     def load_model(self) -> bool:
         """
@@ -53,6 +96,11 @@ class PhoBERTService:
         Returns:
             bool: True nếu load thành công, False nếu có lỗi
         """
+        with self._load_lock:
+            self.load_attempted = True
+            return self._load_model()
+    
+    def _load_model(self) -> bool:
         try:
             if not self.model_path.exists():
                 logger.error(f"❌ Không tìm thấy thư mục model: {self.model_path}")
@@ -75,18 +123,19 @@ class PhoBERTService:
             )
             
             # Load model
-            self.model = AutoModelForSequenceClassification.from_pretrained(
-                str(self.model_path),
-                local_files_only=True,
-                trust_remote_code=True
-            )
+            self.model = self._load_hf_model()
+            self.backend = self._create_backend(self.backend_name)
+            
+            # Graph ONNX đã chứa toàn bộ weights, không cần giữ model torch trong RAM
+            if self.backend.name == BACKEND_ONNX:
+                self.model = None
             
-            # Chuyển model sang device phù hợp
-            self.model.to(self.device)
-            self.model.eval()  # Chế độ evaluation
+            # Model mới → kết quả cũ trong cache không còn giá trị
+            self.model_version = self._compute_model_version()
+            self.result_cache.clear()
             
             self.is_loaded = True
-            logger.info(f"✅ PhoBERT model loaded thành công trên {self.device}")
+            logger.info(f"✅ PhoBERT model loaded thành công trên {self.device} (backend: {self.backend.name})")
             logger.info(f"📋 Model labels: {self.id2label}")
             
             return True
@@ -96,6 +145,78 @@ class PhoBERTService:
             self.is_loaded = False
             return False
     
+    def _compute_model_version(self) -> str:
+        """Định danh checkpoint + backend đang chạy, dùng làm một phần của cache key"""
+        parts = [self.backend.name]
+        for file in ["config.json", "model.safetensors"]:
+            stat = (self.model_path / file).stat()
+            parts.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+    
+    def _cache_key(self, processed_text: str) -> str:
+        return hashlib.sha1(f"{self.model_version}\x00{processed_text}".encode("utf-8")).hexdigest()
+    
+    def _load_hf_model(self):
+        """Load model fp32 từ thư mục model và chuyển sang chế độ eval"""
+        model = AutoModelForSequenceClassification.from_pretrained(
+            str(self.model_path),
+            local_files_only=True,
+            trust_remote_code=True
+        )
+        
+        # Chuyển model sang device phù hợp
+        model.to(self.device)
+        model.eval()  # Chế độ evaluation
+        return model
+    
+    def _create_backend(self, name: str):
+        """
+        Tạo backend inference, fallback về torch fp32 nếu backend được chọn lỗi
+        
+        Args:
+            name (str): Tên backend
+            
+        Returns:
+            Backend có method logits(inputs)
+        """
+        try:
+            return create_backend(name, self.model, self.tokenizer, self.model_path, self.device)
+        except Exception as e:
+            if name == BACKEND_TORCH:
+                raise
+            logger.warning(f"⚠️ Không khởi tạo được backend {name}: {e}. Dùng torch fp32")
+            self.model = self._load_hf_model()
+            return TorchBackend(self.model, self.device)
+    
+    def ensure_loaded(self) -> bool:
+        """Load model nếu chưa từng thử load (an toàn khi gọi từ nhiều thread)"""
+        if not self.load_attempted:
+            with self._load_lock:
+                if not self.load_attempted:
+                    self.load_attempted = True
+                    self._load_model()
+        return self.is_loaded
+    
+    def is_model_loaded(self) -> bool:
+        return self.is_loaded
+    
+    def warm_up(self) -> float:
+        """
+        Chạy vài forward pass mẫu để khởi tạo kernel/allocator trước khi nhận request
+        
+        Returns:
+            float: Thời gian warm-up (giây)
+        """
+        samples = [
+            "Cảm ơn",
+            "Bài viết rất hay và bổ ích, cảm ơn tác giả",
+            "Thông tin trong bài này cần được kiểm chứng thêm trước khi đăng, mong tòa soạn xem lại",
+        ]
+        start = time.perf_counter()
+        self.predict_single(samples[0])
+        self.predict_batch(samples, batch_size=len(samples))
+        return time.perf_counter() - start
+    
     def preprocess_text(self, text: str) -> str:
         """
         Tiền xử lý văn bản trước khi đưa vào model
@@ -106,26 +227,143 @@ class PhoBERTService:
         Returns:
             str: Văn bản đã được xử lý
         """
-        if not text:
-            return ""
+        # URL, email, số điện thoại, ký tự đặc biệt, khoảng trắng thừa (xem app.text_normalization)
+        return normalize(text, PHOBERT_PROFILE)
+    
+    def _decide(self, predicted_label: int, confidence: float) -> Dict:
+        """
+        Quyết định approve/reject từ kết quả PhoBERT
+        
+        Args:
+            predicted_label (int): Label dự đoán
+            confidence (float): Độ tin cậy của label dự đoán
+            
+        Returns:
+            Dict: decision và reason
+        """
+        # Toxic keywords đã được lọc trước khi chạy model (xem keyword_reject)
+        if predicted_label == 0 and confidence > 0.7:
+            # Only approve clearly positive comments
+            decision = "approve"
+            reason = f"Bình luận tích cực (Label {predicted_label})"
+        elif predicted_label in [1, 2]:
+            # Reject negative and toxic
+            decision = "reject"
+            reason = f"Bình luận tiêu cực/độc hại (Label {predicted_label})"
+        else:
+            # Low confidence
+            decision = "reject"
+            reason = f"Độ tin cậy thấp ({confidence:.2f})"
+        
+        return {"decision": decision, "reason": reason}
+    
+    def keyword_reject(self, text: str) -> Optional[Dict]:
+        """
+        Lọc từ khóa độc hại trên văn bản gốc, trước khi tokenize
         
-        # Loại bỏ URL
-        text = re.sub(r'http[s]?://\S+', ' ', text)
-        text = re.sub(r'www\.\S+', ' ', text)
+        Args:
+            text (str): Bình luận gốc
+            
+        Returns:
+            Optional[Dict]: Kết quả reject nếu khớp từ khóa, None nếu không
+        """
+        return keyword_reject(text, self.keyword_matcher)
+    
+    def _build_result(self, processed_text: str, probabilities: List[float]) -> Dict:
+        """
+        Tạo dict kết quả cho một bình luận từ vector xác suất
+        
+        Args:
+            processed_text (str): Văn bản đã tiền xử lý
+            probabilities (List[float]): Xác suất của từng label
+            
+        Returns:
+            Dict: Kết quả phân loại
+        """
+        predicted_label = max(range(len(probabilities)), key=lambda i: probabilities[i])
+        confidence = float(probabilities[predicted_label])
         
-        # Loại bỏ email
-        text = re.sub(r'\S+@\S+', ' ', text)
+        return {
+            "label": predicted_label,
+            "confidence": confidence,
+            "description": self.label_descriptions.get(predicted_label, "Unknown"),
+            **self._decide(predicted_label, confidence),
+            "stage": "phobert",
+            "processed_text": processed_text[:100] + "..." if len(processed_text) > 100 else processed_text,
+            "probabilities": {
+                "label_0": float(probabilities[0]),
+                "label_1": float(probabilities[1]),
+                "label_2": float(probabilities[2])
+            }
+        }
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Kết quả mặc định khi tokenize/forward lỗi"""
+        return {
+            "label": 1,  # Default safe label
+            "confidence": 0.0,
+            "description": "Lỗi trong quá trình phân loại",
+            "error": str(error)
+        }
+    
+    def _forward(self, processed_texts: List[str]) -> List[List[float]]:
+        """
+        Tokenize cả batch (có padding) và chạy một forward pass duy nhất
         
-        # Loại bỏ số điện thoại (đơn giản)
-        text = re.sub(r'\b\d{10,11}\b', ' ', text)
+        Args:
+            processed_texts (List[str]): Các văn bản đã tiền xử lý, không rỗng
+            
+        Returns:
+            List[List[float]]: Xác suất softmax cho từng văn bản
+        """
+        started = time.perf_counter()
+        inputs = self.tokenizer(
+            processed_texts,
+            return_tensors="pt",
+            max_length=256,
+            truncation=True,
+            padding=True
+        )
+        moderation_metrics.observe("tokenize_seconds", time.perf_counter() - started)
         
-        # Loại bỏ ký tự đặc biệt thừa nhưng giữ dấu câu cơ bản
-        text = re.sub(r'[^\w\s\.,!?]', ' ', text)
+        return self._run_backend(inputs, len(processed_texts))
+    
+    def _run_backend(self, inputs, batch_size: int) -> List[List[float]]:
+        """Forward pass + softmax, ghi lại độ trễ và kích thước batch"""
+        started = time.perf_counter()
+        logits = self.backend.logits(inputs)
+        probabilities = torch.softmax(logits.float(), dim=-1).tolist()
+        moderation_metrics.observe("forward_seconds", time.perf_counter() - started)
+        moderation_metrics.observe("forward_batch_size", batch_size)
+        return probabilities
+    
+    def _tokenize_unpadded(self, processed_texts: List[str]) -> List[Dict[str, List[int]]]:
+        """
+        Tokenize (truncate, không padding) để biết độ dài token của từng văn bản
         
-        # Chuẩn hóa khoảng trắng
-        text = ' '.join(text.split())
+        Args:
+            processed_texts (List[str]): Các văn bản đã tiền xử lý
+            
+        Returns:
+            List[Dict[str, List[int]]]: input_ids/attention_mask của từng văn bản
+        """
+        started = time.perf_counter()
+        encoded = self.tokenizer(processed_texts, max_length=256, truncation=True)
+        moderation_metrics.observe("tokenize_seconds", time.perf_counter() - started)
+        return [{key: encoded[key][i] for key in encoded.keys()} for i in range(len(processed_texts))]
+    
+    def _forward_encoded(self, features: List[Dict[str, List[int]]]) -> List[List[float]]:
+        """
+        Pad một bucket tới độ dài lớn nhất của chính nó và chạy một forward pass
         
-        return text.strip()
+        Args:
+            features (List[Dict]): Output của _tokenize_unpadded cho các văn bản trong bucket
+            
+        Returns:
+            List[List[float]]: Xác suất softmax cho từng văn bản
+        """
+        inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+        return self._run_backend(dict(inputs), len(features))
     
     def predict_single(self, text: str) -> Dict:
         """
@@ -137,6 +375,15 @@ class PhoBERTService:
         Returns:
             Dict: Kết quả phân loại với label, confidence, description, decision
         """
+        result = self._predict_single(text)
+        moderation_metrics.record_decisions([result])
+        return result
+    
+    def _predict_single(self, text: str) -> Dict:
+        keyword_result = self.keyword_reject(text) if text else None
+        if keyword_result is not None:
+            return keyword_result
+        
         if not self.is_loaded:
             return {
                 "label": 2,  # Default reject nếu model không load được
@@ -167,79 +414,30 @@ class PhoBERTService:
                     "processed_text": ""
                 }
             
-            # Tokenize
-            inputs = self.tokenizer(
-                processed_text,
-                return_tensors="pt",
-                max_length=256,
-                truncation=True,
-                padding=True
-            )
-            
-            # Chuyển inputs sang device
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Predict
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits
-                probabilities = torch.softmax(logits, dim=-1)
-                predicted_label = torch.argmax(logits, dim=-1).item()
-                confidence = probabilities[0][predicted_label].item()
-            
-            # Decision logic theo toxic keywords + PhoBERT
-            # Check for common Vietnamese toxic words first
-            text_lower = processed_text.lower()
-            toxic_keywords = ['đm', 'dm', 'đmm', 'dmm', 'vãi', 'shit', 'fuck', 
-                             'con chó', 'thằng lol', 'mẹ kiếp', 'đồ ngu', 'óc chó',
-                             'nam kỳ', 'bắc kỳ', 'nam kì', 'bắc kì', 'rác']
+            key = self._cache_key(processed_text)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return _copy_result(cached)
             
-            has_toxic_keyword = any(keyword in text_lower for keyword in toxic_keywords)
-            
-            if has_toxic_keyword:
-                # Force reject if contains toxic keywords
-                decision = "reject"
-                reason = "Bình luận chứa từ ngữ không phù hợp"
-            elif predicted_label == 0 and confidence > 0.7:
-                # Only approve clearly positive comments
-                decision = "approve"
-                reason = f"Bình luận tích cực (Label {predicted_label})"
-            elif predicted_label in [1, 2]:
-                # Reject negative and toxic
-                decision = "reject"
-                reason = f"Bình luận tiêu cực/độc hại (Label {predicted_label})"
-            else:
-                # Low confidence
-                decision = "reject"
-                reason = f"Độ tin cậy thấp ({confidence:.2f})"
-            
-            return {
-                "label": predicted_label,
-                "confidence": float(confidence),
-                "description": self.label_descriptions.get(predicted_label, "Unknown"),
-                "decision": decision,
-                "reason": reason,
-                "processed_text": processed_text[:100] + "..." if len(processed_text) > 100 else processed_text,
-                "probabilities": {
-                    "label_0": float(probabilities[0][0]),
-                    "label_1": float(probabilities[0][1]),
-                    "label_2": float(probabilities[0][2])
-                }
-            }
+            probabilities = self._forward([processed_text])[0]
+            started = time.perf_counter()
+            result = self._build_result(processed_text, probabilities)
+            self.result_cache.set(key, result)
+            moderation_metrics.observe("postprocess_seconds", time.perf_counter() - started)
+            return _copy_result(result)
             
         except Exception as e:
             logger.error(f"Lỗi khi predict: {e}")
-            return {
-                "label": 1,  # Default safe label
-                "confidence": 0.0,
-                "description": "Lỗi trong quá trình phân loại",
-                "error": str(e)
-            }
+            return self._error_result(e)
     
-    def predict_batch(self, texts: List[str], batch_size: int = 8) -> List[Dict]:
+    def predict_batch(self, texts: List[str], batch_size: int = DEFAULT_BUCKET_SIZE) -> List[Dict]:
         """
         Phân loại nhiều bình luận cùng lúc
         
+        Văn bản được sắp theo số token rồi chia bucket batch_size, mỗi bucket chỉ
+        pad tới câu dài nhất của chính nó và chạy một forward pass. Kết quả trả về
+        theo đúng thứ tự đầu vào, giống hệt predict_single cho từng item.
+        
         Args:
             texts (List[str]): Danh sách bình luận
             batch_size (int): Kích thước batch để xử lý
@@ -248,23 +446,133 @@ class PhoBERTService:
             List[Dict]: Danh sách kết quả phân loại
         """
         if not self.is_loaded:
-            return [{"label": 1, "confidence": 0.0, "error": "Model not loaded"} for _ in texts]
+            # Kết quả lỗi label 1 như predict_batch gốc; tầng từ khóa không cần model nên vẫn chạy
+            error = RuntimeError("Model not loaded")
+            return [(self.keyword_reject(text) if text else None) or self._error_result(error) for text in texts]
         
-        results = []
+        results = self._predict_batch(texts, batch_size)
+        moderation_metrics.record_decisions(results)
+        return results
+    
+    def _predict_batch(self, texts: List[str], batch_size: int) -> List[Dict]:
+        results: List[Optional[Dict]] = [None] * len(texts)
+        # processed_text -> các vị trí cần kết quả; bình luận trùng chỉ chạy model một lần
+        pending: Dict[str, List[int]] = {}
         
-        # Xử lý theo batch để tránh out of memory
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_results = []
+        for index, text in enumerate(texts):
+            if not text or not text.strip():
+                results[index] = {
+                    "label": 0,
+                    "confidence": 0.5,
+                    "description": "Văn bản trống",
+                    "processed_text": ""
+                }
+                continue
+            
+            keyword_result = self.keyword_reject(text)
+            if keyword_result is not None:
+                results[index] = keyword_result
+                continue
             
-            for text in batch_texts:
-                result = self.predict_single(text)
-                batch_results.append(result)
+            processed_text = self.preprocess_text(text)
+            if not processed_text:
+                results[index] = {
+                    "label": 0,
+                    "confidence": 0.5,
+                    "description": "Văn bản trống sau xử lý",
+                    "processed_text": ""
+                }
+                continue
             
-            results.extend(batch_results)
+            cached = self.result_cache.get(self._cache_key(processed_text))
+            if cached is not None:
+                results[index] = _copy_result(cached)
+                continue
+            
+            pending.setdefault(processed_text, []).append(index)
+        
+        unique_texts = list(pending)
+        if not unique_texts:
+            return results
+        
+        try:
+            features = self._tokenize_unpadded(unique_texts)
+        except Exception as e:
+            logger.error(f"Lỗi khi tokenize batch: {e}")
+            for index in (index for text in unique_texts for index in pending[text]):
+                results[index] = self._error_result(e)
+            return results
+        
+        # Length bucketing: câu ngắn đi cùng câu ngắn để giảm padding thừa
+        order = sorted(range(len(unique_texts)), key=lambda i: len(features[i]["input_ids"]))
+        
+        # Xử lý theo batch để tránh out of memory
+        for i in range(0, len(order), batch_size):
+            bucket = order[i:i + batch_size]
+            chunk_texts = [unique_texts[j] for j in bucket]
+            
+            try:
+                chunk_probabilities = self._forward_encoded([features[j] for j in bucket])
+                started = time.perf_counter()
+                for processed_text, probabilities in zip(chunk_texts, chunk_probabilities):
+                    result = self._build_result(processed_text, probabilities)
+                    self.result_cache.set(self._cache_key(processed_text), result)
+                    for index in pending[processed_text]:
+                        results[index] = _copy_result(result)
+                moderation_metrics.observe("postprocess_seconds", time.perf_counter() - started)
+            except Exception as e:
+                logger.error(f"Lỗi khi predict batch: {e}")
+                for index in (index for text in chunk_texts for index in pending[text]):
+                    results[index] = self._error_result(e)
         
         return results
     
+    def evaluate_backends(self, texts: List[str], backends=AVAILABLE_BACKENDS,
+                          batch_size: int = 16) -> Dict[str, Dict]:
+        """
+        Đo độ đồng thuận và độ trễ của từng backend so với fp32 trên tập held-out
+        
+        Args:
+            texts (List[str]): Bình luận held-out
+            backends (Iterable[str]): Các backend cần đánh giá
+            batch_size (int): Kích thước batch khi chạy
+            
+        Returns:
+            Dict: backend -> agreement, max_prob_diff, ms_per_comment
+        """
+        if not self.is_loaded:
+            return {}
+        
+        processed = [p for p in normalize_batch(texts, PHOBERT_PROFILE) if p]
+        predictions, latencies, failures = {}, {}, {}
+        
+        for name in dict.fromkeys((BACKEND_TORCH, *backends)):
+            try:
+                backend = create_backend(name, self._load_hf_model(), self.tokenizer, self.model_path, self.device)
+            except ValueError as e:
+                # Backend không qua được bước validate với fp32: báo lỗi thay vì đo
+                logger.warning(f"⚠️ Bỏ qua backend {name}: {e}")
+                failures[name] = {"error": str(e)}
+                continue
+            
+            def run(batch_texts, backend=backend):
+                probs = []
+                for i in range(0, len(batch_texts), batch_size):
+                    inputs = self.tokenizer(batch_texts[i:i + batch_size], return_tensors="pt",
+                                            max_length=256, truncation=True, padding=True)
+                    probs.extend(torch.softmax(backend.logits(inputs).float(), dim=-1).tolist())
+                return probs
+            
+            predictions[name], latencies[name] = time_call(run, processed)
+            del backend
+        
+        self.backend_report = {**compare_backends(processed, predictions, latencies), **failures}
+        for name, row in self.backend_report.items():
+            if "error" in row:
+                continue
+            logger.info(f"📊 Backend {name}: agreement {row['agreement']:.2%}, {row['ms_per_comment']} ms/comment")
+        return self.backend_report
+    
     def get_model_info(self) -> Dict:
         """
         Lấy thông tin về model đã load
@@ -278,12 +586,27 @@ class PhoBERTService:
             "device": str(self.device),
             "labels": self.id2label,
             "label_descriptions": self.label_descriptions,
-            "model_available": self.model is not None,
+            "model_available": self.backend is not None,
+            "backend": self.backend.name if self.backend else self.backend_name,
+            "backend_report": self.backend_report,
+            "model_version": self.model_version,
+            "cache": self.result_cache.stats(),
             "tokenizer_available": self.tokenizer is not None
         }
 
 # Singleton instance để sử dụng trong toàn bộ ứng dụng
-phobert_service = PhoBERTService()
+# Model không load khi import; app.model_lifecycle load + warm-up trong background
+phobert_service = PhoBERTService(auto_load=False)
+
+def get_phobert_service() -> PhoBERTService:
+    """
+    Lấy singleton PhoBERTService, load model ở lần gọi đầu tiên
+    
+    Returns:
+        PhoBERTService: Service dùng chung
+    """
+    phobert_service.ensure_loaded()
+    return phobert_service
 
 def classify_comment(text: str) -> Dict:
     """
@@ -295,7 +618,7 @@ def classify_comment(text: str) -> Dict:
     Returns:
         Dict: Kết quả phân loại
     """
-    return phobert_service.predict_single(text)
+    return get_phobert_service().predict_single(text)
 
 def classify_comments_batch(texts: List[str]) -> List[Dict]:
     """
@@ -307,4 +630,4 @@ def classify_comments_batch(texts: List[str]) -> List[Dict]:
     Returns:
         List[Dict]: Danh sách kết quả phân loại
     """
-    return phobert_service.predict_batch(texts) 
\ No newline at end of file
+    return get_phobert_service().predict_batch(texts) 
\ No newline at end of file
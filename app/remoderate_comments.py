@@ -0,0 +1,286 @@
+"""
+Chấm lại toàn bộ bình luận bằng checkpoint PhoBERT hiện tại (chạy sau khi đổi model)
+- Đọc bảng comments theo thứ tự id bằng server-side cursor (yield_per)
+- Phân loại theo batch lớn, ghi sentiment/sentiment_confidence/status bằng bulk UPDATE
+- Lưu id cuối cùng đã xử lý vào file checkpoint để chạy tiếp sau khi bị ngắt
+- Có thể chia dải id cho N process
+
+Ví dụ:
+    python -m app.remoderate_comments --workers 4 --batch-size 256
+    python -m app.remoderate_comments --database-url sqlite:///local.db --dry-run
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = ".remoderate_checkpoint.json"
+# Bình luận đã bị xóa không được chấm lại
+DEFAULT_STATUSES = ("active", "unverified", "pending", "hidden")
+
+
+def _decision_to_row(comment_id: int, result: Dict) -> Optional[Dict]:
+    """Kết quả PhoBERT -> giá trị cột cần UPDATE (None nếu model không đưa ra quyết định)"""
+    from app.models import COMMENT_STATUS_ACTIVE, COMMENT_STATUS_HIDDEN
+
+    decision = result.get("decision")
+    if decision not in ("approve", "reject") or "error" in result:
+        return None
+    return {
+        "id": comment_id,
+        "status": COMMENT_STATUS_ACTIVE if decision == "approve" else COMMENT_STATUS_HIDDEN,
+        "sentiment": result.get("sentiment") or ("positive" if result.get("label") == 0 else "negative"),
+        "sentiment_confidence": f"{float(result.get('confidence', 0.0)):.4f}",
+    }
+
+
+class Checkpoint:
+    """File JSON lưu dải id và id cuối cùng đã commit của một worker"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def load(self) -> Dict:
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, state: Dict):
+        # Ghi file tạm rồi rename để checkpoint không bao giờ bị ghi dở
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _create_engine(database_url: str):
+    from sqlalchemy import event
+    from app.database import create_db_engine
+
+    engine = create_db_engine(database_url)
+    if database_url.startswith("sqlite"):
+        # WAL: cursor đọc và transaction ghi chạy song song trên hai connection
+        @event.listens_for(engine, "connect")
+        def _enable_wal(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+    return engine
+
+
+def _split_ranges(min_id: int, max_id: int, workers: int) -> List[Tuple[int, int]]:
+    """Chia [min_id, max_id] thành các dải rời nhau, mỗi worker một dải"""
+    span = max_id - min_id + 1
+    step = -(-span // workers)
+    return [(start, min(start + step - 1, max_id)) for start in range(min_id, max_id + 1, step)]
+
+
+def remoderate_range(worker_index: int, start_id: int, end_id: int, options: Dict) -> Dict:
+    """
+    Chấm lại các bình luận có id trong [start_id, end_id]
+
+    Args:
+        worker_index (int): Số thứ tự worker (dùng cho tên file checkpoint)
+        start_id (int): id đầu dải
+        end_id (int): id cuối dải
+        options (Dict): Tham số dòng lệnh đã parse
+
+    Returns:
+        Dict: Thống kê processed/updated/unchanged/skipped
+    """
+    import torch
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import Session
+    from app.models import Comment
+    from app.phobert_service import PhoBERTService
+
+    torch.set_num_threads(options["threads"])
+    service = PhoBERTService(model_path=options["model_path"], backend=options["backend"])
+    if not service.is_loaded:
+        raise RuntimeError(f"Không load được PhoBERT từ {options['model_path']}")
+
+    checkpoint = Checkpoint(f"{options['checkpoint']}.w{worker_index}")
+    # Kế hoạch mới lập trong dry-run không xóa checkpoint cũ, chỉ bỏ qua chúng
+    state = {} if options.get("ignore_checkpoints") else checkpoint.load()
+    saved_start, saved_end = state.get("range") or (None, None)
+    if saved_start != start_id or saved_end > end_id or state.get("model_version") != service.model_version:
+        state = {"range": [start_id, end_id], "model_version": service.model_version, "last_id": start_id - 1,
+                 "processed": 0, "updated": 0}
+    elif state["last_id"] >= end_id:
+        logger.info(f"✅ Worker {worker_index}: dải {start_id}-{end_id} đã xong từ lần chạy trước")
+        return state
+    else:
+        # Dải cuối có thể đã được nới tới max id hiện tại (xem run)
+        state["range"] = [start_id, end_id]
+
+    engine = _create_engine(options["database_url"])
+    query = (
+        select(Comment.id, Comment.content, Comment.status, Comment.sentiment, Comment.sentiment_confidence)
+        .where(Comment.id > state["last_id"], Comment.id <= end_id, Comment.status.in_(options["statuses"]))
+        .order_by(Comment.id)
+        .execution_options(yield_per=options["fetch_size"])
+    )
+
+    started = time.perf_counter()
+    logger.info(f"🔄 Worker {worker_index}: chấm lại id {state['last_id'] + 1}-{end_id}")
+
+    def flush(rows):
+        results = service.predict_batch([row.content for row in rows], batch_size=options["bucket_size"])
+        updates = []
+        for row, result in zip(rows, results):
+            values = _decision_to_row(row.id, result)
+            if values and (values["status"], values["sentiment"], values["sentiment_confidence"]) != (
+                    row.status, row.sentiment, row.sentiment_confidence):
+                updates.append(values)
+
+        if updates and not options["dry_run"]:
+            with Session(engine) as write_session:
+                write_session.execute(update(Comment), updates)
+                write_session.commit()
+
+        state["last_id"] = rows[-1].id
+        state["processed"] += len(rows)
+        state["updated"] += len(updates)
+        if not options["dry_run"]:
+            checkpoint.save(state)
+
+        rate = state["processed"] / max(time.perf_counter() - started, 1e-9)
+        logger.info(f"📊 Worker {worker_index}: id ≤ {state['last_id']}, {state['processed']} đã xử lý, "
+                    f"{state['updated']} thay đổi ({rate:.0f} comment/s)")
+
+    # Session đọc riêng: cursor server-side không bị đóng bởi commit của session ghi
+    with Session(engine) as read_session:
+        for partition in read_session.execute(query).partitions(options["batch_size"]):
+            flush(partition)
+
+    engine.dispose()
+    return state
+
+
+def _run_worker(args) -> Dict:
+    worker_index, start_id, end_id, options = args
+    logging.basicConfig(level=logging.INFO)
+    # Mỗi process tự import app.database sau khi DATABASE_URL đã được đặt
+    os.environ["DATABASE_URL"] = options["database_url"]
+    return remoderate_range(worker_index, start_id, end_id, options)
+
+
+def run(options: Dict) -> List[Dict]:
+    """
+    Chia dải id và chạy chấm lại (trong process hiện tại hoặc N process)
+
+    Returns:
+        List[Dict]: Trạng thái cuối của từng worker
+    """
+    from sqlalchemy import func, select
+    from app.models import Comment
+
+    checkpoint = Checkpoint(options["checkpoint"])
+    plan = checkpoint.load()
+
+    engine = _create_engine(options["database_url"])
+    with engine.connect() as connection:
+        min_id, max_id = connection.execute(select(func.min(Comment.id), func.max(Comment.id))).one()
+    engine.dispose()
+    if min_id is None:
+        logger.info("⚠️ Bảng comments trống, không có gì để chấm lại")
+        return []
+
+    if options["reset"] or plan.get("workers") != options["workers"]:
+        min_id = max(min_id, options["start_id"] or min_id)
+        max_id = min(max_id, options["end_id"] or max_id)
+        plan = {"workers": options["workers"], "ranges": _split_ranges(min_id, max_id, options["workers"]),
+                "bounded": options["end_id"] is not None}
+        if options["dry_run"]:
+            options = {**options, "ignore_checkpoints": True}
+        else:
+            for index in range(options["workers"]):
+                Path(f"{options['checkpoint']}.w{index}").unlink(missing_ok=True)
+            checkpoint.save(plan)
+    elif not plan.get("bounded") and max_id > plan["ranges"][-1][1]:
+        # Bình luận mới được thêm sau khi lập kế hoạch: nới dải cuối thay vì bỏ sót chúng
+        logger.info(f"🔄 Nới dải cuối từ id {plan['ranges'][-1][1]} tới id {max_id} (bình luận mới)")
+        plan["ranges"][-1] = [plan["ranges"][-1][0], max_id]
+        if not options["dry_run"]:
+            checkpoint.save(plan)
+
+    jobs = [(index, start, end, options) for index, (start, end) in enumerate(plan["ranges"])]
+    if len(jobs) == 1:
+        states = [_run_worker(jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(len(jobs)) as pool:
+            states = pool.map(_run_worker, jobs)
+
+    if not options["dry_run"]:
+        _rebuild_sentiment_rollups(options["database_url"])
+    return states
+
+
+def _rebuild_sentiment_rollups(database_url: str):
+    """Bulk UPDATE bỏ qua đường ghi từng bình luận nên rollup sentiment được tính lại một lần ở cuối"""
+    from sqlalchemy.orm import Session
+    from app.sentiment_rollup import ensure_rollup_table, rebuild_rollups
+
+    engine = _create_engine(database_url)
+    ensure_rollup_table(engine)
+    with Session(engine) as session:
+        count = rebuild_rollups(session)
+    engine.dispose()
+    logger.info(f"✅ Đã tính lại sentiment rollup cho {count} bài viết")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Chấm lại bình luận bằng checkpoint PhoBERT hiện tại")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"),
+                        help="Postgres hoặc SQLite (mặc định DATABASE_URL)")
+    parser.add_argument("--model-path", default="phobert_toxic_comment_model")
+    parser.add_argument("--backend", default=None, help="torch, torch-int8, onnx (mặc định PHOBERT_BACKEND)")
+    parser.add_argument("--batch-size", type=int, default=512, help="Số bình luận mỗi lần predict + UPDATE")
+    parser.add_argument("--bucket-size", type=int, default=64, help="Số câu mỗi forward pass")
+    parser.add_argument("--fetch-size", type=int, default=2000, help="Số dòng mỗi lần fetch từ cursor")
+    parser.add_argument("--workers", type=int, default=1, help="Số process, mỗi process một dải id")
+    parser.add_argument("--threads", type=int, default=1, help="Số thread torch mỗi process")
+    parser.add_argument("--statuses", default=",".join(DEFAULT_STATUSES))
+    parser.add_argument("--start-id", type=int, help="Chỉ áp dụng khi lập kế hoạch mới (lần đầu hoặc --reset)")
+    parser.add_argument("--end-id", type=int, help="Chỉ áp dụng khi lập kế hoạch mới (lần đầu hoặc --reset)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="Bỏ checkpoint cũ, chạy lại từ đầu")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm thay đổi, không UPDATE")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("Cần --database-url hoặc biến môi trường DATABASE_URL")
+    os.environ["DATABASE_URL"] = args.database_url
+    logging.basicConfig(level=logging.INFO)
+
+    options = {
+        "database_url": args.database_url,
+        "model_path": args.model_path,
+        "backend": args.backend,
+        "batch_size": max(1, args.batch_size),
+        "bucket_size": max(1, args.bucket_size),
+        "fetch_size": max(1, args.fetch_size),
+        "workers": max(1, args.workers),
+        "threads": max(1, args.threads),
+        "statuses": [s.strip() for s in args.statuses.split(",") if s.strip()],
+        "start_id": args.start_id,
+        "end_id": args.end_id,
+        "checkpoint": args.checkpoint,
+        "reset": args.reset,
+        "dry_run": args.dry_run,
+    }
+
+    states = run(options)
+    processed = sum(state.get("processed", 0) for state in states)
+    updated = sum(state.get("updated", 0) for state in states)
+    print(f"✅ Hoàn tất: {processed} bình luận đã chấm lại, {updated} thay đổi"
+          + (" (dry-run)" if options["dry_run"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+"""
+Tìm kiếm toàn văn bài viết (tiêu đề, mô tả, nội dung), không phân biệt dấu ("bong da" khớp "bóng đá")
+- Postgres: cột tsvector sinh tự động (STORED) trên immutable_unaccent(...) + GIN (cần extension unaccent),
+  xếp hạng ts_rank_cd trên cột đó
+- DB khác hoặc không tạo được extension: inverted index trong process, xếp hạng BM25,
+  cập nhật từng bài khi đăng/duyệt/xóa và build lại khi scraper cập nhật file stamp
+Cả hai backend đều cộng điểm cho bài mới (recency) và trả về đoạn trích có <mark> quanh từ khớp.
+Chọn backend bằng SEARCH_BACKEND=auto|postgres|memory
+Không đếm tổng số bài khớp: mỗi trang lấy dư một bài để biết còn trang sau không (has_more).
+Kết quả (id + has_more) theo câu truy vấn đã chuẩn hóa và trang được cache (LRU + TTL);
+đăng/duyệt/xóa bài hoặc scraper cập nhật file stamp thì tăng thế hệ cache, key cũ tự bị loại
+"""
+import heapq
+import html
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from markupsafe import Markup
+from sqlalchemy import func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.category_registry import CATEGORY_REGISTRY_STAMP, stamp_mtime
+from app.models import Article
+from app.text_normalization import HTML_TAG_RE, collapse_whitespace, fold_diacritics
+from app.utils import get_first_image
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "200"))
+SEARCH_RECENCY_WEIGHT = float(os.getenv("SEARCH_RECENCY_WEIGHT", "0.3"))
+SEARCH_RECENCY_HALF_LIFE_DAYS = float(os.getenv("SEARCH_RECENCY_HALF_LIFE_DAYS", "30"))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024"))
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+SNIPPET_LENGTH = 200
+SNIPPET_SOURCE_LENGTH = 3000
+
+# Trọng số từng trường khi đếm tần suất (BM25F rút gọn), tương ứng setweight A/B/C trên Postgres
+FIELD_WEIGHTS = (("title", 3.0), ("description", 2.0), ("content", 1.0))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def fold_text(value: Optional[str]) -> str:
+    """Chữ thường + bỏ dấu (giữ nguyên độ dài chuỗi để map vị trí về văn bản gốc)"""
+    return fold_diacritics((value or "").lower())
+
+
+def plain_text(value: Optional[str]) -> str:
+    """Bỏ thẻ HTML của cột content"""
+    return collapse_whitespace(html.unescape(HTML_TAG_RE.sub(" ", value or "")))
+
+
+def search_terms(query: str) -> List[str]:
+    """Các từ (đã bỏ dấu) của câu truy vấn, không trùng, giữ thứ tự"""
+    return list(dict.fromkeys(TOKEN_RE.findall(fold_text(query))))
+
+
+def recency_boost(date_posted: Optional[datetime], now: datetime) -> float:
+    """Hệ số > 1 cho bài mới, giảm một nửa sau mỗi SEARCH_RECENCY_HALF_LIFE_DAYS ngày"""
+    if date_posted is None:
+        return 1.0
+    age_days = max((now - date_posted).total_seconds(), 0.0) / 86400
+    return 1.0 + SEARCH_RECENCY_WEIGHT * 0.5 ** (age_days / SEARCH_RECENCY_HALF_LIFE_DAYS)
+
+
+def highlight(value: Optional[str], terms: Sequence[str], length: Optional[int] = SNIPPET_LENGTH) -> Optional[Markup]:
+    """
+    Đoạn trích quanh lần khớp đầu tiên, từ khớp được bọc <mark> (so khớp trên văn bản đã bỏ dấu)
+
+    Args:
+        length (int, optional): Độ dài đoạn trích, None là giữ toàn bộ văn bản (tiêu đề)
+
+    Returns:
+        Markup: HTML đã escape, None nếu không có từ nào khớp
+    """
+    if not value or not terms:
+        return None
+    folded = fold_text(value)
+    if len(folded) != len(value):
+        return None
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")\b")
+    matches = list(pattern.finditer(folded))
+    if not matches:
+        return None
+
+    if length is None:
+        length, start = len(value), 0
+    else:
+        start = max(0, matches[0].start() - length // 4)
+    if start > 0:
+        # Bắt đầu đoạn trích ở đầu một từ
+        space = value.find(" ", start)
+        if 0 <= space < matches[0].start():
+            start = space + 1
+    end = min(len(value), start + length)
+
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for match in matches:
+        if match.start() < start:
+            continue
+        if match.end() > end:
+            break
+        parts.append(html.escape(value[position:match.start()]))
+        parts.append(f"<mark>{html.escape(value[match.start():match.end()])}</mark>")
+        position = match.end()
+    parts.append(html.escape(value[position:end]))
+    if end < len(value):
+        parts.append("…")
+    return Markup("".join(parts))
+
+
+class InvertedIndex:
+    """Inverted index trong bộ nhớ: từ (đã bỏ dấu) -> {article_id: tần suất có trọng số}"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.doc_length: Dict[str, float] = {}
+        self.doc_date: Dict[str, Optional[datetime]] = {}
+        self.total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_length)
+
+    @staticmethod
+    def weighted_terms(title: Optional[str], description: Optional[str], content: Optional[str]) -> Counter:
+        counts = Counter()
+        fields = {"title": title, "description": description, "content": plain_text(content)}
+        for field, weight in FIELD_WEIGHTS:
+            for token in TOKEN_RE.findall(fold_text(fields[field])):
+                counts[token] += weight
+        return counts
+
+    def add(self, article_id: str, title: Optional[str], description: Optional[str], content: Optional[str],
+            date_posted: Optional[datetime]):
+        """Thêm hoặc cập nhật một bài viết"""
+        counts = self.weighted_terms(title, description, content)
+        with self._lock:
+            self._remove_locked(article_id)
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[article_id] = frequency
+            length = sum(counts.values())
+            self.doc_terms[article_id] = list(counts)
+            self.doc_length[article_id] = length
+            self.doc_date[article_id] = date_posted
+            self.total_length += length
+
+    def remove(self, article_id: str):
+        with self._lock:
+            self._remove_locked(article_id)
+
+    def _remove_locked(self, article_id: str):
+        terms = self.doc_terms.pop(article_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(article_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_length.pop(article_id, 0.0)
+        self.doc_date.pop(article_id, None)
+
+    def search(self, terms: Sequence[str], limit: int, offset: int = 0) -> Tuple[List[str], int]:
+        """
+        Bài viết chứa tất cả các từ, xếp theo BM25 x recency
+
+        Returns:
+            Tuple[List[str], int]: (article_id của trang yêu cầu, tổng số bài khớp)
+        """
+        with self._lock:
+            count = len(self.doc_length)
+            postings = [self.postings.get(term) for term in terms]
+            if not count or not terms or any(posting is None for posting in postings):
+                return [], 0
+
+            average_length = self.total_length / count
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            idf = [math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5)) for posting in postings]
+            now = datetime.utcnow()
+
+            scores = {}
+            for doc in candidates:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_length[doc] / average_length)
+                score = sum(
+                    weight * posting[doc] * (BM25_K1 + 1) / (posting[doc] + norm)
+                    for weight, posting in zip(idf, postings)
+                )
+                scores[doc] = score * recency_boost(self.doc_date[doc], now)
+
+        top = heapq.nsmallest(min(offset + limit, SEARCH_MAX_RESULTS), scores, key=lambda doc: (-scores[doc], doc))
+        return top[offset:offset + limit], len(scores)
+
+
+class MemorySearchBackend:
+    """Backend dùng InvertedIndex, build từ bảng articles ở lần tìm kiếm đầu tiên"""
+
+    name = "memory"
+
+    def __init__(self, stamp_path: str = CATEGORY_REGISTRY_STAMP):
+        self.index = InvertedIndex()
+        self.stamp_path = stamp_path
+        self._stamp = stamp_mtime(stamp_path)
+        self._build_lock = threading.RLock()
+        self._built = False
+        # Tăng mỗi lần thay index mới (kết quả đã cache trên index cũ không còn dùng)
+        self.version = 0
+        # Thay đổi xảy ra trong lúc build lại, áp dụng lên index mới trước khi thay thế
+        self._pending: Optional[List[Tuple]] = None
+
+    @staticmethod
+    def _build(db: Session) -> InvertedIndex:
+        index = InvertedIndex()
+        rows = db.query(
+            Article.article_id, Article.title, Article.description, Article.content, Article.date_posted
+        ).filter(Article.status == "published").yield_per(500)
+        for row in rows:
+            index.add(row.article_id, row.title, row.description, row.content, row.date_posted)
+        return index
+
+    def rebuild(self, db: Session):
+        """Build index mới rồi thay thế index cũ (index cũ vẫn phục vụ tìm kiếm trong lúc build)"""
+        with self._build_lock:
+            self._pending = []
+            try:
+                index = self._build(db)
+                for operation, args in self._pending:
+                    getattr(index, operation)(*args)
+                self.index = index
+                self._built = True
+                self.version += 1
+            finally:
+                self._pending = None
+        logger.info(f"✅ Search index (memory): {len(self.index)} bài viết")
+
+    def _rebuild_in_background(self):
+        from app.database import SessionLocal
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            except SQLAlchemyError as e:
+                logger.error(f"❌ Lỗi build lại search index: {e}")
+            finally:
+                db.close()
+
+        threading.Thread(target=run, name="search-index-rebuild", daemon=True).start()
+
+    def ensure_ready(self, db: Session):
+        stamp = stamp_mtime(self.stamp_path)
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self._stamp = stamp
+                    self.rebuild(db)
+        elif stamp != self._stamp:
+            # Scraper vừa ghi bài mới (process khác)
+            self._stamp = stamp
+            self._rebuild_in_background()
+
+    def search_ids(self, db: Session, terms: Sequence[str], limit: int, offset: int) -> List[str]:
+        self.ensure_ready(db)
+        return self.index.search(terms, limit, offset)[0]
+
+    def _apply(self, operation: str, *args):
+        getattr(self.index, operation)(*args)
+        if self._pending is not None:
+            self._pending.append((operation, args))
+
+    def index_article(self, article: Article):
+        if article.status == "published":
+            self._apply("add", article.article_id, article.title, article.description, article.content,
+                        article.date_posted)
+        else:
+            self._apply("remove", article.article_id)
+
+    def remove_article(self, article_id: str):
+        self._apply("remove", article_id)
+
+
+class PostgresSearchBackend:
+    """Backend dùng tsvector + GIN, Postgres tự cập nhật index khi bảng articles thay đổi"""
+
+    name = "postgres"
+    version = 0
+
+    # unaccent() không IMMUTABLE nên không dùng trực tiếp trong cột sinh tự động được
+    SEARCH_VECTOR = (
+        "setweight(to_tsvector('simple', immutable_unaccent(coalesce(title, ''))), 'A') || "
+        "setweight(to_tsvector('simple', immutable_unaccent(coalesce(description, ''))), 'B') || "
+        "setweight(to_tsvector('simple', immutable_unaccent(coalesce(content, ''))), 'C')"
+    )
+    SEARCH_INDEX = "ix_articles_search_vector"
+    SETUP_STATEMENTS = (
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        "CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $$ SELECT public.unaccent('public.unaccent', $1) $$",
+        # Vector tính một lần khi ghi bài; lần đầu thêm cột sẽ ghi lại bảng articles (khóa ghi trong lúc đó)
+        f"ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED",
+        # Index biểu thức của phiên bản trước, thay bằng index trên cột search_vector
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_articles_search",
+    )
+    INDEX_STATEMENT = f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {SEARCH_INDEX} ON articles USING GIN (search_vector)"
+    INVALID_INDEX_SQL = """
+        SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name
+    """
+    SEARCH_SQL = """
+        SELECT article_id
+        FROM articles, plainto_tsquery('simple', :query) AS query
+        WHERE status = 'published' AND search_vector @@ query
+        ORDER BY ts_rank_cd(search_vector, query, 32) * CASE WHEN date_posted IS NULL THEN 1.0 ELSE
+            1.0 + :recency_weight * power(0.5, greatest(extract(epoch FROM
+                (now() AT TIME ZONE 'utc') - date_posted), 0) / 86400.0 / :half_life) END DESC,
+            article_id
+        LIMIT :limit OFFSET :offset
+    """
+
+    @classmethod
+    def setup(cls, engine) -> bool:
+        """Tạo extension, hàm, cột search_vector và index GIN (CONCURRENTLY nên không khóa ghi bảng articles)"""
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                for statement in cls.SETUP_STATEMENTS:
+                    connection.execute(text(statement))
+                if connection.execute(text(cls.INVALID_INDEX_SQL), {"name": cls.SEARCH_INDEX}).scalar():
+                    # CREATE INDEX CONCURRENTLY bị ngắt để lại index INVALID, IF NOT EXISTS sẽ bỏ qua nó mãi mãi
+                    logger.warning(f"⚠️ Index {cls.SEARCH_INDEX} không hợp lệ (lần tạo trước bị ngắt), tạo lại")
+                    connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {cls.SEARCH_INDEX}"))
+                connection.execute(text(cls.INDEX_STATEMENT))
+            return True
+        except SQLAlchemyError as e:
+            logger.warning(f"⚠️ Không tạo được full-text search trên Postgres, dùng index trong bộ nhớ: {e}")
+            return False
+
+    def search_ids(self, db: Session, terms: Sequence[str], limit: int, offset: int) -> List[str]:
+        rows = db.execute(text(self.SEARCH_SQL), {
+            "query": " ".join(terms),
+            "recency_weight": SEARCH_RECENCY_WEIGHT,
+            "half_life": SEARCH_RECENCY_HALF_LIFE_DAYS,
+            "limit": limit,
+            "offset": offset,
+        }).all()
+        return [row.article_id for row in rows]
+
+    def index_article(self, article: Article):
+        pass
+
+    def remove_article(self, article_id: str):
+        pass
+
+
+class SearchEngine:
+    """Chọn backend và ghép kết quả (id) với dữ liệu hiển thị + đoạn trích"""
+
+    def __init__(self, backend: str = SEARCH_BACKEND):
+        self.preferred = backend
+        self.backend = None
+        self._setup_lock = threading.Lock()
+        self.result_cache = TTLCache(max_size=SEARCH_RESULT_CACHE_SIZE, ttl=SEARCH_RESULT_CACHE_TTL)
+        # Một phần của key cache: tăng khi bài viết thay đổi thay vì duyệt xóa từng key
+        self.generation = 0
+        self.stamp_path = CATEGORY_REGISTRY_STAMP
+        self._stamp = stamp_mtime(self.stamp_path)
+
+    def setup(self, engine):
+        """Chọn backend (gọi khi khởi động server, hoặc tự gọi ở lần tìm kiếm đầu tiên)"""
+        with self._setup_lock:
+            if self.backend is not None:
+                return self.backend
+            use_postgres = self.preferred == "postgres" or (
+                self.preferred == "auto" and engine.dialect.name == "postgresql"
+            )
+            if use_postgres and PostgresSearchBackend.setup(engine):
+                self.backend = PostgresSearchBackend()
+            else:
+                self.backend = MemorySearchBackend()
+            logger.info(f"🔎 Search backend: {self.backend.name}")
+            return self.backend
+
+    def warm_up(self):
+        """Chọn backend và build index trong bộ nhớ trước request tìm kiếm đầu tiên (chạy trong thread)"""
+        from app.database import SessionLocal, engine
+
+        backend = self.setup(engine)
+        if isinstance(backend, MemorySearchBackend):
+            db = SessionLocal()
+            try:
+                backend.ensure_ready(db)
+            except SQLAlchemyError as e:
+                logger.error(f"❌ Lỗi build search index: {e}")
+            finally:
+                db.close()
+
+    def _get_backend(self, db: Session):
+        return self.backend or self.setup(db.get_bind())
+
+    def invalidate_results(self):
+        """Bỏ toàn bộ kết quả đã cache (O(1): chỉ tăng thế hệ)"""
+        self.generation += 1
+
+    def _check_stamp(self):
+        stamp = stamp_mtime(self.stamp_path)
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self.invalidate_results()
+
+    def search_ids(self, db: Session, query: str, page: int, per_page: int) -> Tuple[List[str], bool]:
+        """
+        Tìm id bài viết của một trang kết quả, dùng kết quả đã cache nếu có
+
+        Returns:
+            Tuple[List[str], bool]: (article_id theo thứ tự liên quan, còn trang sau không)
+        """
+        terms = search_terms(query)
+        offset = (page - 1) * per_page
+        if not terms or offset >= SEARCH_MAX_RESULTS:
+            return [], False
+        backend = self._get_backend(db)
+        self._check_stamp()
+        # "Bóng  Đá" và "bong da" dùng chung một entry
+        key = (self.generation, backend.version, tuple(terms), page, per_page)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return list(cached[0]), cached[1]
+        limit = min(per_page, SEARCH_MAX_RESULTS - offset)
+        # Lấy dư một bài để biết còn trang sau không, thay vì đếm mọi bài khớp
+        fetch = limit + 1 if offset + limit < SEARCH_MAX_RESULTS else limit
+        article_ids = backend.search_ids(db, terms, fetch, offset)
+        has_more = len(article_ids) > limit
+        article_ids = article_ids[:limit]
+        # Lưu theo key lúc bắt đầu: nếu bài viết thay đổi trong lúc tìm, kết quả này không được dùng lại
+        self.result_cache.set(key, (tuple(article_ids), has_more))
+        return article_ids, has_more
+
+    def hydrate(self, db: Session, article_ids: Sequence[str], query: str) -> List[Dict]:
+        """Lấy dữ liệu hiển thị cho các id (một query), giữ thứ tự xếp hạng, kèm đoạn trích"""
+        if not article_ids:
+            return []
+        terms = search_terms(query)
+        rows = db.query(
+            Article.article_id, Article.title, Article.description, Article.image_urls, Article.date_posted,
+            Article.type, Article.author,
+            func.substr(Article.content, 1, SNIPPET_SOURCE_LENGTH).label("content"),
+        ).filter(Article.article_id.in_(list(article_ids)), Article.status == "published").all()
+        by_id = {row.article_id: row for row in rows}
+
+        results = []
+        for article_id in article_ids:
+            row = by_id.get(article_id)
+            if row is None:
+                continue
+            results.append({
+                "article_id": row.article_id,
+                "title": row.title,
+                "title_html": highlight(row.title, terms, length=None) or row.title,
+                "description": row.description or "",
+                "snippet": highlight(row.description, terms) or highlight(plain_text(row.content), terms)
+                           or (row.description or "")[:SNIPPET_LENGTH],
+                "image_urls": get_first_image(row.image_urls) if row.image_urls else "",
+                "date_posted": row.date_posted,
+                "type": row.type,
+                "author": row.author,
+            })
+        return results
+
+    def search(self, db: Session, query: str, page: int = 1, per_page: int = 10) -> Dict:
+        """
+        Tìm kiếm và trả về một trang kết quả hiển thị được
+
+        Chạy đồng bộ (lần đầu có thể phải build index trong bộ nhớ): route async gọi qua threadpool
+
+        Returns:
+            Dict: items, page, has_more (tối đa SEARCH_MAX_RESULTS kết quả), backend
+        """
+        article_ids, has_more = self.search_ids(db, query, page, per_page)
+        return {
+            "items": self.hydrate(db, article_ids, query),
+            "page": page,
+            "has_more": has_more,
+            "backend": self.backend.name if self.backend else None,
+        }
+
+    def index_article(self, article: Article):
+        """Gọi sau khi commit bài viết mới/được duyệt/sửa (backend Postgres tự cập nhật)"""
+        if self.backend is not None:
+            self.backend.index_article(article)
+        self.invalidate_results()
+
+    def remove_article(self, article_id: str):
+        if self.backend is not None:
+            self.backend.remove_article(article_id)
+        self.invalidate_results()
+
+    def cache_stats(self) -> Dict:
+        """Thống kê cache kết quả cho dashboard admin"""
+        return {**self.result_cache.stats(), "generation": self.generation,
+                "backend": self.backend.name if self.backend else None}
+
+
+# Singleton instance dùng chung cho các router
+search_engine = SearchEngine()
@@ -0,0 +1,351 @@
+"""
+Gợi ý khi gõ ô tìm kiếm (/api/search/suggest?q=): tiêu đề bài viết, danh mục và từ khóa đang được tìm nhiều
+- Tiêu đề (đã bỏ dấu) được lưu trong mảng sắp xếp, mỗi vị trí từ trong tiêu đề là một key,
+  tra tiền tố bằng bisect nên "vang hom" khớp "Giá vàng hôm nay"
+- Từ gõ sai (không là tiền tố của từ nào) được sửa bằng khoảng cách chỉnh sửa có giới hạn
+  trên từ điển các từ trong tiêu đề
+- Cập nhật từng bài khi đăng/duyệt/xóa (chèn/xóa bằng bisect, không sắp xếp lại), build lại khi
+  scraper cập nhật file stamp; thay đổi xảy ra trong lúc build lại được áp dụng lên index mới trước khi thay thế
+"""
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.category_registry import CATEGORY_REGISTRY_STAMP, category_registry, stamp_mtime
+from app.models import Article
+from app.search_engine import TOKEN_RE, fold_text
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "8"))
+# Số vị trí từ đầu tiên của tiêu đề được đánh index (giới hạn bộ nhớ)
+SUGGEST_MAX_TITLE_WORDS = int(os.getenv("SUGGEST_MAX_TITLE_WORDS", "12"))
+# Số key tối đa được duyệt cho một tiền tố rất ngắn ("a")
+SUGGEST_MAX_SCAN = 500
+# Số từ phổ biến nhất (cùng chữ cái đầu) được so khớp khi sửa lỗi gõ
+TYPO_CANDIDATES = 2000
+TRENDING_SIZE = 1000
+TRENDING_HALF_LIFE_SECONDS = float(os.getenv("TRENDING_HALF_LIFE_SECONDS", "3600"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def max_edits(token: str) -> int:
+    """Số lỗi gõ cho phép theo độ dài từ"""
+    if len(token) < 3:
+        return 0
+    return 1 if len(token) < 6 else 2
+
+
+def bounded_distance(token: str, word: str, limit: int, prefix: bool = False) -> Optional[int]:
+    """
+    Khoảng cách chỉnh sửa (Levenshtein, đổi chỗ hai ký tự liền nhau tính là một lỗi)
+    giữa token và word (prefix=True: với tiền tố gần nhất của word)
+
+    Returns:
+        int: Khoảng cách, None nếu vượt quá limit (dừng sớm)
+    """
+    if not prefix and abs(len(token) - len(word)) > limit:
+        return None
+    before, previous = None, list(range(len(word) + 1))
+    for i, char in enumerate(token, 1):
+        current = [i]
+        for j, other in enumerate(word, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other))
+            if before and i > 1 and j > 1 and char == word[j - 2] and token[i - 2] == other:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return None
+        before, previous = previous, current
+    distance = min(previous) if prefix else previous[-1]
+    return distance if distance <= limit else None
+
+
+class SuggestionIndex:
+    """Mảng key tiêu đề đã sắp xếp + từ điển từ cho việc sửa lỗi gõ"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.entries: List[Tuple[str, str]] = []  # (key đã bỏ dấu, article_id), sắp xếp theo key
+        self.titles: Dict[str, Tuple[str, float]] = {}  # article_id -> (tiêu đề, timestamp đăng)
+        self.vocabulary: Counter = Counter()  # từ -> số tiêu đề chứa từ đó
+        self._words_by_initial: Dict[str, Set[str]] = {}
+        self._sorted_words: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @staticmethod
+    def _keys(title: str) -> List[str]:
+        words = TOKEN_RE.findall(fold_text(title))
+        return [" ".join(words[i:]) for i in range(min(len(words), SUGGEST_MAX_TITLE_WORDS))]
+
+    @staticmethod
+    def _words(title: str) -> Set[str]:
+        return set(TOKEN_RE.findall(fold_text(title)))
+
+    def load(self, rows: Sequence[Tuple[str, Optional[str], Optional[datetime]]]):
+        """Build toàn bộ từ (article_id, title, date_posted)"""
+        entries, titles, vocabulary = [], {}, Counter()
+        for article_id, title, date_posted in rows:
+            if not title:
+                continue
+            titles[article_id] = (title, (date_posted or _EPOCH).timestamp())
+            entries.extend((key, article_id) for key in self._keys(title))
+            vocabulary.update(self._words(title))
+        entries.sort()
+        by_initial: Dict[str, Set[str]] = {}
+        for word in vocabulary:
+            by_initial.setdefault(word[0], set()).add(word)
+        with self._lock:
+            self.entries, self.titles, self.vocabulary = entries, titles, vocabulary
+            self._sorted_words = sorted(vocabulary)
+            self._words_by_initial = by_initial
+
+    def add(self, article_id: str, title: Optional[str], date_posted: Optional[datetime]):
+        with self._lock:
+            self.remove(article_id)
+            if not title:
+                return
+            self.titles[article_id] = (title, (date_posted or _EPOCH).timestamp())
+            for key in self._keys(title):
+                bisect.insort(self.entries, (key, article_id))
+            for word in self._words(title):
+                self.vocabulary[word] += 1
+                if self.vocabulary[word] == 1:
+                    bisect.insort(self._sorted_words, word)
+                    self._words_by_initial.setdefault(word[0], set()).add(word)
+
+    def remove(self, article_id: str):
+        with self._lock:
+            entry = self.titles.pop(article_id, None)
+            if entry is None:
+                return
+            for key in self._keys(entry[0]):
+                index = bisect.bisect_left(self.entries, (key, article_id))
+                if index < len(self.entries) and self.entries[index] == (key, article_id):
+                    del self.entries[index]
+            for word in self._words(entry[0]):
+                self.vocabulary[word] -= 1
+                if self.vocabulary[word] <= 0:
+                    del self.vocabulary[word]
+                    index = bisect.bisect_left(self._sorted_words, word)
+                    if index < len(self._sorted_words) and self._sorted_words[index] == word:
+                        del self._sorted_words[index]
+                    same_initial = self._words_by_initial.get(word[0])
+                    if same_initial is not None:
+                        same_initial.discard(word)
+                        if not same_initial:
+                            del self._words_by_initial[word[0]]
+
+    def is_known(self, token: str, prefix: bool) -> bool:
+        if not prefix:
+            return token in self.vocabulary
+        index = bisect.bisect_left(self._sorted_words, token)
+        return index < len(self._sorted_words) and self._sorted_words[index].startswith(token)
+
+    def correct(self, token: str, prefix: bool) -> str:
+        """Từ gần nhất trong từ điển (cùng chữ cái đầu), giữ nguyên nếu đã đúng hoặc không tìm được"""
+        limit = max_edits(token)
+        if not limit or self.is_known(token, prefix):
+            return token
+        best, best_distance = token, limit + 1
+        # Chỉ xét các từ phổ biến nhất, theo tần suất giảm dần: gặp khoảng cách bằng nhau thì giữ từ phổ biến hơn
+        with self._lock:
+            candidates = heapq.nsmallest(TYPO_CANDIDATES, self._words_by_initial.get(token[0], ()),
+                                         key=lambda word: (-self.vocabulary[word], word))
+        for word in candidates:
+            distance = bounded_distance(token, word, best_distance - 1, prefix=prefix)
+            if distance is not None and distance < best_distance:
+                best, best_distance = word, distance
+                if distance == 1:
+                    break
+        return best
+
+    def lookup(self, prefix: str, limit: int) -> List[Dict]:
+        """Tiêu đề có một từ bắt đầu bằng prefix (đã bỏ dấu), bài mới trước"""
+        with self._lock:
+            start = bisect.bisect_left(self.entries, (prefix,))
+            matched = set()
+            for key, article_id in self.entries[start:start + SUGGEST_MAX_SCAN]:
+                if not key.startswith(prefix):
+                    break
+                matched.add(article_id)
+            ranked = sorted(matched, key=lambda article_id: -self.titles[article_id][1])[:limit]
+            return [{"article_id": article_id, "title": self.titles[article_id][0]} for article_id in ranked]
+
+
+class TrendingTerms:
+    """Đếm câu truy vấn gần đây, số đếm giảm một nửa sau mỗi TRENDING_HALF_LIFE_SECONDS"""
+
+    def __init__(self, size: int = TRENDING_SIZE, half_life: float = TRENDING_HALF_LIFE_SECONDS):
+        self._lock = threading.Lock()
+        self.size = size
+        self.half_life = half_life
+        self.scores: Dict[str, float] = {}
+        self.display: Dict[str, str] = {}
+        self._last_decay = time.monotonic()
+
+    def _decay(self):
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self._last_decay) / self.half_life)
+        if factor < 0.99:
+            self.scores = {key: score * factor for key, score in self.scores.items()}
+            self._last_decay = now
+
+    def record(self, query: str):
+        key = " ".join(TOKEN_RE.findall(fold_text(query)))
+        if not key:
+            return
+        with self._lock:
+            self._decay()
+            self.scores[key] = self.scores.get(key, 0.0) + 1.0
+            self.display.setdefault(key, " ".join(query.split()))
+            if len(self.scores) > self.size:
+                # Bỏ 10% từ khóa ít được tìm nhất
+                for stale in sorted(self.scores, key=self.scores.get)[:self.size // 10]:
+                    del self.scores[stale]
+                    self.display.pop(stale, None)
+
+    def matching(self, prefix: str, limit: int) -> List[str]:
+        with self._lock:
+            self._decay()
+            keys = [key for key in self.scores if key.startswith(prefix) or f" {prefix}" in key]
+            keys.sort(key=lambda key: -self.scores[key])
+            return [self.display[key] for key in keys[:limit]]
+
+
+class SearchSuggester:
+    """Ghép gợi ý tiêu đề, danh mục và từ khóa xu hướng cho một tiền tố"""
+
+    def __init__(self, stamp_path: str = CATEGORY_REGISTRY_STAMP):
+        self.index = SuggestionIndex()
+        self.trending = TrendingTerms()
+        self.stamp_path = stamp_path
+        self._stamp = stamp_mtime(stamp_path)
+        self._build_lock = threading.RLock()
+        self._built = False
+        # Thay đổi xảy ra trong lúc build lại, áp dụng lên index mới trước khi thay thế
+        self._pending: Optional[List[Tuple]] = None
+
+    def rebuild(self, db: Session):
+        """Build index mới rồi thay thế index cũ (index cũ vẫn phục vụ gợi ý trong lúc build)"""
+        with self._build_lock:
+            self._pending = []
+            try:
+                rows = db.query(Article.article_id, Article.title, Article.date_posted)\
+                    .filter(Article.status == "published").all()
+                index = SuggestionIndex()
+                index.load(rows)
+                for operation, args in self._pending:
+                    getattr(index, operation)(*args)
+                self.index = index
+                self._built = True
+            finally:
+                self._pending = None
+        logger.info(f"✅ Suggestion index: {len(self.index)} tiêu đề")
+
+    def _rebuild_in_background(self):
+        from app.database import SessionLocal
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            except SQLAlchemyError as e:
+                logger.error(f"❌ Lỗi build lại suggestion index: {e}")
+            finally:
+                db.close()
+
+        threading.Thread(target=run, name="suggest-index-rebuild", daemon=True).start()
+
+    def warm_up(self):
+        """Build index lúc khởi động để lần gõ đầu tiên không phải chờ"""
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            self.ensure_ready(db)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Lỗi build suggestion index: {e}")
+        finally:
+            db.close()
+
+    def ensure_ready(self, db: Session):
+        stamp = stamp_mtime(self.stamp_path)
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self._stamp = stamp
+                    self.rebuild(db)
+        elif stamp != self._stamp:
+            self._stamp = stamp
+            self._rebuild_in_background()
+
+    def suggest(self, db: Session, query: str, limit: int = SUGGEST_LIMIT) -> Dict:
+        """
+        Gợi ý cho nội dung đang gõ
+
+        Returns:
+            Dict: titles, categories, trending, corrected (câu truy vấn sau khi sửa lỗi gõ, None nếu không sửa)
+        """
+        self.ensure_ready(db)
+        tokens = TOKEN_RE.findall(fold_text(query))
+        if not tokens:
+            return {"query": query, "titles": [], "categories": [], "trending": [], "corrected": None}
+
+        prefix = " ".join(tokens)
+        result = self._lookup(db, prefix, limit)
+        corrected = None
+        if not any(result.values()):
+            # Không khớp gì: thử sửa lỗi gõ từng từ (từ cuối được xem là tiền tố đang gõ dở)
+            fixed = [self.index.correct(token, prefix=i == len(tokens) - 1) for i, token in enumerate(tokens)]
+            if fixed != tokens:
+                corrected = " ".join(fixed)
+                result = self._lookup(db, corrected, limit)
+        return {"query": query, **result, "corrected": corrected}
+
+    def _lookup(self, db: Session, prefix: str, limit: int) -> Dict:
+        categories = [
+            category for category in category_registry.get_categories(db)
+            if any(key.startswith(prefix) or f" {prefix}" in key
+                   for key in (fold_text(category["name"]), category["slug"].replace("-", " ")))
+        ]
+        return {
+            "titles": self.index.lookup(prefix, limit),
+            "categories": categories[:limit],
+            "trending": self.trending.matching(prefix, limit),
+        }
+
+    def record_query(self, query: str):
+        """Ghi nhận câu truy vấn người dùng đã tìm (nguồn của gợi ý xu hướng)"""
+        self.trending.record(query)
+
+    def _apply(self, operation: str, *args):
+        # Chưa build lần nào thì không cần cập nhật index rỗng, nhưng vẫn ghi lại nếu đang build
+        if self._built:
+            getattr(self.index, operation)(*args)
+        if self._pending is not None:
+            self._pending.append((operation, args))
+
+    def index_article(self, article: Article):
+        if article.status == "published":
+            self._apply("add", article.article_id, article.title, article.date_posted)
+        else:
+            self._apply("remove", article.article_id)
+
+    def remove_article(self, article_id: str):
+        self._apply("remove", article_id)
+
+
+# Singleton instance dùng chung cho các router
+search_suggester = SearchSuggester()
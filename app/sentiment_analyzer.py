@@ -3,31 +3,46 @@ Module phân tích sentiment cho bình luận
 Tích hợp model ML đã train vào hệ thống
 """
 import os
-import re
+import threading
 import joblib
-import pandas as pd
+import numpy as np
 from pathlib import Path
 
+from app.text_normalization import SENTIMENT_PROFILE, normalize, normalize_batch
+
 class SentimentAnalyzer:
     """Class để phân tích sentiment của bình luận"""
     
-    def __init__(self, model_dir="models"):
+    def __init__(self, model_dir="models", auto_load=True):
         """
         Khởi tạo analyzer với đường dẫn đến model
         
         Args:
             model_dir (str): Thư mục chứa model files
+            auto_load (bool): Load model ngay khi khởi tạo
         """
         self.model_dir = Path(model_dir)
         self.model = None
         self.vectorizer = None
         self.is_loaded = False
+        self.load_attempted = False
+        self._load_lock = threading.Lock()
         
         # Thử load model ngay khi khởi tạo
-        self.load_model()
+        if auto_load:
+            self.load_model()
+    
+    def ensure_loaded(self):
+        """Load model nếu chưa từng thử load (an toàn khi gọi từ nhiều thread)"""
+        if not self.load_attempted:
+            with self._load_lock:
+                if not self.load_attempted:
+                    self.load_model()
+        return self.is_loaded
     
     def load_model(self):
         """Load model và vectorizer từ file"""
+        self.load_attempted = True
         try:
             model_path = self.model_dir / "sentiment_model.pkl"
             vectorizer_path = self.model_dir / "vectorizer.pkl"
@@ -57,39 +72,8 @@ class SentimentAnalyzer:
         Returns:
             str: Văn bản đã được xử lý
         """
-        if pd.isna(text) or not text:
-            return ""
-        
-        text = str(text)
-        
-        # 1. Loại bỏ URL
-        text = re.sub(r'http\S+|www\S+|https\S+', ' ', text, flags=re.MULTILINE)
-        
-        # 2. Loại bỏ emoji
-        emoji_pattern = re.compile(
-            "["
-            "\U0001F600-\U0001F64F"  # emoticons
-            "\U0001F300-\U0001F5FF"  # symbols & pictographs
-            "\U0001F680-\U0001F6FF"  # transport & map symbols
-            "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-            "\U00002702-\U000027B0"
-            "\U000024C2-\U0001F251"
-            "]+", flags=re.UNICODE)
-        text = emoji_pattern.sub(r' ', text)
-        
-        # 3. Đưa về chữ thường
-        text = text.lower()
-        
-        # 4. Chuẩn hóa các ký tự lặp lại
-        text = re.sub(r'(.)\1+', r'\1', text)
-        
-        # 5. Chỉ giữ lại chữ cái tiếng Việt và khoảng trắng
-        text = re.sub(r'[^a-zàáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ\s]', ' ', text)
-        
-        # 6. Xử lý khoảng trắng thừa
-        text = ' '.join(text.split())
-        
-        return text
+        # URL, emoji, chữ thường, ký tự lặp, chỉ giữ chữ cái tiếng Việt (xem app.text_normalization)
+        return normalize(text, SENTIMENT_PROFILE)
     
     def predict_sentiment(self, text):
         """
@@ -101,58 +85,62 @@ class SentimentAnalyzer:
         Returns:
             dict: Kết quả phân tích với sentiment và confidence
         """
+        return self.predict_batch([text])[0]
+    
+    def predict_batch(self, texts):
+        """
+        Dự đoán sentiment cho nhiều văn bản cùng lúc
+        
+        Cả danh sách được vectorize bằng một lần transform và chạy một lần predict_proba;
+        nhãn lấy theo argmax của xác suất nên model chỉ phải tính một lần.
+        
+        Args:
+            texts (list): Danh sách các văn bản
+            
+        Returns:
+            list: Danh sách kết quả phân tích
+        """
         if not self.is_loaded:
-            return {
+            return [{
                 "sentiment": "neutral",
                 "confidence": 0.0,
                 "error": "Model chưa được load"
-            }
+            } for _ in texts]
+        
+        processed_texts = normalize_batch(texts, SENTIMENT_PROFILE)
+        results = [{
+            "sentiment": "neutral",
+            "confidence": 0.0,
+            "note": "Text rỗng sau khi xử lý"
+        } for _ in texts]
+        
+        indices = [i for i, processed in enumerate(processed_texts) if processed.strip()]
+        if not indices:
+            return results
         
         try:
-            # Tiền xử lý
-            processed_text = self.preprocess_text(text)
-            
-            if not processed_text.strip():
-                return {
+            # Một ma trận sparse cho cả batch, một lần predict_proba
+            vectorized = self.vectorizer.transform([processed_texts[i] for i in indices])
+            probabilities = self.model.predict_proba(vectorized)
+            best = probabilities.argmax(axis=1)
+            labels = self.model.classes_[best]
+            confidences = probabilities[np.arange(len(indices)), best]
+        except Exception as e:
+            for index in indices:
+                results[index] = {
                     "sentiment": "neutral",
                     "confidence": 0.0,
-                    "note": "Text rỗng sau khi xử lý"
+                    "error": f"Lỗi khi phân tích: {str(e)}"
                 }
-            
-            # Vectorize
-            vectorized = self.vectorizer.transform([processed_text])
-            
-            # Dự đoán
-            prediction = self.model.predict(vectorized)[0]
-            probabilities = self.model.predict_proba(vectorized)[0]
-            confidence = max(probabilities)
-            
-            return {
-                "sentiment": prediction,
+            return results
+        
+        for index, label, confidence in zip(indices, labels.tolist(), confidences.tolist()):
+            processed_text = processed_texts[index]
+            results[index] = {
+                "sentiment": label,
                 "confidence": float(confidence),
                 "processed_text": processed_text[:100] + "..." if len(processed_text) > 100 else processed_text
             }
-            
-        except Exception as e:
-            return {
-                "sentiment": "neutral",
-                "confidence": 0.0,
-                "error": f"Lỗi khi phân tích: {str(e)}"
-            }
-    
-    def predict_batch(self, texts):
-        """
-        Dự đoán sentiment cho nhiều văn bản cùng lúc
-        
-        Args:
-            texts (list): Danh sách các văn bản
-            
-        Returns:
-            list: Danh sách kết quả phân tích
-        """
-        results = []
-        for text in texts:
-            results.append(self.predict_sentiment(text))
         return results
     
     def get_sentiment_stats(self, comments):
@@ -168,17 +156,14 @@ class SentimentAnalyzer:
         if not comments:
             return {"positive": 0, "negative": 0, "neutral": 0}
         
-        sentiments = []
-        for comment in comments:
-            result = self.predict_sentiment(comment)
-            sentiments.append(result["sentiment"])
+        sentiments = np.array([result["sentiment"] for result in self.predict_batch(comments)])
         
         # Đếm phân bố
         stats = {
-            "positive": sentiments.count("positive"),
-            "negative": sentiments.count("negative"), 
-            "neutral": sentiments.count("neutral"),
-            "total": len(sentiments)
+            "positive": int(np.count_nonzero(sentiments == "positive")),
+            "negative": int(np.count_nonzero(sentiments == "negative")),
+            "neutral": int(np.count_nonzero(sentiments == "neutral")),
+            "total": int(sentiments.size)
         }
         
         # Tính phần trăm
@@ -189,7 +174,18 @@ class SentimentAnalyzer:
         return stats
 
 # Tạo instance global để sử dụng trong toàn bộ app
-sentiment_analyzer = SentimentAnalyzer()
+# Model được load lazily (app.model_lifecycle load sẵn khi khởi động server)
+sentiment_analyzer = SentimentAnalyzer(auto_load=False)
+
+def get_sentiment_analyzer():
+    """
+    Lấy instance global, load model ở lần gọi đầu tiên
+    
+    Returns:
+        SentimentAnalyzer: Analyzer dùng chung
+    """
+    sentiment_analyzer.ensure_loaded()
+    return sentiment_analyzer
 
 def analyze_comment_sentiment(text):
     """
@@ -201,7 +197,7 @@ def analyze_comment_sentiment(text):
     Returns:
         dict: Kết quả phân tích sentiment
     """
-    return sentiment_analyzer.predict_sentiment(text)
+    return get_sentiment_analyzer().predict_sentiment(text)
 
 def get_comment_stats(comments):
     """
@@ -213,4 +209,4 @@ def get_comment_stats(comments):
     Returns:
         dict: Thống kê phân bố sentiment
     """
-    return sentiment_analyzer.get_sentiment_stats(comments) 
\ No newline at end of file
+    return get_sentiment_analyzer().get_sentiment_stats(comments) 
\ No newline at end of file
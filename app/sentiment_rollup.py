@@ -0,0 +1,230 @@
+"""
+Tổng hợp sentiment theo bài viết (bảng article_sentiment_rollups)
+Đường ghi bình luận cộng/trừ bộ đếm bằng UPDATE nguyên tử trong cùng transaction,
+trang chi tiết và dashboard chỉ cần đọc một dòng thay vì quét + dự đoán lại toàn bộ bình luận
+
+Backfill (tạo bảng nếu chưa có rồi tính lại từ bảng comments):
+    python -m app.sentiment_rollup
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Float, case, cast, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models import ArticleSentimentRollup, Comment, VISIBLE_COMMENT_STATUSES
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_COLUMNS = {
+    "positive": "positive_count",
+    "negative": "negative_count",
+    "neutral": "neutral_count",
+}
+
+
+def _column_for(sentiment: Optional[str]) -> str:
+    return SENTIMENT_COLUMNS.get(sentiment or "neutral", "neutral_count")
+
+
+def _confidence(value) -> float:
+    # sentiment_confidence lưu dạng String(10)
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def ensure_rollup_table(engine):
+    """Tạo bảng rollup nếu chưa có (gọi khi khởi động server và trước khi backfill)"""
+    ArticleSentimentRollup.__table__.create(bind=engine, checkfirst=True)
+
+
+def apply_sentiment_delta(db: Session, article_id: str, sentiment: Optional[str], confidence, sign: int = 1):
+    """
+    Cộng (sign=1) hoặc trừ (sign=-1) một bình luận vào rollup của bài viết
+
+    Phép cộng chạy trong SQL (col = col + 1) nên không có read-modify-write giữa các request.
+    Hàm không commit: caller commit cùng với thay đổi của bình luận.
+    """
+    table = ArticleSentimentRollup.__table__
+    column = _column_for(sentiment)
+    confidence = _confidence(confidence) * sign
+    now = datetime.utcnow()
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        values = {name: 0 for name in SENTIMENT_COLUMNS.values()}
+        values.update({"article_id": article_id, column: sign, "confidence_sum": confidence, "last_updated": now})
+        statement = insert(table).values(**values)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.article_id],
+            set_={
+                column: table.c[column] + sign,
+                "confidence_sum": table.c.confidence_sum + confidence,
+                "last_updated": now,
+            },
+        ))
+        return
+
+    # Dialect khác: UPDATE nguyên tử, chưa có dòng thì INSERT
+    result = db.execute(
+        update(table)
+        .where(table.c.article_id == article_id)
+        .values({column: table.c[column] + sign, "confidence_sum": table.c.confidence_sum + confidence,
+                 "last_updated": now})
+    )
+    if result.rowcount == 0:
+        values = {name: 0 for name in SENTIMENT_COLUMNS.values()}
+        values.update({"article_id": article_id, column: sign, "confidence_sum": confidence, "last_updated": now})
+        db.execute(table.insert().values(**values))
+
+
+def record_new_comment(db: Session, comment: Comment):
+    """Cộng bình luận vừa tạo vào rollup nếu nó được hiển thị"""
+    if comment.status in VISIBLE_COMMENT_STATUSES:
+        apply_sentiment_delta(db, comment.article_id, comment.sentiment, comment.sentiment_confidence)
+
+
+def record_comment_change(db: Session, comment: Comment, old_status: str, old_sentiment: Optional[str],
+                          old_confidence):
+    """
+    Cập nhật rollup khi status/sentiment của bình luận thay đổi (gọi trước khi commit)
+
+    Args:
+        comment (Comment): Bình luận với giá trị mới
+        old_status, old_sentiment, old_confidence: Giá trị trước khi thay đổi
+    """
+    if old_status in VISIBLE_COMMENT_STATUSES:
+        apply_sentiment_delta(db, comment.article_id, old_sentiment, old_confidence, sign=-1)
+    if comment.status in VISIBLE_COMMENT_STATUSES:
+        apply_sentiment_delta(db, comment.article_id, comment.sentiment, comment.sentiment_confidence)
+
+
+def remove_article(db: Session, article_id: str):
+    """
+    Xóa bình luận và rollup của một bài viết bị xóa (gọi trước khi commit, cùng transaction với bài viết)
+
+    Bình luận mồ côi sẽ khiến rebuild_rollups tạo lại rollup cho bài viết không còn tồn tại.
+    """
+    db.execute(delete(Comment).where(Comment.article_id == article_id))
+    db.execute(delete(ArticleSentimentRollup).where(ArticleSentimentRollup.article_id == article_id))
+
+
+def _summarize(row: Optional[ArticleSentimentRollup]) -> Dict:
+    positive = row.positive_count if row else 0
+    negative = row.negative_count if row else 0
+    neutral = row.neutral_count if row else 0
+    total = positive + negative + neutral
+    summary = {
+        "positive": positive,
+        "negative": negative,
+        "neutral": neutral,
+        "total": total,
+        "mean_confidence": round(row.confidence_sum / total, 4) if row and total else 0.0,
+        "last_updated": row.last_updated.isoformat() if row and row.last_updated else None,
+    }
+    for key in ("positive", "negative", "neutral"):
+        summary[f"{key}_percent"] = round(summary[key] / total * 100, 1) if total else 0.0
+    return summary
+
+
+def get_article_sentiment(db: Session, article_id: str) -> Dict:
+    """
+    Tóm tắt sentiment của một bài viết (một lần tra theo khóa chính)
+
+    Returns:
+        Dict: positive/negative/neutral, phần trăm, mean_confidence, last_updated
+    """
+    return _summarize(db.get(ArticleSentimentRollup, article_id))
+
+
+def get_sentiment_overview(db: Session, limit: int = 10) -> Dict:
+    """
+    Tổng sentiment toàn hệ thống + các bài viết có nhiều bình luận nhất (cho dashboard admin)
+    """
+    table = ArticleSentimentRollup
+    totals = db.query(
+        func.coalesce(func.sum(table.positive_count), 0),
+        func.coalesce(func.sum(table.negative_count), 0),
+        func.coalesce(func.sum(table.neutral_count), 0),
+        func.coalesce(func.sum(table.confidence_sum), 0.0),
+    ).one()
+    positive, negative, neutral, confidence_sum = totals
+    total = positive + negative + neutral
+
+    top_rows = db.query(table).order_by(
+        (table.positive_count + table.negative_count + table.neutral_count).desc()
+    ).limit(limit).all()
+
+    return {
+        "totals": {
+            "positive": int(positive),
+            "negative": int(negative),
+            "neutral": int(neutral),
+            "total": int(total),
+            "mean_confidence": round(float(confidence_sum) / total, 4) if total else 0.0,
+        },
+        "articles": [{"article_id": row.article_id, **_summarize(row)} for row in top_rows],
+    }
+
+
+def rebuild_rollups(db: Session, article_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Tính lại rollup từ bảng comments bằng một câu GROUP BY (backfill / sau khi chấm lại hàng loạt)
+
+    Args:
+        article_ids (Iterable[str], optional): Chỉ tính lại các bài viết này, mặc định toàn bộ
+
+    Returns:
+        int: Số bài viết có rollup
+    """
+    article_ids = list(article_ids) if article_ids is not None else None
+    query = (
+        select(
+            Comment.article_id,
+            func.sum(case((Comment.sentiment == "positive", 1), else_=0)),
+            func.sum(case((Comment.sentiment == "negative", 1), else_=0)),
+            # Sentiment lạ (None, ...) được tính là neutral, giống đường ghi
+            func.sum(case((Comment.sentiment.in_(["positive", "negative"]), 0), else_=1)),
+            func.coalesce(func.sum(cast(Comment.sentiment_confidence, Float)), 0.0),
+        )
+        .where(Comment.status.in_(VISIBLE_COMMENT_STATUSES))
+        .group_by(Comment.article_id)
+    )
+    delete_statement = delete(ArticleSentimentRollup)
+    if article_ids is not None:
+        query = query.where(Comment.article_id.in_(article_ids))
+        delete_statement = delete_statement.where(ArticleSentimentRollup.article_id.in_(article_ids))
+
+    now = datetime.utcnow()
+    rows: List[Dict] = [
+        {"article_id": article_id, "positive_count": positive, "negative_count": negative,
+         "neutral_count": neutral, "confidence_sum": float(confidence_sum), "last_updated": now}
+        for article_id, positive, negative, neutral, confidence_sum in db.execute(query)
+    ]
+
+    db.execute(delete_statement)
+    if rows:
+        db.execute(ArticleSentimentRollup.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_rollup_table(engine)
+    session = SessionLocal()
+    try:
+        count = rebuild_rollups(session)
+        print(f"✅ Đã backfill sentiment rollup cho {count} bài viết")
+    finally:
+        session.close()
@@ -0,0 +1,151 @@
+"""
+Chuẩn hóa văn bản tiếng Việt dùng chung cho train và serve
+Mọi regex được compile một lần ở cấp module; mỗi nơi sử dụng chọn một profile:
+- PHOBERT_PROFILE: đầu vào PhoBERT (app.phobert_service)
+- SENTIMENT_PROFILE: đầu vào vectorizer sentiment (app.sentiment_analyzer)
+- EXPORT_PROFILE: cột cleaned_content khi xuất bình luận (data_scraping/comment_collector.py)
+- MATCHING_PROFILE: đầu vào bộ lọc từ khóa độc hại (app.toxic_matcher)
+Tokenize cho Naive Bayes (NaiveBayes-NLP.py) dùng tokenize_words
+"""
+import math
+import re
+import string
+import unicodedata
+from typing import Callable, Iterable, List, Sequence
+
+# ===== Pattern compile sẵn =====
+URL_RE = re.compile(r"http[s]?://\S+|www\.\S+")
+LOOSE_URL_RE = re.compile(r"http\S+|www\S+|https\S+")
+EMAIL_RE = re.compile(r"\S+@\S+")
+PHONE_RE = re.compile(r"\b\d{10,11}\b")
+HTML_TAG_RE = re.compile(r"<.*?>")
+NON_WORD_RE = re.compile(r"[^\w\s]")
+PHOBERT_SPECIAL_RE = re.compile(r"[^\w\s\.,!?]")
+EMOJI_RE = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "]+", flags=re.UNICODE)
+REPEAT_RE = re.compile(r"(.)\1+")  # "quáaaa" -> "quáa" -> "quá"
+LONG_REPEAT_RE = re.compile(r"(.)\1{2,}")  # chỉ rút gọn chuỗi lặp từ 3 ký tự ("đmmmm")
+NON_VIETNAMESE_RE = re.compile(
+    r"[^a-zàáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ\s]"
+)
+
+# ===== Bảng str.translate =====
+# Ký tự leetspeak thường gặp -> chữ cái
+LEET_DIGIT_TABLE = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t"})
+LEET_SYMBOL_TABLE = str.maketrans({"@": "a", "$": "s", "!": "i", "|": "l"})
+# Ký hiệu chỉ được đổi khi nằm giữa chữ/số ("sh!t");
+# đứng đầu/cuối từ ("dm!", "rác!") thì vẫn là dấu câu, tức là ranh giới từ
+LEET_SYMBOL_RUN_RE = re.compile(r"(?<=[^\W_])[@$!|]+(?=[^\W_])")
+
+# Bỏ dấu tiếng Việt: mỗi ký tự có dấu -> chữ cái gốc (giữ nguyên độ dài chuỗi)
+FOLD_TABLE = {
+    code: unicodedata.normalize("NFD", chr(code))[0]
+    for code in range(0x00C0, 0x1EFA)
+    if unicodedata.normalize("NFD", chr(code))[0].isascii()
+    and unicodedata.normalize("NFD", chr(code))[0].isalpha()
+}
+FOLD_TABLE.update({ord("đ"): "d", ord("Đ"): "D"})
+
+
+# ===== Các bước chuẩn hóa =====
+def collapse_whitespace(text: str) -> str:
+    return " ".join(text.split())
+
+
+def fold_diacritics(text: str) -> str:
+    """Bỏ dấu tiếng Việt (đ -> d, ố -> o, ...)"""
+    return text.translate(FOLD_TABLE)
+
+
+def translate_leet(text: str) -> str:
+    """Đổi leetspeak về chữ cái, ký hiệu ở đầu/cuối từ được giữ nguyên"""
+    text = LEET_SYMBOL_RUN_RE.sub(lambda m: m.group().translate(LEET_SYMBOL_TABLE), text)
+    return text.translate(LEET_DIGIT_TABLE)
+
+
+def _sub(pattern: re.Pattern, replacement: str) -> Callable[[str], str]:
+    return lambda text: pattern.sub(replacement, text)
+
+
+class NormalizationProfile:
+    """Chuỗi bước chuẩn hóa áp dụng theo thứ tự"""
+
+    def __init__(self, name: str, steps: Sequence[Callable[[str], str]]):
+        self.name = name
+        self.steps = tuple(steps)
+
+    def __call__(self, text) -> str:
+        # None / NaN (từ pandas) -> chuỗi rỗng
+        if text is None or (isinstance(text, float) and math.isnan(text)) or text == "":
+            return ""
+        text = str(text)
+        for step in self.steps:
+            text = step(text)
+        return text
+
+    def __repr__(self) -> str:
+        return f"NormalizationProfile({self.name!r})"
+
+
+PHOBERT_PROFILE = NormalizationProfile("phobert", [
+    _sub(URL_RE, " "),
+    _sub(EMAIL_RE, " "),
+    _sub(PHONE_RE, " "),
+    # Bỏ ký tự đặc biệt nhưng giữ dấu câu cơ bản
+    _sub(PHOBERT_SPECIAL_RE, " "),
+    collapse_whitespace,
+])
+
+SENTIMENT_PROFILE = NormalizationProfile("sentiment", [
+    _sub(LOOSE_URL_RE, " "),
+    _sub(EMOJI_RE, " "),
+    str.lower,
+    _sub(REPEAT_RE, r"\1"),
+    _sub(NON_VIETNAMESE_RE, " "),
+    collapse_whitespace,
+])
+
+EXPORT_PROFILE = NormalizationProfile("export", [
+    _sub(HTML_TAG_RE, ""),
+    _sub(NON_WORD_RE, ""),
+    str.lower,
+    str.strip,
+])
+
+MATCHING_PROFILE = NormalizationProfile("matching", [
+    lambda text: unicodedata.normalize("NFC", text),
+    str.lower,
+    translate_leet,
+    _sub(LONG_REPEAT_RE, r"\1"),
+])
+
+
+def normalize(text: str, profile: NormalizationProfile = PHOBERT_PROFILE) -> str:
+    """
+    Chuẩn hóa một văn bản theo profile
+
+    Args:
+        text (str): Văn bản gốc (None/NaN được coi là rỗng)
+        profile (NormalizationProfile): Profile của nơi sử dụng
+
+    Returns:
+        str: Văn bản đã chuẩn hóa
+    """
+    return profile(text)
+
+
+def normalize_batch(texts: Iterable[str], profile: NormalizationProfile = PHOBERT_PROFILE) -> List[str]:
+    """Chuẩn hóa nhiều văn bản theo cùng một profile"""
+    return [profile(text) for text in texts]
+
+
+def tokenize_words(text: str) -> List[str]:
+    """Tách từ theo khoảng trắng, bỏ dấu câu ở hai đầu và đưa về chữ thường"""
+    return [word.strip(string.punctuation).lower() for word in text.split()]
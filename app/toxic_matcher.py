@@ -0,0 +1,204 @@
+"""
+Bộ lọc từ khóa độc hại dùng automaton Aho-Corasick
+Chạy trước tokenize/PhoBERT: bình luận khớp từ khóa bị từ chối mà không cần forward pass
+"""
+import logging
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.text_normalization import MATCHING_PROFILE, fold_diacritics, normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEXICON_PATH = Path(__file__).parent / "lexicons" / "toxic_keywords.txt"
+
+# Dấu chấm/gạch chen giữa các chữ cái để lách bộ lọc ("d.m", "s-h-i-t")
+INNER_PUNCTUATION_RE = re.compile(r"(?<=[^\W_])[.\-_]+(?=[^\W_])")
+# Dấu * thay cho một nguyên âm ("f*ck", "sh*t")
+MASK_CHAR = "*"
+MASKABLE_VOWELS = "aeiouy"
+
+def normalize_for_matching(text: str) -> str:
+    """NFC + chữ thường + leetspeak + rút gọn ký tự lặp"""
+    return normalize(text, MATCHING_PROFILE)
+
+
+class AhoCorasick:
+    """Automaton Aho-Corasick đơn giản trên từng ký tự Unicode"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern)
+
+    def _build(self):
+        """Tính fail link theo BFS"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        Duyệt text một lần, trả về (vị trí bắt đầu, pattern) cho mọi lần khớp
+
+        Args:
+            text (str): Văn bản đã chuẩn hóa
+        """
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield index - len(pattern) + 1, pattern
+
+
+def _is_word_boundary(text: str, start: int, end: int) -> bool:
+    """Từ khóa phải đứng riêng, không nằm giữa một từ khác ("dm" trong "admin")"""
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+
+def _masked_variants(keyword: str) -> List[str]:
+    """Các biến thể che một nguyên âm bằng * ("fuck" -> "f*ck")"""
+    return [
+        keyword[:i] + MASK_CHAR + keyword[i + 1:]
+        for i, char in enumerate(keyword)
+        if char in MASKABLE_VOWELS
+    ]
+
+
+class ToxicKeywordMatcher:
+    """Khớp nhiều từ khóa độc hại cùng lúc, có chuẩn hóa dấu và leetspeak"""
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Args:
+            keywords (Iterable[str]): Danh sách từ khóa (có dấu hoặc không dấu)
+        """
+        normalized = {normalize_for_matching(k.strip()) for k in keywords if k and k.strip()}
+        self.keywords = sorted(normalized)
+
+        # Từ khóa có dấu chỉ khớp đúng dấu; từ khóa không dấu khớp thêm trên văn bản đã bỏ dấu
+        self._exact = AhoCorasick(self.keywords)
+        # Pattern của lượt bỏ dấu -> từ khóa gốc được báo cáo
+        self._canonical: Dict[str, str] = {}
+        for keyword in self.keywords:
+            folded = fold_diacritics(keyword)
+            # Cụm nhiều âm tiết viết không dấu ("do ngu", "me kiep") vẫn là cụm độc hại;
+            # từ đơn có dấu ("vãi", "rác") thì không, bản không dấu trùng với từ thường ("vai", "rac")
+            if folded != keyword and " " not in keyword:
+                continue
+            for variant in (folded, *_masked_variants(folded)):
+                self._canonical.setdefault(variant, keyword)
+        self._folded = AhoCorasick(self._canonical)
+
+    @classmethod
+    def from_file(cls, path) -> "ToxicKeywordMatcher":
+        """Đọc lexicon: mỗi dòng một từ khóa, bỏ qua dòng trống và dòng bắt đầu bằng #"""
+        with open(path, "r", encoding="utf-8") as f:
+            keywords = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+        return cls(keywords)
+
+    def find_all(self, text: str) -> List[str]:
+        """
+        Tìm tất cả từ khóa xuất hiện trong văn bản
+
+        Args:
+            text (str): Bình luận gốc (chưa tiền xử lý)
+
+        Returns:
+            List[str]: Các từ khóa khớp (không trùng lặp)
+        """
+        return list(dict.fromkeys(self._iter(text)))
+
+    def first_match(self, text: str) -> Optional[str]:
+        """Từ khóa đầu tiên khớp, hoặc None nếu bình luận sạch"""
+        return next(self._iter(text), None)
+
+    def _iter(self, text: str) -> Iterator[str]:
+        if not text:
+            return
+        normalized = normalize_for_matching(text)
+        folded = fold_diacritics(normalized)
+        passes = [(self._exact, normalized), (self._folded, folded)]
+        squeezed = INNER_PUNCTUATION_RE.sub("", folded)
+        if squeezed != folded:
+            passes.append((self._folded, squeezed))
+
+        for automaton, candidate in passes:
+            for start, pattern in automaton.iter_matches(candidate):
+                if _is_word_boundary(candidate, start, start + len(pattern)):
+                    yield self._canonical.get(pattern, pattern) if automaton is self._folded else pattern
+
+
+def load_toxic_matcher(path: Optional[str] = None) -> ToxicKeywordMatcher:
+    """
+    Load matcher từ file lexicon (mặc định TOXIC_LEXICON_PATH hoặc app/lexicons/toxic_keywords.txt)
+
+    Returns:
+        ToxicKeywordMatcher: Matcher đã compile
+    """
+    path = Path(path or os.getenv("TOXIC_LEXICON_PATH") or DEFAULT_LEXICON_PATH)
+    matcher = ToxicKeywordMatcher.from_file(path)
+    logger.info(f"✅ Đã compile {len(matcher.keywords)} từ khóa độc hại từ {path}")
+    return matcher
+
+
+# Singleton instance, compile một lần khi import
+toxic_matcher = load_toxic_matcher()
+
+
+def keyword_reject(text: str, matcher: Optional[ToxicKeywordMatcher] = None) -> Optional[Dict]:
+    """
+    Kết quả reject (cùng định dạng với PhoBERT) nếu bình luận khớp từ khóa độc hại
+
+    Args:
+        text (str): Bình luận gốc
+        matcher (ToxicKeywordMatcher, optional): Mặc định dùng toxic_matcher
+
+    Returns:
+        Optional[Dict]: Kết quả reject, None nếu bình luận sạch
+    """
+    keyword = (matcher or toxic_matcher).first_match(text)
+    if keyword is None:
+        return None
+
+    return {
+        "label": 2,
+        "confidence": 1.0,
+        "description": "Bình luận độc hại/spam",
+        "decision": "reject",
+        "reason": "Bình luận chứa từ ngữ không phù hợp",
+        "matched_keyword": keyword,
+        "stage": "keyword",
+        "processed_text": text[:100] + "..." if len(text) > 100 else text
+    }
@@ -1,52 +1,108 @@
 from fastapi import APIRouter, Request, Depends, Query, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
-from app.models import Article, User
+from sqlalchemy import func, select
+from app.models import Article, User, COMMENT_STATUS_ACTIVE, COMMENT_STATUS_PENDING, COMMENT_STATUS_UNVERIFIED, VISIBLE_COMMENT_STATUSES
 from app.database import get_db
 from fastapi.templating import Jinja2Templates
-from app.utils import process_images, get_first_image
-import math
+from app.utils import article_card, process_images
+import asyncio
+import os
 from typing import Optional
 from app.schemas import ArticleCreate
+from app.model_lifecycle import model_lifecycle
+from app.inference_queue import INFERENCE_MODE
+from app.moderation_admission import admission_controller, moderate_comment
+from app.moderation_metrics import moderation_metrics
+from app.sentiment_rollup import get_article_sentiment, record_new_comment
+from app.pagination import InvalidCursor, cached_count, paginate_keyset
+from app.category_registry import category_display_name, category_registry
+from app.fragment_cache import fragment_cache, invalidate_article_fragments
+from app.http_cache import Validators, bump_content_version, content_version_query
+from app.search_engine import search_engine
+from app.search_suggest import search_suggester
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates/")
 
-# Lấy danh mục từ bài viết
+# Lấy danh mục từ bài viết (cache trong category_registry, không query mỗi lần render)
+# Menu danh mục ở navbar/footer được render sẵn một lần qua fragment_cache
 def get_base_categories(db: Session):
-    categories_query = db.query(Article.type).distinct().all()
-    mapping = {
-        "nhip-song-tre": "Nhịp sống trẻ",
-        "thoi-su": "Thời sự",
-        "xe": "Xe",
-        "kinh-doanh": "Kinh doanh",
-        "giai-tri": "Giải trí",
-        "the-thao": "Thể thao",
-        "chinh-tri": "Chính trị",
-        "phap-luat": "Pháp luật",
-        "suc-khoe": "Sức khỏe",
-        "van-hoa": "Văn hóa",
-        "cong-nghe": "Công nghệ",
-        "du-lich": "Du lịch",
-        "am-nhac": "Âm nhạc",
-        "giao-duc": "Giáo dục",
-        "the-gioi": "Thế giới",
-        "kinh-te-ky-thuat": "Kinh tế & Kỹ thuật",
-    }
-    
-    categories = []
-    for cat in categories_query:
-        slug = cat[0].lower()
-        name = mapping.get(slug, slug.replace("-", " ").title())
-        categories.append({"slug": slug, "name": name})
+    categories = category_registry.get_categories(db)
+    chrome_key = tuple(cat["slug"] for cat in categories)
     
     return {
         "topbar_categories": categories,
         "navbar_categories": categories,
         "footer_categories": categories,
+        "navbar_html": fragment_cache.render(
+            templates, ("navbar", chrome_key), "user/partials/navbar_categories.html",
+            lambda: {"navbar_categories": categories}
+        ),
+        "footer_nav_html": fragment_cache.render(
+            templates, ("footer", chrome_key), "user/partials/footer_categories.html",
+            lambda: {"navbar_categories": categories}
+        ),
+    }
+
+def _comment_author(user: Optional[User]) -> dict:
+    return {
+        "user_name": f"{user.first_name} {user.last_name}" if user else "Người dùng",
+        "user_avatar": user.avatar_url if user else None,
     }
 
+# Lấy một trang bình luận gốc kèm phản hồi và tác giả bằng 4 query:
+# đếm, trang bình luận gốc (keyset theo created_at, id), phản hồi (parent_id IN ...), tác giả (id IN ...)
+def load_comment_thread(db: Session, article_id: str, cursor: Optional[str], per_page: int):
+    from app.models import Comment
+    
+    visible = Comment.status.in_(VISIBLE_COMMENT_STATUSES)
+    total_visible = db.query(func.count(Comment.id)).filter(Comment.article_id == article_id, visible).scalar()
+    
+    roots_query = db.query(Comment).filter(
+        Comment.article_id == article_id,
+        Comment.parent_id == None,  # Chỉ lấy bình luận gốc, không lấy phản hồi
+        visible
+    )
+    comment_page = paginate_keyset(roots_query, (Comment.created_at, Comment.id), per_page, cursor)
+    comments = comment_page.items
+    
+    replies_by_parent = {comment.id: [] for comment in comments}
+    if replies_by_parent:
+        replies = db.query(Comment).filter(
+            Comment.parent_id.in_(list(replies_by_parent)),
+            visible
+        ).order_by(Comment.created_at.asc()).all()
+        for reply in replies:
+            replies_by_parent[reply.parent_id].append(reply)
+    
+    user_ids = {comment.user_id for comment in comments}
+    user_ids.update(reply.user_id for replies in replies_by_parent.values() for reply in replies)
+    users = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()} if user_ids else {}
+    
+    result_comments = []
+    for comment in comments:
+        result_comments.append({
+            "id": comment.id,
+            "content": comment.content,
+            **_comment_author(users.get(comment.user_id)),
+            "created_at": comment.created_at,
+            "likes": comment.likes or 0,
+            "replies": [
+                {
+                    "id": reply.id,
+                    "content": reply.content,
+                    **_comment_author(users.get(reply.user_id)),
+                    "created_at": reply.created_at,
+                    "likes": reply.likes or 0
+                }
+                for reply in replies_by_parent[comment.id]
+            ]
+        })
+    
+    comment_page.items = result_comments
+    return comment_page, total_visible
+
 # Dependency: Xác thực người dùng qua cookie "user_email"
 async def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
     Email = request.cookies.get("user_email")
@@ -69,6 +125,18 @@ def check_author_or_admin(
         raise HTTPException(status_code=403, detail="Bạn không phải Author hoặc Admin. Không thể truy cập.")
     return db_user
 
+# Validator cho trang danh sách: bài mới nhất (dùng index) + phiên bản nội dung trong DB (đổi khi sửa/xóa bài),
+# cùng một query; phiên bản nội dung cũng làm mới fragment cache của worker này
+def listing_validators(request: Request, db: Session, *parts, category: Optional[str] = None,
+                       current_user: Optional[User] = None) -> Validators:
+    newest_query = db.query(func.max(Article.date_posted), content_version_query()).filter(Article.status == "published")
+    if category is not None:
+        newest_query = newest_query.filter(Article.type == category)
+    newest, content_version = newest_query.one()
+    fragment_cache.sync_version(content_version)
+    return Validators(request, (content_version, category, *parts), [newest],
+                      user_key=current_user.id if current_user else None)
+
 # Trang chủ
 @router.get("/", response_class=HTMLResponse)
 @router.get("/home", response_class=HTMLResponse)
@@ -77,170 +145,211 @@ async def home(
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    featured_post = db.query(Article).filter(Article.status=="published")\
-                         .order_by(Article.date_posted.desc()).first()
-    if featured_post:
-        featured_post.image_urls = get_first_image(featured_post.image_urls) if featured_post.image_urls else ""
-    popular_posts = db.query(Article).filter(Article.status=="published")\
-                        .order_by(Article.date_posted.desc()).limit(5).all()
-    latest_posts = db.query(Article).filter(Article.status=="published")\
-                       .order_by(Article.date_posted.desc()).limit(8).all()
+    validators = listing_validators(request, db, "home", current_user=current_user)
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
+    
+    # Khối bài viết chỉ đổi khi có bài được đăng/duyệt/xóa: render một lần, các request sau lấy từ cache
+    def build_home_articles():
+        # Nổi bật, phổ biến và mới nhất cùng sắp theo date_posted DESC: một query 8 bài rồi cắt
+        latest_posts = process_images(
+            db.query(Article).filter(Article.status=="published")
+              .order_by(Article.date_posted.desc()).limit(8).all()
+        )
+        return {
+            "featured_post": latest_posts[0] if latest_posts else None,
+            "popular_posts": latest_posts[:5],
+            "latest_posts": latest_posts,
+        }
+    
+    home_articles_html = fragment_cache.render(
+        templates, ("home",), "user/partials/home_articles.html", build_home_articles
+    )
     base_categories = get_base_categories(db)
     
-    return templates.TemplateResponse(
+    return validators.apply(templates.TemplateResponse(
         "user/home.html",
         {
             "request": request,
-            "featured_post": featured_post,
-            "popular_posts": process_images(popular_posts),
-            "latest_posts": process_images(latest_posts),
+            "home_articles_html": home_articles_html,
             "user": current_user,
             **base_categories,
         }
-    )
+    ))
 
 # Trang danh mục
+CATEGORY_PAGE_SIZE = int(os.getenv("CATEGORY_PAGE_SIZE", "12"))
+CARD_DESCRIPTION_LENGTH = 200
+
+# Chỉ lấy các cột cần cho thẻ bài viết (không kéo cột content HTML), mô tả cắt sẵn trong SQL
+def article_cards_query(db: Session):
+    return db.query(
+        Article.article_id,
+        Article.title,
+        func.substr(Article.description, 1, CARD_DESCRIPTION_LENGTH).label("description"),
+        Article.image_urls,
+        Article.date_posted,
+    )
+
 @router.get("/category/{category}", response_class=HTMLResponse)
 async def get_category(
     request: Request, 
     category: str, 
+    cursor: Optional[str] = None,
+    per_page: int = Query(CATEGORY_PAGE_SIZE, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    category_posts = db.query(Article).filter(Article.type == category, Article.status == "published").order_by(Article.date_posted.desc()).all()
+    validators = listing_validators(request, db, cursor, per_page, category=category, current_user=current_user)
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
+    
+    def build_category_posts():
+        # Lọc bằng (type, status) rồi seek theo (date_posted, article_id): khớp index ix_articles_type_status_date
+        cards_query = article_cards_query(db).filter(Article.type == category, Article.status == "published")
+        try:
+            category_page = paginate_keyset(cards_query, (Article.date_posted, Article.article_id), per_page, cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Tham số phân trang không hợp lệ")
+        
+        if not category_page.items and not cursor:
+            raise HTTPException(status_code=404, detail="Không có bài viết nào trong danh mục này.")
+        return {
+            "category_posts": [article_card(row) for row in category_page.items],
+            "category_page": category_page,
+        }
     
-    if not category_posts:
-        raise HTTPException(status_code=404, detail="Không có bài viết nào trong danh mục này.")
+    # Lỗi 400/404 được raise trong build_category_posts nên không bị cache
+    category_posts_html = fragment_cache.render(
+        templates, ("category", category, cursor, per_page), "user/partials/category_posts.html",
+        build_category_posts
+    )
 
     # Lấy danh sách danh mục từ get_base_categories
     base_categories = get_base_categories(db)
 
     # Tìm tên danh mục dựa trên slug
-    category_name = next(
-        (cat["name"] for cat in base_categories["navbar_categories"] if cat["slug"] == category),
-        category.replace("-", " ").title()  # Nếu không tìm thấy, mặc định format slug
-    )
+    category_name = category_display_name(category)
 
-    return templates.TemplateResponse(
+    return validators.apply(templates.TemplateResponse(
         "user/category.html",
         {
             "request": request,
             "category_slug": category,  # Vẫn giữ slug nếu cần
             "category_name": category_name,  # Truyền tên danh mục đầy đủ
-            "category_posts": process_images(category_posts),
+            "category_posts_html": category_posts_html,
             "user": current_user,
             **base_categories,
         }
-    )
+    ))
 
 # Trang chi tiết bài viết
 @router.get("/news_detail/{article_id}", response_class=HTMLResponse, name="news_detail")
 async def news_detail(
     request: Request, 
     article_id: str, 
-    comment_page: int = Query(1, ge=1),
+    comment_cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    article = db.query(Article).filter(Article.article_id==article_id, Article.status=="published").first()
-    if not article:
+    # Validator từ một query chỉ đọc cột nhỏ (không kéo content HTML): ngày đăng, bình luận thay đổi gần nhất
+    # (tạo, sửa, đổi trạng thái, like đều cập nhật updated_at), số bình luận, phiên bản nội dung
+    article_comments = Comment.article_id == article_id
+    state = db.query(
+        Article.date_posted,
+        select(func.max(Comment.updated_at)).where(article_comments).scalar_subquery(),
+        select(func.count(Comment.id)).where(article_comments).scalar_subquery(),
+        content_version_query(),
+    ).filter(Article.article_id == article_id, Article.status == "published").first()
+    if not state:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại hoặc chưa được xuất bản")
     
-    # Lấy danh sách bình luận với phân trang
-    comments_per_page = 10
-    comments_query = db.query(Comment).filter(
-        Comment.article_id == article_id,
-        Comment.parent_id == None,  # Chỉ lấy bình luận gốc, không lấy phản hồi
-        Comment.status == "active"
-    ).order_by(Comment.created_at.desc())
-    
-    total_comments = comments_query.count()
-    total_pages = math.ceil(total_comments / comments_per_page)
+    date_posted, comments_changed, comments_total, content_version = state
+    fragment_cache.sync_version(content_version)
+    validators = Validators(
+        request,
+        (article_id, comment_cursor, comments_total, content_version),
+        [date_posted, comments_changed],
+        user_key=current_user.id if current_user else None,
+    )
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
     
-    comments = comments_query.offset((comment_page - 1) * comments_per_page).limit(comments_per_page).all()
+    article = db.query(Article).filter(Article.article_id == article_id).first()
+    if not article:
+        raise HTTPException(status_code=404, detail="Bài viết không tồn tại hoặc chưa được xuất bản")
     
-    # Lấy thông tin người dùng và phản hồi cho mỗi bình luận
-    result_comments = []
-    for comment in comments:
-        user = db.query(User).filter(User.id == comment.user_id).first()
-        
-        # Lấy các phản hồi cho bình luận này
-        replies_query = db.query(Comment).filter(
-            Comment.parent_id == comment.id,
-            Comment.status == "active"
-        ).order_by(Comment.created_at.asc())
-        
-        replies = []
-        for reply in replies_query.all():
-            reply_user = db.query(User).filter(User.id == reply.user_id).first()
-            replies.append({
-                "id": reply.id,
-                "content": reply.content,
-                "user_name": f"{reply_user.first_name} {reply_user.last_name}" if reply_user else "Người dùng",
-                "user_avatar": reply_user.avatar_url if reply_user else None,
-                "created_at": reply.created_at,
-                "likes": reply.likes or 0
-            })
-        
-        result_comments.append({
-            "id": comment.id,
-            "content": comment.content,
-            "user_name": f"{user.first_name} {user.last_name}" if user else "Người dùng",
-            "user_avatar": user.avatar_url if user else None,
-            "created_at": comment.created_at,
-            "likes": comment.likes or 0,
-            "replies": replies
-        })
+    # Lấy danh sách bình luận với phân trang (số query cố định, không phụ thuộc số bình luận)
+    comments_per_page = 10
+    try:
+        comment_page, total_comments = load_comment_thread(db, article_id, comment_cursor, comments_per_page)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Tham số phân trang không hợp lệ")
     
     # Cập nhật comments_count cho article
-    article.comments_count = db.query(Comment).filter(
-        Comment.article_id == article_id,
-        Comment.status == "active"
-    ).count()
+    article.comments_count = total_comments
     
     base_categories = get_base_categories(db)
-    return templates.TemplateResponse(
+    return validators.apply(templates.TemplateResponse(
         "user/news_detail.html",
         {
             "request": request,
             "article": article,
             "user": current_user,
-            "comments": result_comments,
-            "current_page": comment_page,
-            "total_pages": total_pages,
+            "comments": comment_page.items,
+            "sentiment_summary": get_article_sentiment(db, article_id),
+            "comment_page": comment_page,
             **base_categories,
         }
-    )
+    ))
 
 # Trang tất cả bài viết với phân trang
 @router.get("/all_posts", response_class=HTMLResponse, name="all_posts")
 async def all_posts(
     request: Request, 
     db: Session = Depends(get_db),
-    page: int = Query(1, alias="page", ge=1),
-    per_page: int = 10,
+    cursor: Optional[str] = None,
+    per_page: int = Query(10, ge=1, le=50),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    total_posts = db.query(Article).filter(Article.status=="published").count()
-    posts = db.query(Article).filter(Article.status=="published")\
-              .order_by(Article.date_posted.desc()) \
-              .offset((page - 1) * per_page) \
-              .limit(per_page) \
-              .all()
+    validators = listing_validators(request, db, "all_posts", cursor, per_page, current_user=current_user)
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
+    
+    posts_page = get_posts_page(db, cursor=cursor, per_page=per_page)
     base_categories = get_base_categories(db)
-    return templates.TemplateResponse(
+    return validators.apply(templates.TemplateResponse(
         "user/all_post.html",
         {
             "request": request,
-            "all_posts": process_images(posts),
-            "page": page,
-            "total_pages": math.ceil(total_posts / per_page),
+            "all_posts": process_images(posts_page.items),
+            "posts_page": posts_page,
             "user": current_user,
             **base_categories,
         }
-    )
+    ))
 
 
+# Danh sách bài viết đã xuất bản theo keyset (date_posted, article_id), dùng chung cho HTML và JSON
+def get_posts_page(db: Session, cursor: Optional[str] = None, per_page: int = 10):
+    posts_query = db.query(Article).filter(Article.status=="published")
+    try:
+        return paginate_keyset(
+            posts_query, (Article.date_posted, Article.article_id), per_page, cursor,
+            total=cached_count(posts_query, ("published_posts",)),
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Tham số phân trang không hợp lệ")
+
+
+# Tìm kiếm chạy trong thread: lần tìm đầu tiên có thể phải build index trong bộ nhớ, không được chặn event loop
+async def search_in_executor(db: Session, query: str, page: int, per_page: int):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: search_engine.search(db, query, page=page, per_page=per_page))
 
 # Trang tìm kiếm bài viết
 POSTS_PER_PAGE = 3
@@ -248,38 +357,88 @@ POSTS_PER_PAGE = 3
 async def search_post(
     request: Request,
     query: str = "",
-    page: int = Query(1, alias="page", ge=1),
+    page: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user)
 ):
     query = query.strip()
     try:
-        db.execute(text("SELECT 1"))
-        # Điều kiện tìm kiếm kết hợp với trạng thái published
-        search_filter = func.lower(Article.title).like(func.lower(f"%{query}%")) if query else True
-        total_posts = db.query(Article).filter(search_filter, Article.status=="published").count()
-        total_pages = math.ceil(total_posts / POSTS_PER_PAGE)
-        results = db.query(Article).filter(search_filter, Article.status=="published") \
-                     .order_by(Article.date_posted.desc()) \
-                     .offset((page - 1) * POSTS_PER_PAGE) \
-                     .limit(POSTS_PER_PAGE) \
-                     .all()
+        if query:
+            # Kết quả xếp theo độ liên quan nên phân trang theo số trang (tối đa SEARCH_MAX_RESULTS kết quả)
+            search = await search_in_executor(db, query, page, POSTS_PER_PAGE)
+            results, results_page = search["items"], None
+            if page == 1 and results:
+                search_suggester.record_query(query)
+        else:
+            # Không có từ khóa: danh sách bài mới nhất
+            results_page = get_posts_page(db, cursor=cursor, per_page=POSTS_PER_PAGE)
+            results, search = process_images(results_page.items), None
         base_categories = get_base_categories(db)
         return templates.TemplateResponse(
             "user/search_post.html",
             {
                 "request": request,
                 "query": query,
-                "results": process_images(results),
-                "current_page": page,
-                "total_pages": total_pages,
+                "results": results,
+                "search": search,
+                "results_page": results_page,
                 "user": current_user,
                 **base_categories,
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi tìm kiếm: {str(e)}")
 
+
+# API phân trang bài viết cho client JSON (crawler, app): ?cursor=<next_cursor> để lấy trang tiếp theo
+@router.get("/api/posts")
+async def list_posts(
+    cursor: Optional[str] = None,
+    per_page: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    posts_page = get_posts_page(db, cursor=cursor, per_page=per_page)
+    return posts_page.to_dict(lambda post: {
+        "article_id": post.article_id,
+        "title": post.title,
+        "description": post.description,
+        "date_posted": post.date_posted.isoformat() if post.date_posted else None,
+        "type": post.type,
+        "author": post.author,
+    })
+
+# API tìm kiếm toàn văn cho client JSON: kết quả theo độ liên quan, snippet là HTML có <mark>
+@router.get("/api/search")
+async def api_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    search = await search_in_executor(db, q.strip(), page, per_page)
+    search["items"] = [
+        {
+            **item,
+            "title_html": str(item["title_html"]),
+            "snippet": str(item["snippet"]),
+            "date_posted": item["date_posted"].isoformat() if item["date_posted"] else None,
+        }
+        for item in search["items"]
+    ]
+    return search
+
+# API gợi ý khi gõ ô tìm kiếm: tiêu đề, danh mục, từ khóa xu hướng (chịu được lỗi gõ, không cần dấu)
+@router.get("/api/search/suggest")
+async def api_search_suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    return search_suggester.suggest(db, q, limit=limit)
+
 # Trang video chi tiết
 @router.get("/video_detail", response_class=HTMLResponse)
 async def video_detail(
@@ -356,8 +515,12 @@ def upload_news(article: ArticleCreate, db: Session = Depends(get_db)):
             video_urls=article.video_urls
         )
         db.add(db_article)
+        bump_content_version(db)
         db.commit()
         db.refresh(db_article)
+        invalidate_article_fragments(db_article.type)
+        search_engine.index_article(db_article)
+        search_suggester.index_article(db_article)
         return {"message": "Bài viết đã được đăng!", "article_id": new_id}
     except Exception as e:
         print(f"Lỗi trong upload_news: {e}")
@@ -390,6 +553,13 @@ from app.models import Comment
 from fastapi import Form, Cookie
 from typing import Optional
 
+# Phản hồi khi PhoBERT chưa sẵn sàng (worker vừa khởi động)
+MODERATION_LOADING_RESPONSE = {
+    "success": False,
+    "message": "⏳ Hệ thống kiểm duyệt đang khởi động, vui lòng thử lại sau giây lát",
+    "status": "moderation_loading"
+}
+
 # Thêm các API endpoints cho bình luận
 @router.post("/api/comments")
 async def create_comment(request: Request, article_id: str = Form(...), content: str = Form(...), 
@@ -412,18 +582,21 @@ async def create_comment(request: Request, article_id: str = Form(...), content:
     if not article:
         return {"success": False, "message": "Bài viết không tồn tại"}
     
+    # Model đang load trong background → trả lời ngay thay vì chặn request
+    if model_lifecycle.is_pending("phobert"):
+        model_lifecycle.start_background_loading()
+        return MODERATION_LOADING_RESPONSE
+    
     # === PHÂN LOẠI TRỰC TIẾP VỚI PHOBERT ===
     try:
-        from app.phobert_service import classify_comment
-        
-        # Phân loại bình luận với PhoBERT
-        prediction = classify_comment(content)
+        # Phân loại bình luận trong latency budget (micro-batch PhoBERT, quá tải thì dùng tầng rẻ)
+        prediction = await moderate_comment(content)
         label = prediction.get("label")
         confidence = prediction.get("confidence", 0.0)
         decision = prediction.get("decision")
         reason = prediction.get("reason", "Không xác định")
         
-        print(f"🤖 PhoBERT: {content[:30]}... → Label {label}, Confidence {confidence:.2f}, Decision {decision}")
+        print(f"🤖 PhoBERT: {content[:30]}... → Label {label}, Confidence {confidence:.2f}, Decision {decision}, Stage {prediction.get('stage')}")
         
         if decision == "reject":
             # Label 2 hoặc confidence thấp → REJECT ngay, không lưu DB
@@ -438,6 +611,39 @@ async def create_comment(request: Request, article_id: str = Form(...), content:
                 }
             }
         
+        elif decision == "pending":
+            # Quá tải và tầng rẻ không đủ chắc chắn → lưu ẩn, chấm lại bất đồng bộ
+            try:
+                new_comment = Comment(
+                    article_id=article_id,
+                    user_id=user_id,
+                    content=content,
+                    likes=0,
+                    status=COMMENT_STATUS_PENDING,
+                    sentiment="neutral",
+                    sentiment_confidence=0.0
+                )
+                db.add(new_comment)
+                record_new_comment(db, new_comment)
+                db.commit()
+                db.refresh(new_comment)
+                admission_controller.schedule_rescore(new_comment.id, content)
+                
+                return {
+                    "success": True,
+                    "comment_id": new_comment.id,
+                    "message": reason,
+                    "status": "pending_moderation"
+                }
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Lỗi lưu database: {e}")
+                return {
+                    "success": False,
+                    "message": f"Lỗi lưu bình luận chờ duyệt: {str(e)}",
+                    "status": "db_error"
+                }
+        
         elif decision == "approve":
             # Label 0/1 và confidence cao → APPROVE, lưu vào DB
             try:
@@ -447,11 +653,12 @@ async def create_comment(request: Request, article_id: str = Form(...), content:
                     user_id=user_id,
         content=content,
                     likes=0,
-                    status="active",
-                    sentiment="positive" if label == 0 else "negative",
+                    status=COMMENT_STATUS_UNVERIFIED if prediction.get("rescore") else COMMENT_STATUS_ACTIVE,
+                    sentiment=prediction.get("sentiment") or ("positive" if label == 0 else "negative"),
                     sentiment_confidence=confidence
                 )
                 db.add(new_comment)
+                record_new_comment(db, new_comment)
                 
                 # Cập nhật số lượng bình luận trong bài viết
                 article.comments_count = db.query(Comment).filter(Comment.article_id == article_id).count() + 1
@@ -460,6 +667,8 @@ async def create_comment(request: Request, article_id: str = Form(...), content:
                 db.refresh(new_comment)
                 
                 print(f"✅ Comment {new_comment.id} đã được lưu vào database")
+                if prediction.get("rescore"):
+                    admission_controller.schedule_rescore(new_comment.id, content)
                 
                 # Lấy thông tin user để trả về cho frontend
                 user = db.query(User).filter(User.id == user_id).first()
@@ -511,6 +720,7 @@ async def create_comment(request: Request, article_id: str = Form(...), content:
                 sentiment_confidence=0.0
             )
             db.add(new_comment)
+            record_new_comment(db, new_comment)
             
             article.comments_count = db.query(Comment).filter(Comment.article_id == article_id).count() + 1
             db.commit()
@@ -567,18 +777,21 @@ async def reply_comment(request: Request, article_id: str = Form(...), parent_id
     if not parent_comment:
         return {"success": False, "message": "Bình luận gốc không tồn tại"}
     
+    # Model đang load trong background → trả lời ngay thay vì chặn request
+    if model_lifecycle.is_pending("phobert"):
+        model_lifecycle.start_background_loading()
+        return MODERATION_LOADING_RESPONSE
+    
     # === PHÂN LOẠI PHẢN HỒI VỚI PHOBERT ===
     try:
-        from app.phobert_service import classify_comment
-        
-        # Phân loại phản hồi với PhoBERT
-        prediction = classify_comment(content)
+        # Phân loại phản hồi trong latency budget (micro-batch PhoBERT, quá tải thì dùng tầng rẻ)
+        prediction = await moderate_comment(content)
         label = prediction.get("label")
         confidence = prediction.get("confidence", 0.0)
         decision = prediction.get("decision")
         reason = prediction.get("reason", "Không xác định")
         
-        print(f"🤖 PhoBERT Reply: {content[:30]}... → Label {label}, Confidence {confidence:.2f}, Decision {decision}")
+        print(f"🤖 PhoBERT Reply: {content[:30]}... → Label {label}, Confidence {confidence:.2f}, Decision {decision}, Stage {prediction.get('stage')}")
         
         if decision == "reject":
             # Label 2 hoặc confidence thấp → REJECT ngay, không lưu DB
@@ -593,6 +806,40 @@ async def reply_comment(request: Request, article_id: str = Form(...), parent_id
                 }
             }
         
+        elif decision == "pending":
+            # Quá tải và tầng rẻ không đủ chắc chắn → lưu ẩn, chấm lại bất đồng bộ
+            try:
+                new_reply = Comment(
+                    article_id=article_id,
+                    user_id=user_id,
+                    content=content,
+                    parent_id=parent_id,
+                    likes=0,
+                    status=COMMENT_STATUS_PENDING,
+                    sentiment="neutral",
+                    sentiment_confidence=0.0
+                )
+                db.add(new_reply)
+                record_new_comment(db, new_reply)
+                db.commit()
+                db.refresh(new_reply)
+                admission_controller.schedule_rescore(new_reply.id, content)
+                
+                return {
+                    "success": True,
+                    "comment_id": new_reply.id,
+                    "message": reason,
+                    "status": "pending_moderation"
+                }
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Lỗi lưu reply database: {e}")
+                return {
+                    "success": False,
+                    "message": f"Lỗi lưu phản hồi chờ duyệt: {str(e)}",
+                    "status": "db_error"
+                }
+        
         elif decision == "approve":
             # Label 0/1 và confidence cao → APPROVE, lưu vào DB
             try:
@@ -603,15 +850,18 @@ async def reply_comment(request: Request, article_id: str = Form(...), parent_id
         content=content,
                     parent_id=parent_id,
                     likes=0,
-                    status="active",
-                    sentiment="positive" if label == 0 else "negative",
+                    status=COMMENT_STATUS_UNVERIFIED if prediction.get("rescore") else COMMENT_STATUS_ACTIVE,
+                    sentiment=prediction.get("sentiment") or ("positive" if label == 0 else "negative"),
                     sentiment_confidence=confidence
                 )
                 db.add(new_reply)
+                record_new_comment(db, new_reply)
                 db.commit()
                 db.refresh(new_reply)
                 
                 print(f"✅ Reply {new_reply.id} đã được lưu vào database")
+                if prediction.get("rescore"):
+                    admission_controller.schedule_rescore(new_reply.id, content)
                 
                 # Lấy thông tin user để trả về cho frontend
                 user = db.query(User).filter(User.id == user_id).first()
@@ -664,6 +914,7 @@ async def reply_comment(request: Request, article_id: str = Form(...), parent_id
             sentiment_confidence=0.0
         )
         db.add(new_reply)
+        record_new_comment(db, new_reply)
         db.commit()
         db.refresh(new_reply)
 
@@ -715,16 +966,63 @@ async def like_comment(request: Request, comment_id: int, db: Session = Depends(
     
     return {"success": True, "likes": comment.likes}
 
-@router.get("/api/moderation-status")
-async def get_moderation_status():
-    """Check if AI moderation is enabled"""
+# API phân trang bình luận gốc (kèm phản hồi) của bài viết theo keyset (created_at, id)
+@router.get("/api/articles/{article_id}/comments")
+async def list_article_comments(
+    article_id: str,
+    cursor: Optional[str] = None,
+    per_page: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
     try:
-        from app.phobert_service import get_phobert_service
-        service = get_phobert_service()
+        comment_page, total_comments = load_comment_thread(db, article_id, cursor, per_page)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Tham số phân trang không hợp lệ")
+    
+    def serialize(comment):
         return {
-            "enabled": service.is_model_loaded(), 
-            "model": "PhoBERT",
-            "status": "active" if service.is_model_loaded() else "inactive"
+            **comment,
+            "created_at": comment["created_at"].isoformat() if comment["created_at"] else None,
+            "replies": [
+                {**reply, "created_at": reply["created_at"].isoformat() if reply["created_at"] else None}
+                for reply in comment["replies"]
+            ],
         }
-    except Exception as e:
-        return {"enabled": False, "model": "PhoBERT", "status": "error", "error": str(e)}
\ No newline at end of file
+    
+    return {**comment_page.to_dict(serialize), "total": total_comments}
+
+@router.get("/api/articles/{article_id}/sentiment")
+async def get_article_sentiment_summary(article_id: str, db: Session = Depends(get_db)):
+    """Tóm tắt sentiment bình luận của bài viết (đọc từ bảng rollup)"""
+    return {"success": True, "data": get_article_sentiment(db, article_id)}
+
+@router.get("/api/moderation-status")
+async def get_moderation_status():
+    """Trạng thái AI moderation của worker: loading/ready/failed cho từng model"""
+    lifecycle_status = model_lifecycle.get_status()
+    phobert = lifecycle_status["models"]["phobert"]
+    is_ready = phobert["status"] == "ready"
+    return {
+        "success": True,
+        "enabled": is_ready,
+        "ready": lifecycle_status["ready"],
+        "model": "PhoBERT",
+        "status": phobert["status"],
+        "data": {
+            "use_local_model": True,
+            "phobert_model_loaded": is_ready,
+            "phobert_device": phobert["info"].get("device"),
+            "models": lifecycle_status["models"]
+        }
+    }
+
+@router.get("/api/moderation-metrics")
+async def get_moderation_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """Metrics inference của moderation (JSON cho dashboard, text cho Prometheus)"""
+    if format == "prometheus":
+        return PlainTextResponse(moderation_metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+    return {
+        "success": True,
+        "inference_mode": INFERENCE_MODE,
+        "data": moderation_metrics.snapshot()
+    }
@@ -1,3 +1,8 @@
+import glob
+import json
+from typing import List
+
+
 def get_first_image(image_urls: str) -> str:
     """
     Lấy ảnh đầu tiên từ chuỗi `image_urls`. Nếu không có, trả về ảnh mặc định.
@@ -7,8 +12,41 @@ def get_first_image(image_urls: str) -> str:
     return "/static/images/default-thumbnail.jpg"  # Ảnh mặc định
 
 
+def article_card(row) -> dict:
+    """Dòng projection (article_id, title, description, image_urls, date_posted) -> dữ liệu thẻ bài viết."""
+    return {
+        "article_id": row.article_id,
+        "title": row.title,
+        "description": row.description or "",
+        "image_urls": get_first_image(row.image_urls) if row.image_urls else "",
+        "date_posted": row.date_posted,
+    }
+
+
 def process_images(posts):
     """Xử lý danh sách bài viết để lấy ảnh đầu tiên."""
     for post in posts:
         post.image_urls = get_first_image(post.image_urls) if post.image_urls else ""
     return posts
+
+
+def load_comment_texts(pattern: str) -> List[str]:
+    """
+    Đọc nội dung bình luận từ các file JSONL (mỗi dòng có trường "content")
+
+    Args:
+        pattern (str): Glob pattern của các file JSONL
+
+    Returns:
+        List[str]: Danh sách bình luận
+    """
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    content = json.loads(line).get("content")
+                    if content:
+                        texts.append(content)
+    return texts
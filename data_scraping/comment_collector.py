@@ -6,22 +6,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import SessionLocal
 from app.models import Comment, Article
+from app.text_normalization import EXPORT_PROFILE, normalize
 import pandas as pd
 from sqlalchemy.orm import joinedload
-import re
 from datetime import datetime
 
 def clean_text(text):
-    """Làm sạch văn bản bình luận"""
-    if not text:
-        return ""
-    # Loại bỏ HTML tags
-    text = re.sub(r'<.*?>', '', text)
-    # Loại bỏ ký tự đặc biệt và số
-    text = re.sub(r'[^\w\s]', '', text)
-    # Chuyển về chữ thường
-    text = text.lower()
-    return text.strip()
+    """Làm sạch văn bản bình luận (bỏ HTML tag, ký tự đặc biệt, chữ thường)"""
+    return normalize(text, EXPORT_PROFILE)
 
 def collect_comments(output_file="comment_data.csv"):
     """Thu thập dữ liệu bình luận từ cơ sở dữ liệu"""
@@ -7,7 +7,7 @@ from scrape_vietnamplus import scrape_vietnamplus_articles, fetch_article_conten
 
 from utils import (
     get_db_connection, get_webdriver, load_model_and_features, 
-    remove_duplicates_optimized, save_article_to_db, logger
+    remove_duplicates_optimized, save_article_to_db, touch_category_stamp, logger
 )
 
 def main(sites=["tuoitre", "nld", "vnexpress", "vietnamnet", "vietnamplus"], article_limit=20, similarity_threshold=0.8):
@@ -52,8 +52,12 @@ def main(sites=["tuoitre", "nld", "vnexpress", "vietnamnet", "vietnamplus"], art
                 article_data_list.append(article_data)
 
         unique_articles = remove_duplicates_optimized(article_data_list, cursor, threshold=similarity_threshold)
+        saved = 0
         for article_data in unique_articles:
-            save_article_to_db(article_data, cursor, conn)
+            if save_article_to_db(article_data, cursor, conn):
+                saved += 1
+        if saved:
+            touch_category_stamp()
 
     cursor.close()
     conn.close()
@@ -9,6 +9,8 @@ from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import joblib
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
@@ -105,6 +107,25 @@ def remove_duplicates_optimized(articles, cursor, threshold=0.8, batch_size=1000
     logger.info(f"Kept {len(unique_articles)} unique articles out of {len(articles)}")
     return unique_articles
 
+# Web server (app/category_registry.py) làm mới danh mục khi mtime file này thay đổi
+CATEGORY_REGISTRY_STAMP = os.getenv(
+    "CATEGORY_REGISTRY_STAMP", os.path.join(tempfile.gettempdir(), "category_registry.stamp")
+)
+
+def touch_category_stamp():
+    try:
+        with open(CATEGORY_REGISTRY_STAMP, "a"):
+            os.utime(CATEGORY_REGISTRY_STAMP, None)
+    except OSError as e:
+        logger.warning(f"Could not update category registry stamp: {e}")
+
+# ETag/fragment cache của web server (app/http_cache.py) đổi khi giá trị này đổi, ghi cùng transaction với bài viết
+def bump_content_version(cursor):
+    cursor.execute("""
+        INSERT INTO settings (setting_key, value) VALUES ('content_version', %s)
+        ON CONFLICT (setting_key) DO UPDATE SET value = EXCLUDED.value
+    """, (str(time.time_ns()),))
+
 def generate_article_id(cursor):
     cursor.execute("""
         SELECT MAX(CAST(SUBSTRING(article_id, 4, LENGTH(article_id)) AS INT))
@@ -144,8 +165,10 @@ def save_article_to_db(article_data, cursor, conn):
                 safe_data['date_posted'], safe_data['author'], safe_data['source_url'],
                 safe_data['status'], safe_data['predicted_type'], safe_image_urls, safe_video_urls
             ))
+            bump_content_version(cursor)
             conn.commit()
         logger.info(f"Saved article: {safe_data['title']} with ID {article_id}")
+        return True
     except Exception as e:
         logger.error(f"Failed to save article '{article_data.get('title', 'Unknown')}': {e}")
         conn.rollback()
@@ -17,3 +17,45 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(admin_router)
 app.include_router(user_router)
 app.include_router(auth_router)
+
+
+@app.on_event("startup")
+async def ensure_sentiment_rollup_table():
+    # Bảng rollup sentiment được ghi cùng transaction với bình luận nên phải tồn tại trước request đầu tiên
+    from app.database import engine
+    from app.sentiment_rollup import ensure_rollup_table
+    ensure_rollup_table(engine)
+
+
+@app.on_event("startup")
+async def ensure_listing_indexes():
+    # Không có migration: index cho trang danh mục được tạo nếu DB cũ chưa có
+    from app.database import engine
+    from app.models import Article
+    for index in Article.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+@app.on_event("startup")
+async def warm_up_search():
+    # Tạo index GIN (Postgres) hoặc build inverted index trong bộ nhớ mà không chặn server khởi động
+    import threading
+    from app.search_engine import search_engine
+    from app.search_suggest import search_suggester
+    threading.Thread(target=search_engine.warm_up, name="search-warm-up", daemon=True).start()
+    threading.Thread(target=search_suggester.warm_up, name="suggest-warm-up", daemon=True).start()
+
+
+@app.on_event("startup")
+async def start_model_loading():
+    # Load + warm-up PhoBERT/sentiment trong background, theo dõi qua /api/moderation-status
+    from app.model_lifecycle import model_lifecycle
+    model_lifecycle.start_background_loading()
+
+
+@app.on_event("shutdown")
+async def shutdown_inference_queue():
+    from app.inference_queue import inference_dispatcher
+    from app.moderation_admission import admission_controller
+    await admission_controller.shutdown()
+    await inference_dispatcher.shutdown()
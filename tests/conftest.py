@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# app.database tạo engine lúc import: test dùng SQLite trong bộ nhớ thay vì DB thật
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,63 @@
+from app.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("app.cache.time.monotonic", clock)
+    cache = TTLCache(max_size=4, ttl=10)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_and_no_expiry(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("app.cache.time.monotonic", clock)
+    cache = TTLCache(max_size=4, ttl=10)
+    cache.set("short", 1, ttl=1)
+    cache.set("forever", 2, ttl=0)
+
+    clock.now += 1e6
+    assert cache.get("short") is None
+    assert cache.get("forever") == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Dùng "a" để "b" thành entry cũ nhất
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_stats_count_hits_misses_and_clear():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    cache.clear()
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["invalidations"] == 1
+    assert stats["size"] == 0
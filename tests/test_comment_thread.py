@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Article, Comment, User
+from app.user import load_comment_thread
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def seed_thread(db: Session, replies_per_comment: int, roots: int = 3):
+    db.add(Article(article_id="a1", title="Tin"))
+    db.add_all([
+        User(id=index, first_name="U", last_name=str(index), email=f"u{index}@example.com", password="x")
+        for index in range(1, 6)
+    ])
+    started = datetime(2024, 1, 1)
+    for root_index in range(roots):
+        root = Comment(article_id="a1", user_id=1 + root_index % 5, content=f"gốc {root_index}",
+                       created_at=started + timedelta(minutes=root_index))
+        db.add(root)
+        db.flush()
+        db.add_all([
+            Comment(article_id="a1", user_id=1 + reply_index % 5, content=f"phản hồi {reply_index}",
+                    parent_id=root.id, created_at=started + timedelta(minutes=root_index, seconds=reply_index + 1))
+            for reply_index in range(replies_per_comment)
+        ])
+    db.commit()
+
+
+def count_queries(engine, fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, statements
+
+
+@pytest.mark.parametrize("replies_per_comment", [1, 50])
+def test_comment_thread_query_count_does_not_grow_with_replies(engine, replies_per_comment):
+    with Session(engine) as db:
+        seed_thread(db, replies_per_comment)
+
+    with Session(engine) as db:
+        (page, total), statements = count_queries(engine, lambda: load_comment_thread(db, "a1", None, 10))
+
+    # Đếm tổng + trang bình luận gốc + toàn bộ phản hồi + toàn bộ tác giả
+    assert len(statements) == 4
+    assert total == 3 * (replies_per_comment + 1)
+    assert [len(comment["replies"]) for comment in page.items] == [replies_per_comment] * 3
+    assert all(reply["user_name"] != "Người dùng" for comment in page.items for reply in comment["replies"])
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.database import Base
+from app.fragment_cache import FragmentCache
+from app.http_cache import Validators, bump_content_version, content_version_query
+
+
+def make_request(headers=None, cookies=None):
+    raw_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    if cookies:
+        raw_headers.append((b"cookie", "; ".join(f"{k}={v}" for k, v in cookies.items()).encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+def test_content_version_is_persisted_and_changes_on_every_bump():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        assert db.execute(select(content_version_query())).scalar() is None
+
+        bump_content_version(db)
+        db.commit()
+        first = db.execute(select(content_version_query())).scalar()
+
+        bump_content_version(db)
+        db.commit()
+        second = db.execute(select(content_version_query())).scalar()
+
+    assert first is not None and second is not None and first != second
+    engine.dispose()
+
+
+def test_etag_depends_on_user_id_not_on_session_cookie():
+    parts, timestamps = ("a1", "v1"), [datetime(2024, 1, 1)]
+    alice = Validators(make_request(cookies={"user_email": "alice@example.com"}), parts, timestamps, user_key=1)
+    alice_new_cookie = Validators(make_request(cookies={"user_email": "ALICE@example.com"}), parts, timestamps,
+                                  user_key=1)
+    bob = Validators(make_request(), parts, timestamps, user_key=2)
+    anonymous = Validators(make_request(cookies={"user_email": "alice@example.com"}), parts, timestamps)
+
+    assert alice.etag == alice_new_cookie.etag
+    assert len({alice.etag, bob.etag, anonymous.etag}) == 3
+    assert alice.personalised and not anonymous.personalised
+
+
+def test_etag_changes_with_content_version_and_matches_if_none_match():
+    before = Validators(make_request(), ("home", "v1"))
+    fresh = Validators(make_request(headers={"If-None-Match": before.etag}), ("home", "v1"))
+    stale = Validators(make_request(headers={"If-None-Match": before.etag}), ("home", "v2"))
+
+    assert fresh.not_modified().status_code == 304
+    assert stale.not_modified() is None
+
+
+def test_fragment_cache_is_cleared_when_another_process_bumps_the_version(tmp_path):
+    cache = FragmentCache(stamp_path=str(tmp_path / "stamp"))
+    cache.sync_version("v1")
+    cache.cache.set(("home",), "old html")
+
+    cache.sync_version("v1")
+    assert cache.cache.get(("home",)) == "old html"
+
+    cache.sync_version("v2")
+    assert cache.cache.get(("home",)) is None
@@ -0,0 +1,207 @@
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.inference_pool import WorkerPoolUnavailable
+from app.inference_queue import InferenceDispatcher, ProcessRunner
+from app.moderation_metrics import ModerationMetrics, moderation_metrics
+
+
+class FakePool:
+    """Pool giả: một số lần submit đầu bị BrokenProcessPool"""
+
+    created = 0
+
+    def __init__(self, broken_submits):
+        FakePool.created += 1
+        self.broken_submits = broken_submits
+        self.shut_down = False
+
+    def submit(self, texts, full_model=False):
+        future = Future()
+        if self.broken_submits:
+            self.broken_submits -= 1
+            future.set_exception(BrokenProcessPool("worker died"))
+        else:
+            results = [{"decision": "approve", "text": text, "full_model": full_model} for text in texts]
+            future.set_result((results, {"pid": 1, "cache": None}))
+        return future
+
+    def shutdown(self):
+        self.shut_down = True
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    FakePool.created = 0
+
+
+def test_pool_is_not_created_until_used():
+    runner = ProcessRunner(pool_factory=lambda: FakePool(0), workers=2)
+    assert runner.pool is None
+    assert runner.concurrency == 2
+    assert FakePool.created == 0
+
+
+def test_broken_pool_is_recreated_and_batch_retried_once():
+    broken = iter([1, 0])
+    runner = ProcessRunner(pool_factory=lambda: FakePool(next(broken)), workers=1)
+
+    results = asyncio.run(runner.run(["a", "b"]))
+
+    assert [r["text"] for r in results] == ["a", "b"]
+    assert FakePool.created == 2
+
+
+def test_repeated_pool_failure_raises_worker_pool_unavailable():
+    runner = ProcessRunner(pool_factory=lambda: FakePool(1), workers=1)
+
+    with pytest.raises(WorkerPoolUnavailable) as excinfo:
+        asyncio.run(runner.run(["a"]))
+
+    # Không được rơi vào nhánh "PhoBERT chưa cài" (except ImportError) của endpoint, nhánh đó lưu thẳng bình luận
+    assert not isinstance(excinfo.value, ImportError)
+    assert runner.pool is None
+
+
+def test_pool_failure_sends_comments_to_pending_with_rescore():
+    from app.moderation_admission import AdmissionController
+
+    runner = ProcessRunner(pool_factory=lambda: FakePool(2), workers=1)
+    controller = AdmissionController(dispatcher=InferenceDispatcher(runner=runner, max_wait_ms=0))
+
+    async def scenario():
+        try:
+            return await controller.moderate("bài viết rất hay")
+        finally:
+            await controller.dispatcher.shutdown()
+
+    result = asyncio.run(scenario())
+
+    assert result["degraded"] and result["rescore"]
+    assert result["decision"] == "pending"
+
+
+def test_dispatcher_propagates_pool_failure_to_callers():
+    runner = ProcessRunner(pool_factory=lambda: FakePool(2), workers=1)
+    dispatcher = InferenceDispatcher(runner=runner, max_wait_ms=0)
+
+    async def scenario():
+        try:
+            return await dispatcher.submit("a")
+        finally:
+            await dispatcher.shutdown()
+
+    with pytest.raises(WorkerPoolUnavailable):
+        asyncio.run(scenario())
+
+
+class RecordingRunner:
+    concurrency = 1
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, texts, full_model=False):
+        self.calls.append((list(texts), full_model))
+        return [{"text": text, "stage": "phobert" if full_model else "sentiment"} for text in texts]
+
+    def shutdown(self):
+        pass
+
+
+def test_full_model_requests_are_run_separately_from_cascade_requests():
+    runner = RecordingRunner()
+    dispatcher = InferenceDispatcher(runner=runner, max_batch_size=8, max_wait_ms=20)
+
+    async def scenario():
+        try:
+            return await asyncio.gather(
+                dispatcher.submit("a"),
+                dispatcher.submit("b", full_model=True),
+                dispatcher.submit("c"),
+            )
+        finally:
+            await dispatcher.shutdown()
+
+    results = asyncio.run(scenario())
+
+    assert [r["stage"] for r in results] == ["sentiment", "phobert", "sentiment"]
+    assert runner.calls == [(["a", "c"], False), (["b"], True)]
+
+
+class MetricsPool:
+    """Pool giả ghi metrics như một worker process thật (ModerationMetrics riêng, drain sau mỗi batch)"""
+
+    def __init__(self):
+        self.worker_metrics = ModerationMetrics()
+        self.batches = 0
+
+    def submit(self, texts, full_model=False):
+        self.batches += 1
+        self.worker_metrics.observe("tokenize_seconds", 0.002)
+        self.worker_metrics.observe("forward_seconds", 0.04)
+        self.worker_metrics.observe("forward_batch_size", len(texts))
+        results = [{"decision": "approve", "label": 0, "stage": "phobert"} for _ in texts]
+        self.worker_metrics.record_decisions(results)
+        metrics = self.worker_metrics.drain()
+        metrics["pid"] = 4242
+        metrics["cache"] = {"size": 3 * self.batches, "max_size": 100, "ttl": 60.0, "hits": self.batches,
+                            "misses": 2 * self.batches, "hit_rate": 0.0, "evictions": 0, "invalidations": 0}
+        future = Future()
+        future.set_result((results, metrics))
+        return future
+
+    def shutdown(self):
+        pass
+
+
+def test_process_mode_metrics_reach_the_web_process():
+    moderation_metrics.reset()
+    runner = ProcessRunner(pool_factory=MetricsPool, workers=1)
+
+    async def scenario():
+        await runner.run(["a", "b"])
+        await runner.run(["c"])
+
+    try:
+        asyncio.run(scenario())
+        snapshot = moderation_metrics.snapshot()
+    finally:
+        moderation_metrics.reset()
+
+    assert snapshot["histograms"]["tokenize_seconds"]["count"] == 2
+    assert snapshot["histograms"]["forward_seconds"]["p50"] == 0.05
+    assert snapshot["histograms"]["forward_batch_size"]["sum"] == 3
+    assert snapshot["decisions"] == {"approve": 3}
+    # Thống kê cache tích lũy của worker: bản mới nhất thay bản cũ, không cộng hai lần
+    assert (snapshot["cache"]["hits"], snapshot["cache"]["misses"], snapshot["cache"]["workers"]) == (2, 4, 1)
+    assert snapshot["cache"]["hit_rate"] == round(2 / 6, 4)
+
+
+class ErrorRunner(RecordingRunner):
+    """Runner trả về kết quả lỗi như PhoBERTService.predict_batch khi model chưa load"""
+
+    async def run(self, texts, full_model=False):
+        self.calls.append((list(texts), full_model))
+        return [{"label": 1, "confidence": 0.0, "description": "Lỗi trong quá trình phân loại",
+                 "error": "Model not loaded"} for _ in texts]
+
+
+def test_error_result_is_not_returned_to_the_endpoint_without_a_decision():
+    from app.moderation_admission import AdmissionController
+
+    controller = AdmissionController(dispatcher=InferenceDispatcher(runner=ErrorRunner(), max_wait_ms=0))
+
+    async def scenario():
+        try:
+            return await controller.moderate("bài viết rất hay")
+        finally:
+            await controller.dispatcher.shutdown()
+
+    result = asyncio.run(scenario())
+
+    assert result["degraded"] and result["rescore"]
+    assert result["decision"] in ("approve", "pending")
@@ -0,0 +1,37 @@
+import json
+
+from app.moderation_benchmark import _percentiles, build_corpus, compare_with_baseline, synthetic_comments
+
+
+def test_synthetic_comments_are_reproducible():
+    assert synthetic_comments(20, seed=1) == synthetic_comments(20, seed=1)
+    assert synthetic_comments(20, seed=1) != synthetic_comments(20, seed=2)
+
+
+def test_build_corpus_deduplicates(tmp_path):
+    path = tmp_path / "comments.jsonl"
+    path.write_text("\n".join(json.dumps({"content": c}) for c in ["hay", " hay ", "", "tệ"]), encoding="utf-8")
+
+    corpus = build_corpus(str(path), synthetic=0)
+
+    assert corpus == ["hay", "tệ"]
+
+
+def test_percentiles_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert _percentiles(samples) == {"p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0}
+    assert _percentiles([]) == {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+
+
+def test_compare_with_baseline_matches_runs_by_configuration():
+    def run(batch_size, throughput, p95):
+        return {"backend": "torch", "threads": 1, "batch_size": batch_size,
+                "comments_per_sec": throughput, "p95_ms": p95}
+
+    baseline = {"runs": [run(8, 100.0, 20.0), run(16, 0.0, 10.0)]}
+    current = {"runs": [run(8, 150.0, 10.0), run(16, 50.0, 5.0), run(32, 10.0, 1.0)]}
+
+    assert compare_with_baseline(current, baseline) == [{
+        "backend": "torch", "threads": 1, "batch_size": 8,
+        "throughput_change_pct": 50.0, "p95_change_pct": -50.0,
+    }]
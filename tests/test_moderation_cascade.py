@@ -0,0 +1,52 @@
+from app.moderation_cascade import ModerationCascade
+
+
+class FakeAnalyzer:
+    is_loaded = True
+
+    def predict_batch(self, texts):
+        return [
+            {"sentiment": "negative" if "tệ" in text else "positive", "confidence": 0.97, "processed_text": text}
+            for text in texts
+        ]
+
+
+class FakePhoBERT:
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, texts):
+        self.batches.append(list(texts))
+        return [{"decision": "reject", "label": 2, "stage": "phobert"} for _ in texts]
+
+
+def make_cascade():
+    phobert = FakePhoBERT()
+    calls = []
+
+    def phobert_getter():
+        calls.append(1)
+        return phobert
+
+    cascade = ModerationCascade(phobert_getter=phobert_getter, sentiment_getter=FakeAnalyzer,
+                                threshold=0.9, approve_sentiments=("positive",), enabled=True)
+    return cascade, phobert, calls
+
+
+def test_batch_decided_by_cheap_stages_never_loads_phobert():
+    cascade, _, calls = make_cascade()
+
+    results = cascade.classify_batch(["đồ ngu", "bài viết hay quá"])
+
+    assert [r["stage"] for r in results] == ["keyword", "sentiment"]
+    assert calls == []
+
+
+def test_only_escalated_comments_reach_phobert():
+    cascade, phobert, calls = make_cascade()
+
+    results = cascade.classify_batch(["bài viết hay", "dịch vụ tệ", "đồ ngu"])
+
+    assert [r["stage"] for r in results] == ["sentiment", "phobert", "keyword"]
+    assert phobert.batches == [["dịch vụ tệ"]]
+    assert len(calls) == 1
@@ -0,0 +1,69 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Article
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor, paginate_keyset
+
+
+def test_cursor_round_trip_keeps_datetimes_and_direction():
+    values = [datetime(2024, 5, 1, 12, 30, 15, 123456), "abc123"]
+
+    cursor = encode_cursor(values, "prev")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("prev", values)
+
+
+def test_cursor_round_trip_with_null_sort_value():
+    assert decode_cursor(encode_cursor([None, 42])) == ("next", [None, 42])
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!not-base64!!!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'{"k": [1, 2]}').decode(),
+    base64.urlsafe_b64encode(b'{"d": "sideways", "k": [1, 2]}').decode(),
+    base64.urlsafe_b64encode(b'{"d": "next", "k": 5}').decode(),
+    base64.urlsafe_b64encode(b'{"d": "next", "k": [{"dt": "yesterday"}]}').decode(),
+])
+def test_garbage_cursor_raises_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_invalid_cursor_is_a_value_error():
+    assert issubclass(InvalidCursor, ValueError)
+
+
+def test_paginate_keyset_walks_forward_and_back_without_gaps():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    started = datetime(2024, 1, 1)
+    with Session(engine) as db:
+        # Hai bài trùng date_posted và một bài không có ngày (xếp cuối)
+        db.add_all([Article(article_id=f"a{index}", title=str(index), date_posted=started + timedelta(days=index // 2))
+                    for index in range(7)])
+        db.add(Article(article_id="z", title="no date"))
+        db.commit()
+
+        keys = (Article.date_posted, Article.article_id)
+        pages, cursor = [], None
+        while True:
+            page = paginate_keyset(db.query(Article), keys, per_page=3, cursor=cursor)
+            pages.append([article.article_id for article in page.items])
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        assert pages == [["a6", "a5", "a4"], ["a3", "a2", "a1"], ["a0", "z"]]
+
+        back = paginate_keyset(db.query(Article), keys, per_page=3, cursor=page.prev_cursor)
+        assert [article.article_id for article in back.items] == ["a3", "a2", "a1"]
+        assert back.has_prev and back.has_next
+    engine.dispose()
@@ -0,0 +1,81 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.search_engine import SEARCH_MAX_RESULTS, SearchEngine
+
+
+class CountingBackend:
+    name = "fake"
+
+    def __init__(self):
+        self.version = 0
+        self.calls = []
+
+    def search_ids(self, db, terms, limit, offset):
+        self.calls.append((tuple(terms), limit, offset))
+        return [f"{'-'.join(terms)}-{offset + number}" for number in range(limit)]
+
+    def index_article(self, article):
+        pass
+
+    def remove_article(self, article_id):
+        pass
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SearchEngine(backend="memory")
+    engine.backend = CountingBackend()
+    engine.stamp_path = str(tmp_path / "stamp")
+    engine._stamp = None
+    return engine
+
+
+def test_queries_that_normalise_the_same_share_an_entry(engine):
+    first = engine.search_ids(None, "Bóng  Đá", page=1, per_page=2)
+    second = engine.search_ids(None, "bong da bong", page=1, per_page=2)
+
+    assert first == second == (["bong-da-0", "bong-da-1"], True)
+    assert len(engine.backend.calls) == 1
+    assert engine.result_cache.stats()["hits"] == 1
+
+
+def test_page_and_page_size_are_part_of_the_key(engine):
+    engine.search_ids(None, "bong da", page=1, per_page=2)
+    engine.search_ids(None, "bong da", page=2, per_page=2)
+    engine.search_ids(None, "bong da", page=1, per_page=3)
+
+    assert engine.backend.calls == [(("bong", "da"), 3, 0), (("bong", "da"), 3, 2), (("bong", "da"), 4, 0)]
+
+
+@pytest.mark.parametrize("change", [
+    lambda engine: engine.index_article(SimpleNamespace(article_id="a1", status="published")),
+    lambda engine: engine.remove_article("a1"),
+    lambda engine: setattr(engine.backend, "version", engine.backend.version + 1),
+])
+def test_article_changes_and_index_swaps_invalidate_cached_results(engine, change):
+    engine.search_ids(None, "bong da", page=1, per_page=2)
+    change(engine)
+    engine.search_ids(None, "bong da", page=1, per_page=2)
+
+    assert len(engine.backend.calls) == 2
+
+
+def test_scraper_stamp_invalidates_cached_results(engine):
+    engine.search_ids(None, "bong da", page=1, per_page=2)
+    with open(engine.stamp_path, "a"):
+        os.utime(engine.stamp_path, None)
+    engine.search_ids(None, "bong da", page=1, per_page=2)
+    engine.search_ids(None, "bong da", page=1, per_page=2)
+
+    assert len(engine.backend.calls) == 2
+
+
+def test_results_beyond_the_cap_are_not_fetched(engine):
+    assert engine.search_ids(None, "bong da", page=SEARCH_MAX_RESULTS + 1, per_page=1) == ([], False)
+    last_page = engine.search_ids(None, "bong da", page=SEARCH_MAX_RESULTS, per_page=1)
+
+    assert last_page == ([f"bong-da-{SEARCH_MAX_RESULTS - 1}"], False)
+    assert engine.backend.calls == [(("bong", "da"), 1, SEARCH_MAX_RESULTS - 1)]
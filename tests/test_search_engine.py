@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Article
+from app.search_engine import InvertedIndex, SearchEngine, highlight, search_terms
+
+NOW = datetime.utcnow()
+
+
+@pytest.fixture
+def index():
+    index = InvertedIndex()
+    index.add("title", "Bóng đá Việt Nam", "Tin thể thao", "Trận đấu tối qua", NOW)
+    index.add("content", "Tin thể thao", "Kết quả hôm nay", "Đội tuyển bóng đá thắng lớn", NOW)
+    index.add("other", "Giá vàng", "Thị trường", "Giá vàng tăng mạnh", NOW)
+    return index
+
+
+def test_search_terms_fold_accents_case_and_duplicates():
+    assert search_terms("Bóng  ĐÁ bong") == ["bong", "da"]
+
+
+def test_title_match_outranks_content_match(index):
+    assert index.search(["bong", "da"], limit=10) == (["title", "content"], 2)
+
+
+def test_every_term_must_match(index):
+    assert index.search(["bong", "vang"], limit=10) == ([], 0)
+    assert index.search(["khong", "co"], limit=10) == ([], 0)
+
+
+def test_rare_term_weighs_more_than_common_term():
+    index = InvertedIndex()
+    for number in range(5):
+        index.add(f"common{number}", "tin tức", None, None, NOW)
+    index.add("rare", "tin tức", None, "bão lũ", NOW)
+    index.add("both", "tin tức", None, "tin tức tin tức", NOW)
+
+    ids, total = index.search(["tin"], limit=10)
+    assert total == 7 and ids[0] == "both"
+    assert index.search(["tin", "bao"], limit=10) == (["rare"], 1)
+
+
+def test_recent_article_wins_a_tie():
+    index = InvertedIndex()
+    index.add("old", "Bão số 3", None, None, NOW - timedelta(days=365))
+    index.add("new", "Bão số 3", None, None, NOW)
+    assert index.search(["bao"], limit=10)[0] == ["new", "old"]
+
+
+def test_update_and_remove_keep_statistics_consistent(index):
+    index.add("title", "Giá xăng", None, None, NOW)
+    assert index.search(["bong", "da"], limit=10) == (["content"], 1)
+
+    index.remove("content")
+    index.remove("missing")
+    assert index.search(["bong"], limit=10) == ([], 0)
+    assert len(index) == 2
+    assert index.total_length == sum(index.doc_length.values())
+
+
+def test_highlight_marks_accented_words_from_folded_terms():
+    assert str(highlight("Bóng đá & thể thao", ["bong", "da"], length=None)) == \
+        "<mark>Bóng</mark> <mark>đá</mark> &amp; thể thao"
+
+
+def test_engine_pages_with_has_more_instead_of_counting():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([
+            Article(article_id=f"a{number}", title=f"Bóng đá {number}", status="published",
+                    date_posted=NOW - timedelta(days=number))
+            for number in range(5)
+        ])
+        db.add(Article(article_id="draft", title="Bóng đá nháp", status="Pending", date_posted=NOW))
+        db.commit()
+
+        search_engine = SearchEngine(backend="memory")
+        first = search_engine.search(db, "bong da", page=1, per_page=2)
+        last = search_engine.search(db, "bong da", page=3, per_page=2)
+
+    assert [item["article_id"] for item in first["items"]] == ["a0", "a1"]
+    assert first["has_more"] and first["backend"] == "memory"
+    assert [item["article_id"] for item in last["items"]] == ["a4"]
+    assert not last["has_more"]
+    engine.dispose()
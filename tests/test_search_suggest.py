@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.search_suggest import SearchSuggester, SuggestionIndex, bounded_distance, max_edits
+
+NOW = datetime(2024, 6, 1)
+
+
+@pytest.mark.parametrize("token, word, limit, prefix, expected", [
+    ("bong", "bong", 1, False, 0),
+    ("bnog", "bong", 1, False, 1),  # đổi chỗ hai ký tự liền nhau là một lỗi (OSA)
+    ("bog", "bong", 1, False, 1),
+    ("bxyg", "bong", 1, False, None),
+    ("bxyg", "bong", 2, False, 2),
+    ("thoi", "thoisu", 1, False, None),  # chênh độ dài vượt limit: dừng ngay
+    ("thoi", "thoisu", 1, True, 0),
+    ("thio", "thoisu", 1, True, 1),
+])
+def test_bounded_distance(token, word, limit, prefix, expected):
+    assert bounded_distance(token, word, limit, prefix=prefix) == expected
+
+
+def test_max_edits_grows_with_token_length():
+    assert [max_edits(token) for token in ("ab", "abc", "abcdef")] == [0, 1, 2]
+
+
+def rows():
+    return [
+        ("a1", "Giá vàng hôm nay", NOW),
+        ("a2", "Giá xăng tăng", NOW + timedelta(days=1)),
+        ("a3", "Bóng đá Việt Nam", NOW - timedelta(days=1)),
+        ("a4", "Giá vàng thế giới", NOW - timedelta(days=2)),
+    ]
+
+
+def test_lookup_matches_any_word_position_newest_first():
+    index = SuggestionIndex()
+    index.load(rows())
+
+    assert [item["article_id"] for item in index.lookup("gia", 10)] == ["a2", "a1", "a4"]
+    assert [item["title"] for item in index.lookup("vang hom", 10)] == ["Giá vàng hôm nay"]
+    assert index.lookup("nam", 10)[0]["article_id"] == "a3"
+
+
+def test_incremental_updates_match_a_full_load():
+    incremental = SuggestionIndex()
+    incremental.load(rows()[:2])
+    incremental.add("a3", "Bóng đá Việt Nam", NOW - timedelta(days=1))
+    incremental.add("a4", "Giá vàng thế giới", NOW - timedelta(days=2))
+    incremental.add("a5", "Bão số 3", NOW)
+    incremental.remove("a5")
+    incremental.add("a2", "Giá xăng tăng", NOW + timedelta(days=1))
+
+    full = SuggestionIndex()
+    full.load(rows())
+
+    assert incremental.entries == full.entries
+    assert incremental.vocabulary == full.vocabulary
+    assert incremental._sorted_words == full._sorted_words
+    assert incremental._words_by_initial == full._words_by_initial
+    assert not incremental.lookup("bao", 10)
+
+
+def test_correct_prefers_the_more_frequent_word():
+    index = SuggestionIndex()
+    index.load(rows())
+
+    assert index.correct("vnag", prefix=False) == "vang"
+    assert index.correct("xnag", prefix=False) == "xang"
+    assert index.correct("bon", prefix=True) == "bon"  # đã là tiền tố của "bong"
+    assert index.correct("zzz", prefix=False) == "zzz"
+
+    index.add("a6", "Vàng và vang", NOW)
+    assert index.vocabulary["vang"] == 3
+    assert index.correct("vabg", prefix=False) == "vang"
+
+
+class ChangingDuringBuildDb:
+    """Session giả: một bài được đăng và một bài bị xóa trong lúc rebuild đang đọc bảng articles"""
+
+    def __init__(self, suggester, rows):
+        self.suggester = suggester
+        self.rows = rows
+
+    def query(self, *columns):
+        return self
+
+    def filter(self, *conditions):
+        return self
+
+    def all(self):
+        self.suggester.index_article(SimpleNamespace(
+            article_id="new", title="Bão số 3 đổ bộ", date_posted=NOW, status="published"))
+        self.suggester.remove_article("a1")
+        return self.rows
+
+
+def test_changes_during_rebuild_are_replayed_on_the_new_index(tmp_path):
+    suggester = SearchSuggester(stamp_path=str(tmp_path / "stamp"))
+    suggester.rebuild(ChangingDuringBuildDb(suggester, rows()))
+
+    assert [item["article_id"] for item in suggester.index.lookup("bao", 10)] == ["new"]
+    assert "a1" not in suggester.index.titles
+    assert suggester._pending is None
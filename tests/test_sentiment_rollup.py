@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.database
+from app.comment_moderation import CommentModerationService
+from app.database import Base
+from app.models import Article, Comment, COMMENT_STATUS_HIDDEN
+from app.sentiment_rollup import (
+    get_article_sentiment, rebuild_rollups, record_comment_change, record_new_comment, remove_article,
+)
+
+
+def make_session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_moderation_save_updates_rollup_on_insert_and_status_change(tmp_path, monkeypatch):
+    session_factory = make_session_factory()
+    monkeypatch.setattr(app.database, "SessionLocal", session_factory)
+    with session_factory() as db:
+        db.add(Article(article_id="a1", title="Tin"))
+        db.commit()
+
+    service = CommentModerationService(pending_dir=str(tmp_path), use_local_model=False)
+    service._save_comment_to_database({"article_id": "a1", "user_id": 1, "content": "hay quá"}, label=0)
+    service._save_comment_to_database({"article_id": "a1", "user_id": 2, "content": "dở tệ"}, label=1)
+
+    with session_factory() as db:
+        summary = get_article_sentiment(db, "a1")
+        assert (summary["positive"], summary["negative"], summary["total"]) == (1, 1, 2)
+        assert summary["mean_confidence"] == 0.9
+
+        comment = db.query(Comment).filter(Comment.user_id == 2).one()
+        old_values = (comment.status, comment.sentiment, comment.sentiment_confidence)
+        comment.status = COMMENT_STATUS_HIDDEN
+        record_comment_change(db, comment, *old_values)
+        db.commit()
+
+        summary = get_article_sentiment(db, "a1")
+        assert (summary["positive"], summary["negative"], summary["total"]) == (1, 0, 1)
+
+
+def test_remove_article_drops_comments_and_rollup_in_the_same_transaction():
+    session_factory = make_session_factory()
+    with session_factory() as db:
+        db.add_all([Article(article_id="a1", title="Tin"), Article(article_id="a2", title="Tin khác")])
+        for article_id in ("a1", "a2"):
+            comment = Comment(article_id=article_id, user_id=1, content="hay", sentiment="positive",
+                              sentiment_confidence="0.9")
+            db.add(comment)
+            record_new_comment(db, comment)
+        db.commit()
+
+        db.delete(db.get(Article, "a1"))
+        remove_article(db, "a1")
+        db.commit()
+
+        assert get_article_sentiment(db, "a1")["total"] == 0
+        assert db.query(Comment).filter(Comment.article_id == "a1").count() == 0
+        # Không có bình luận mồ côi nên backfill không tạo lại rollup cho bài viết đã xóa
+        assert rebuild_rollups(db) == 1
+        assert get_article_sentiment(db, "a2")["total"] == 1
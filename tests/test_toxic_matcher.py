@@ -0,0 +1,85 @@
+import pytest
+
+from app.text_normalization import translate_leet
+from app.toxic_matcher import AhoCorasick, ToxicKeywordMatcher, keyword_reject, toxic_matcher
+
+
+@pytest.mark.parametrize("comment", [
+    "fuck!", "shit!!!", "dm!", "Đồ ngu!", "con chó!", "vãi!", "rác!",
+    "(dm)", "\"shit\"", "bài này rác.", "ĐM, viết gì vậy?",
+])
+def test_keyword_followed_or_preceded_by_punctuation_matches(comment):
+    assert toxic_matcher.first_match(comment) is not None
+
+
+@pytest.mark.parametrize("comment, keyword", [
+    ("sh1t", "shit"),
+    ("sh!t", "shit"),
+    ("f|_|ck", None),
+    ("5h1t!", "shit"),
+    ("đmmmm", "đm"),
+])
+def test_leetspeak_inside_words(comment, keyword):
+    assert toxic_matcher.first_match(comment) == keyword
+
+
+@pytest.mark.parametrize("comment", [
+    "admin duyệt bài nhanh quá",
+    "Dmitri là tác giả",
+    "vai trò của nhà nước",
+    "rac thải nhựa",
+    "email admin@dm.vn",
+    "Bài viết rất hay!",
+])
+def test_clean_comments_do_not_match(comment):
+    assert toxic_matcher.first_match(comment) is None
+
+
+def test_translate_leet_keeps_boundary_punctuation():
+    assert translate_leet("sh!t!!") == "shit!!"
+    assert translate_leet("!dm") == "!dm"
+    assert translate_leet("c0n ch0") == "con cho"
+
+
+def test_aho_corasick_reports_overlapping_matches():
+    automaton = AhoCorasick(["he", "she", "hers"])
+    assert sorted(automaton.iter_matches("shers")) == [(0, "she"), (1, "he"), (1, "hers")]
+
+
+def test_unaccented_keyword_matches_accented_text_but_not_vice_versa():
+    matcher = ToxicKeywordMatcher(["dm", "vãi"])
+    assert matcher.find_all("đm vãi") == ["vãi", "dm"]
+    assert matcher.first_match("vai") is None
+
+
+def test_keyword_reject_result():
+    result = keyword_reject("shit!")
+    assert result["decision"] == "reject"
+    assert result["stage"] == "keyword"
+    assert result["matched_keyword"] == "shit"
+    assert keyword_reject("Bài viết hay") is None
+
+
+@pytest.mark.parametrize("comment, keyword", [
+    ("do ngu", "đồ ngu"),
+    ("Con cho!", "con chó"),
+    ("me kiep, viết gì vậy", "mẹ kiếp"),
+    ("bac ky", "bắc kỳ"),
+    ("d.m", "dm"),
+    ("đ.m bài này", "dm"),
+    ("f*ck", "fuck"),
+    ("sh*t!", "shit"),
+    ("c*n chó", "con chó"),
+])
+def test_unaccented_and_punctuated_variants_match(comment, keyword):
+    assert toxic_matcher.first_match(comment) == keyword
+
+
+@pytest.mark.parametrize("comment", [
+    "vai diễn này hay",
+    "d.c. là thủ đô Mỹ",
+    "phân loại rac thải",
+    "a*b = c",
+])
+def test_folding_single_accented_words_does_not_over_match(comment):
+    assert toxic_matcher.first_match(comment) is None